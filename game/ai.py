@@ -1,205 +1,726 @@
-import copy
+import collections
 import datetime
+import math
+import os
 import sys
+import threading
 
 __author__ = 'bengt, yuessiah'
 
+from game import tables
+from game.position import Position
 from game.settings import *
+from game.symmetry import canonical, canonical_key, inverse_move, transform_move
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.json')
+
+# Hand-picked weights, used when there is no weights file. 'ending' holds
+# the weights of the count, corner, edge, mobility and stability features
+# for each game phase, phase i covering fewer than phases[i] empty squares.
+# 'opening' holds the X-square, C-square, odd and even parity weights.
+DEFAULT_WEIGHTS = {
+    'phases': [WIDTH * HEIGHT + 1],
+    'ending': [[100, 100, 100, 100, 100]],
+    'opening': [-50, -20, 100, -45],
+}
+
+
+def load_weights(path=WEIGHTS_FILE):
+    """ Returns the evaluation weights stored in `path` by game.tuning, or the
+        default weights if there is no such file.
+    """
+    if not os.path.exists(path):
+        return DEFAULT_WEIGHTS
+    import json
+    with open(path) as f:
+        return dict(DEFAULT_WEIGHTS, **json.load(f))
+
+
+WEIGHTS = load_weights()
+
+# Kinds of values kept in the transposition table.
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Number of positions the transposition table holds before it is cleared.
+TABLE_SIZE = 1 << 18
+
+# Number of nodes searched between two looks at the clock and the stop signal.
+POLL_INTERVAL = 16
+
+_SQUARES = {}
+
+# A root move with its score, whether the score is exact or only an upper
+# bound, and its principal variation: the moves expected from it on.
+Line = collections.namedtuple('Line', 'move score exact pv')
+
+# The evaluation features of a position: its empty squares, then a
+# (player, opponent) pair of counts of discs, corners, edge discs, legal
+# moves, empty squares next to a disc of the other side and stable discs.
+Features = collections.namedtuple('Features', 'empties discs corners edges mobility potential stability')
+
+
+def squares(width):
+    """ Returns the corner, X-square, C-square and edge tiles of a square board
+        `width` tiles a side: the corners, (corner, X-square) pairs, (corner,
+        C-squares) pairs and the frozenset of edge tiles.
+    """
+    result = _SQUARES.get(width)
+    if result is None:
+        w, last = width, width * width - 1
+        corners = (0, w - 1, last - w + 1, last)
+        x_squares = ((0, w + 1), (w - 1, 2 * w - 2), (last - w + 1, last - 2 * w + 2), (last, last - w - 1))
+        c_squares = ((0, (1, w)), (w - 1, (w - 2, 2 * w - 1)),
+                     (last - w + 1, (last - 2 * w + 1, last - w + 2)), (last, (last - w, last - 1)))
+        edges = frozenset(tile for tile in range(w * w)
+                          if tile % w in (0, w - 1) or tile // w in (0, w - 1))
+        result = _SQUARES[width] = (corners, x_squares, c_squares, edges)
+    return result
+
+
+class SearchAborted(Exception):
+    """Raised inside a search that ran out of time or was told to stop."""
+
+
+class EngineSession(object):
+    """Search state kept from one move of a game to the next.
+
+    It holds the transposition tables, the killer moves of every ply, the
+    history scores of moves that caused cutoffs and the (state, move) pairs
+    of the line the last search expected. A controller passes the same
+    session to the engine for every move of a game.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.solved = {}
+        self.killers = []
+        self.history = {}
+        self.pv = []
+        self.empties = None
+        self.searches = 0
+        self.predicted = 0
+
+    def start(self, state):
+        """ Prepares a search from `state` and returns the move the last
+            search expected there, or None.
+
+            Positions with more empty squares than `state`, or as many but
+            other discs, can not come back, so their entries are dropped. The
+            killer moves move up by the number of plies played and the
+            history scores are halved for every ply, so recent cutoffs weigh
+            more. The containers are changed in place, as the engine holds on
+            to them.
+        """
+        empties = state[0].count(BOARD_CELL)
+        if self.empties is not None and empties != self.empties:
+            played = self.empties - empties
+            if played < 0:
+                self.table.clear()
+                self.solved.clear()
+                self.history.clear()
+                del self.killers[:]
+                self.pv = []
+                self.searches = self.predicted = 0
+            else:
+                cells = canonical_key(state)[0]
+                for table in (self.table, self.solved):
+                    for key in [key for key in table if key[0].count(BOARD_CELL) > empties or
+                                key[0].count(BOARD_CELL) == empties and key[0] != cells]:
+                        del table[key]
+                del self.killers[:played]
+                for move, score in list(self.history.items()):
+                    if score >> played:
+                        self.history[move] = score >> played
+                    else:
+                        del self.history[move]
+        self.empties = empties
+        self.searches += 1
+
+        for i, (expected, move) in enumerate(self.pv):
+            if expected == state:
+                if i:
+                    self.predicted += 1
+                return move
+        return None
 
 
 class AlphaBetaPruner(object):
     """Alpha-Beta Pruning algorithm."""
 
-    def __init__(self, mutex, duration, pieces, first_player, second_player):
+    def __init__(self, mutex, duration, position, first_player, second_player, display=True, weights=None,
+                 stop=None, node_limit=None, cache=None, session=None):
         self.mutex = mutex
+        self.node_limit = node_limit
+        self.cache = cache
+        self.session = session if session is not None else EngineSession()
+        self.stop = stop if stop is not None else threading.Event()
+        self.display = display
+        self.weights = weights if weights is not None else WEIGHTS
         self.board = 2
         self.white = 0
         self.black = 1
         self.max_depth = 0
         self.duration = duration
         self.complexity = 0
+        self.nodes = 0
+        self.score = None
+        self.table = self.session.table
+        self.solved = self.session.solved
+        self.killers = self.session.killers
+        self.history = self.session.history
+        self.timed_out = False
         self.lifetime = None
         self.first_player, self.second_player = (self.white, self.black) \
             if first_player == WHITE else (self.black, self.white)
-        self.state = self.make_state(pieces)
-
-    def make_state(self, pieces):
+        self.state = self.make_state(position)
+        self.width = math.isqrt(len(self.state[0]))
+        self.rays = tables.rays(self.width, self.width)
+        self.squares = squares(self.width)
+        self.ending_weights = [self.phase_weights(empties) for empties in range(len(self.state[0]) + 1)]
+
+    def make_state(self, position):
+        """ Returns the (state, player) pair to search from. Positions are
+            used as they are, lists of pieces are converted.
+        """
+        if isinstance(position, Position):
+            return position
         results = {BOARD: self.board, MOVE: self.board, WHITE: self.white, BLACK: self.black}
-        return [results[p.get_state()] for p in pieces], self.first_player
+        return bytes(results[p.get_state()] for p in position), self.first_player
 
-    def alpha_beta_search(self):
-        self.lifetime = datetime.datetime.now() + datetime.timedelta(seconds=self.duration)
+    def alpha_beta_search(self, depth=None, lifetime=None):
+        """ Returns the best move as an (x, y) tuple. The search goes `depth`
+            plies deep, or 4 to 5 plies depending on the number of empty squares,
+            and stops at `lifetime` or after `duration` seconds.
 
-        left = self.state[0].count(self.board)
-        if left >= 44:
-            self.max_depth = 4
-        else:
-            self.max_depth = 5
-        sys.stdout.write("\x1b7\x1b[%d;%dfMax depth: %d\x1b8" % (10, 22, self.max_depth))
+            A search that runs out of time or is stopped returns the best of
+            the moves searched so far, and sets `timed_out`. With a node limit
+            the search runs out after `node_limit` nodes instead of seconds,
+            so the same position always gives the same move, score and nodes.
+
+            The move the session expected here is searched first, and the
+            other moves only need to show they are no better. A finished
+            search leaves its principal variation in the session.
+        """
+        self.lifetime = lifetime or datetime.datetime.now() + datetime.timedelta(seconds=self.duration)
+        self.timed_out = False
+
+        self.max_depth = depth if depth is not None else self.default_depth()
+        if self.display:
+            sys.stdout.write("\x1b7\x1b[%d;%dfMax depth: %d\x1b8" % (10, 22, self.max_depth))
 
         moves = self.get_moves(self.state[0], self.state[1])
         if len(moves) == 0:
             raise NoMovesError
 
-        fn = lambda state, move: self.opening_evaluation(state[0], self.first_player, move) + \
-                self.negamax(0, state, move, -float('Inf'), float('Inf'))
-        scores = [(fn(self.next_state(self.state, move), move), move) for move in moves]
+        hint = self.session.start(self.state)
+        children = self.distinct_moves(self.state, moves)
+        children.sort(key=lambda child: child[1] != hint)
+
+        lines = []
+        try:
+            self.search_root(children, 1, lines)
+        except SearchAborted:
+            pass
+
+        # Every exact line beats the ones before it.
+        best = next((line for line in reversed(lines) if line.exact), None)
+        if best is None:
+            self.score = None
+            return moves[0]
+        self.score = best.score
+        if not self.timed_out:
+            self.session.pv = self.principal_variation(best.move)
+        return best.move
+
+    def default_depth(self):
+        """ Returns the depth searched when none is given: 4 plies in the
+            opening, with 44 empty squares or more on an 8x8 board, 5 after that.
+        """
+        return 4 if self.state[0].count(self.board) >= len(self.state[0]) * OPENING_EMPTY else 5
+
+    def search_root(self, children, top, lines):
+        """ Searches the (state, move) children of the root in order and
+            appends a Line without principal variation to `lines` for each.
 
-        return max(scores, key=lambda value: value[0])[1]
+            Only the `top` best moves need an exact score. Once `top` exact
+            scores are known, the other moves are searched against the
+            lowest of them and get it as an upper bound if they are no better.
+        """
+        for state, move in children:
+            opening = self.opening_evaluation(state[0], self.first_player, move)
+            scores = sorted((line.score for line in lines if line.exact), reverse=True)
+            floor = -float('Inf') if len(scores) < top else scores[top - 1] - opening
+            value = self.negamax(0, state, move, floor, float('Inf'))
+            if len(scores) < top or value > floor:
+                lines.append(Line(move, opening + value, True, None))
+            else:
+                lines.append(Line(move, scores[top - 1], False, None))
+
+    def analysis(self, depth=None, top=None, lifetime=None):
+        """ Searches one ply deeper at a time, up to `depth` plies or the end
+            of the game, and yields (depth, lines) after every completed
+            depth. The lines hold a Line for every legal move, best first.
+
+            The scores of the `top` best moves, or of all of them, are
+            exact. The other moves only get an upper bound, below the top
+            ones, which makes them much cheaper to search. Every depth
+            searches the moves in the order of the previous one and reuses
+            its transposition table. The generator ends when `duration`
+            seconds, `lifetime`, the nodes or the stop signal run out, so the
+            last lines yielded are the result.
+        """
+        self.lifetime = lifetime or datetime.datetime.now() + datetime.timedelta(seconds=self.duration)
+        self.timed_out = False
+
+        moves = self.get_moves(self.state[0], self.state[1])
+        if len(moves) == 0:
+            raise NoMovesError
+
+        self.session.start(self.state)
+        children = self.distinct_moves(self.state, moves)
+        top = len(children) if top is None else top
+        last = depth if depth is not None else self.state[0].count(self.board)
+        for self.max_depth in range(1, last + 1):
+            lines = []
+            try:
+                self.search_root(children, top, lines)
+            except SearchAborted:
+                return
+
+            lines.sort(key=lambda line: (line.score, line.exact), reverse=True)
+            order = dict((move, i) for i, (move, score, exact, pv) in enumerate(lines))
+            children.sort(key=lambda child: order[child[1]])
+            lines = self.complete_lines(moves, lines)
+            self.score = lines[0].score
+            self.session.pv = self.principal_variation(lines[0].move)
+            yield self.max_depth, lines
+
+    def complete_lines(self, moves, lines):
+        """ Returns the lines of the distinct moves with their principal
+            variations, each followed by the lines of the `moves` left out
+            as symmetric to it.
+        """
+        width = self.width
+        twins = collections.defaultdict(list)
+        for move in moves:
+            child, symmetry = canonical(self.next_state(self.state, move))
+            twins[child].append((move, symmetry))
+
+        result = []
+        for move, score, exact, pv in lines:
+            pv = [m for state, m in self.principal_variation(move)]
+            result.append(Line(move, score, exact, pv))
+            child, twin = canonical(self.next_state(self.state, move))
+            for other, symmetry in twins[child]:
+                if other != move:
+                    line = [inverse_move(transform_move(m, twin, width), symmetry, width) for m in pv[1:]]
+                    result.append(Line(other, score, exact, [other] + line))
+        return result
+
+    def principal_variation(self, best):
+        """ Returns the (state, move) pairs of the line expected after `best`,
+            following the moves kept in the transposition table.
+        """
+        line = []
+        state, move = self.state, best
+        while move is not None and len(line) <= self.max_depth:
+            line.append((state, move))
+            state = self.next_state(state, move)
+            move = self.table_move(state)
+            if move not in self.get_moves(state[0], state[1]):
+                move = None
+        return line
+
+    def iterative_deepening(self, soft, keep_searching):
+        """ Returns the best move of searches one ply deeper at a time, until
+            `keep_searching(elapsed, soft, hard, last_iteration, stable)` says
+            to stop, `duration` seconds, the hard limit, run out or the search
+            is stopped. A search cut short is thrown away. The soft limit
+            grows while the best move keeps changing.
+        """
+        start = datetime.datetime.now()
+        lifetime = start + datetime.timedelta(seconds=self.duration)
+        best = score = None
+        stable = 0
+        for depth in range(1, self.state[0].count(self.board) + 1):
+            began = datetime.datetime.now()
+            move = self.alpha_beta_search(depth, lifetime)
+            if self.timed_out:
+                if best is None:
+                    self.max_depth = 0
+                    return move
+                self.score, self.max_depth = score, depth - 1
+                break
+
+            if move == best:
+                stable += 1
+            elif best is not None:
+                stable = 0
+                soft = min(soft * 1.5, self.duration)
+            best, score = move, self.score
+
+            now = datetime.datetime.now()
+            if not keep_searching((now - start).total_seconds(), soft, self.duration,
+                                  (now - began).total_seconds(), stable):
+                break
+        return best
 
     def negamax(self, depth, state, action, alpha, beta):
+        self.visit(True)
         if self.cutoff_test(depth):
             eval = self.ending_evaluation(state[0], self.first_player^(depth&1), action)
             self.complexity += 1
-            sys.stdout.write("\x1b7\x1b[%d;%dfComplexity: %d\x1b8" % (13, 22, self.complexity))
-            sys.stdout.flush()
+            if self.display:
+                sys.stdout.write("\x1b7\x1b[%d;%dfComplexity: %d\x1b8" % (13, 22, self.complexity))
+                sys.stdout.flush()
             return eval
 
-        value = alpha
-        moves = self.get_moves(state[0], state[1])
+        key, symmetry = canonical(state)
+        remaining = self.max_depth - depth
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= remaining:
+            kind, stored = entry[1], entry[2]
+            if kind == EXACT or (kind == LOWER and stored >= beta) or (kind == UPPER and stored <= alpha):
+                return min(max(stored, alpha), beta)
+
+        value, best = alpha, None
+        hint = entry and entry[3] and inverse_move(entry[3], symmetry, self.width)
+        moves = self.order(self.get_moves(state[0], state[1]), hint, depth, state[1])
         for move in moves:
-            value = max([value, -self.negamax(depth + 1, self.next_state(state, move), move, -beta, -value)])
+            score = -self.negamax(depth + 1, self.next_state(state, move), move, -beta, -value)
+            if score > value:
+                value, best = score, move
             if value >= beta:
-                return value
+                self.cutoff(move, depth, remaining, state[1])
+                break
 
+        self.store(key, remaining, LOWER if value >= beta else UPPER if value <= alpha else EXACT, value,
+                   best and transform_move(best, symmetry, self.width))
         return value
 
+    def order(self, moves, hint, depth, player):
+        """ Returns the moves in the order to search them: the move of the
+            transposition table, the killer moves of the ply, then the
+            moves with the highest history scores.
+        """
+        killers = self.killers[depth] if depth < len(self.killers) else ()
+        history = self.history
+
+        def rank(move):
+            if move == hint:
+                return -2, 0
+            if move in killers:
+                return -1, killers.index(move)
+            return 0, -history.get((player, move), 0)
+
+        return sorted(moves, key=rank)
+
+    def cutoff(self, move, depth, remaining, player):
+        """ Remembers a move that caused a beta cutoff `remaining` plies
+            above the leaves, as a killer of its ply and in the history.
+        """
+        while len(self.killers) <= depth:
+            self.killers.append([])
+        killers = self.killers[depth]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[player, move] = self.history.get((player, move), 0) + remaining * remaining
+
+    def store(self, key, depth, kind, value, move=None):
+        """ Keeps the value of a position searched `depth` plies deep, and
+            its best move, in the transposition table. The key is the
+            canonical position, and the move is on its board.
+        """
+        if len(self.table) >= TABLE_SIZE:
+            self.table.clear()
+        self.table[key] = (depth, kind, value, move)
+
+    def table_move(self, state):
+        """ Returns the best move the transposition table holds for `state`,
+            on the board of `state`, or None.
+        """
+        key, symmetry = canonical(state)
+        entry = self.table.get(key)
+        if entry is None or entry[3] is None:
+            return None
+        return inverse_move(entry[3], symmetry, self.width)
+
+    def distinct_moves(self, state, moves):
+        """ Returns (next state, move) for the moves of `state`, leaving out
+            moves leading to a position symmetric to that of an earlier move.
+        """
+        seen = set()
+        result = []
+        for move in moves:
+            child = self.next_state(state, move)
+            key = canonical_key(child)
+            if key not in seen:
+                seen.add(key)
+                result.append((child, move))
+        return result
+
+    def solve(self):
+        """ Searches to the end of the game and returns (score, move), where
+            the score is the final disc difference for the player to move with
+            the empty squares going to the winner. A stopped search returns
+            the best move so far, with the score it is sure of.
+
+            With a cache, a position solved before is answered from it, and
+            the results of this search are written to it.
+        """
+        moves = sorted(self.get_moves(self.state[0], self.state[1]))
+        if len(moves) == 0:
+            raise NoMovesError
+
+        if self.cache is not None:
+            root, symmetry = canonical(self.state)
+            entry = self.cache.get(root)
+            if entry is not None and entry[0] == EXACT and entry[3] >= 0:
+                tile = entry[3]
+                return entry[1], inverse_move((tile % self.width, tile // self.width), symmetry, self.width)
+
+        self.timed_out = False
+        best, alpha = None, -len(self.state[0]) - 1
+        try:
+            for state, move in self.distinct_moves(self.state, moves):
+                value = -self.exact(state, -len(self.state[0]) - 1, -alpha, False)
+                if value > alpha:
+                    best, alpha = move, value
+        except SearchAborted:
+            if best is None:
+                return None, moves[0]
+        finally:
+            if self.cache is not None:
+                if not self.timed_out:
+                    x, y = transform_move(best, symmetry, self.width)
+                    self.cache.put(root, EXACT, alpha, self.state[0].count(self.board), x + y * self.width)
+                self.cache.flush()
+
+        return alpha, best
+
+    def exact(self, state, alpha, beta, passed):
+        self.visit(False)
+        moves = self.get_moves(state[0], state[1])
+        if not moves:
+            if passed:
+                return self.final_score(state[0], state[1], self.opponent(state[1]))
+            return -self.exact((state[0], self.opponent(state[1])), -beta, -alpha, True)
+
+        key = canonical_key(state)
+        entry = self.solved.get(key)
+        if entry is not None:
+            kind, stored = entry
+            if kind == EXACT or (kind == LOWER and stored >= beta) or (kind == UPPER and stored <= alpha):
+                return stored
+
+        empties = state[0].count(self.board) if self.cache is not None else 0
+        cached = self.cache is not None and empties >= self.cache.min_empties
+        if cached:
+            entry = self.cache.get(key)
+            if entry is not None:
+                kind, stored = entry[:2]
+                if kind == EXACT or (kind == LOWER and stored >= beta) or (kind == UPPER and stored <= alpha):
+                    return stored
+
+        value = alpha
+        for move in sorted(moves):
+            value = max(value, -self.exact(self.next_state(state, move), -beta, -value, False))
+            if value >= beta:
+                break
+
+        if len(self.solved) >= TABLE_SIZE:
+            self.solved.clear()
+        kind = LOWER if value >= beta else UPPER if value <= alpha else EXACT
+        self.solved[key] = (kind, value)
+        if cached:
+            self.cache.put(key, kind, value, empties)
+        return value
+
+    def final_score(self, state, player, opponent):
+        player_piece   = state.count(player)
+        opponent_piece = state.count(opponent)
+        if player_piece > opponent_piece:
+            return len(state) - 2 * opponent_piece
+        elif player_piece < opponent_piece:
+            return 2 * player_piece - len(state)
+        return 0
+
     def opening_evaluation(self, state, player, action):
         board  = self.board
-        placed = action[0] + (action[1] * WIDTH)
+        placed = action[0] + (action[1] * self.width)
         parity_count = [1]
+        corners, x_squares, c_squares, edges = self.squares
 
-        X = (state[0]  == board and state[9]  == player) + \
-            (state[7]  == board and state[14] == player) + \
-            (state[56] == board and state[49] == player) + \
-            (state[63] == board and state[54] == player)
+        X = sum(state[corner] == board and state[x] == player for corner, x in x_squares)
 
-        C = (state[0]  == board and (placed == 1  or placed == 8 )) or \
-            (state[7]  == board and (placed == 6  or placed == 15)) or \
-            (state[56] == board and (placed == 48 or placed == 57)) or \
-            (state[63] == board and (placed == 55 or placed == 62))
+        C = any(state[corner] == board and placed in c for corner, c in c_squares)
 
-        parity = 1 if self.parity(0, copy.copy(state), placed, parity_count) else -0.45 #odd: 1, even: -0.45
+        parity = 1 if self.parity(0, bytearray(state), placed, parity_count) else -1
 
-        eval = (X*-50) + (C*-20) + (parity*100)
-        sys.stdout.write("\x1b7\x1b[%d;%dfOpening eval: %f\x1b8" % (11, 22, eval))
+        x_weight, c_weight, odd_weight, even_weight = self.weights['opening']
+        eval = (X*x_weight) + (C*c_weight) + (odd_weight if parity > 0 else even_weight)
+        if self.display:
+            sys.stdout.write("\x1b7\x1b[%d;%dfOpening eval: %f\x1b8" % (11, 22, eval))
         return eval
 
     def ending_evaluation(self, state, player_to_check, action):
-        board    = self.board
-        player   = player_to_check
-        opponent = self.opponent(player)
-        edge_eval = mobility = corner_eval = stability_eval = 0
-
-        player_piece   = len([p for p in state if p == player  ])
-        opponent_piece = len([p for p in state if p == opponent])
-        count_eval = (player_piece - opponent_piece) / (player_piece + opponent_piece)
-
-        player_move   = len(self.get_moves(state, player))
-        opponent_move = len(self.get_moves(self.next_state((state, player), action)[0], opponent))
-        if player_move + opponent_move:
-            mobility = (player_move - opponent_move) / (player_move + opponent_move)
-
-        corner_player   = (state[0]  == player  ) + (state[7]  == player  ) + \
-                          (state[56] == player  ) + (state[63] == player  )
-        corner_opponent = (state[0]  == opponent) + (state[7]  == opponent) + \
-                          (state[56] == opponent) + (state[63] == opponent)
-        if corner_player + corner_opponent:
-            corner_eval = (corner_player - corner_opponent) / (corner_player + corner_opponent)
-
-        edge_player   = len([p for i, p in enumerate(state) if p == player   and (i%8==0 or i%8==7 or i/8==0 or i/8==7)])
-        edge_opponent = len([p for i, p in enumerate(state) if p == opponent and (i%8==0 or i%8==7 or i/8==0 or i/8==7)])
-        if edge_player + edge_opponent:
-            edge_eval = (edge_player - edge_opponent) / (edge_player + edge_opponent)
-
-        player_stability   = self.stability(state, player, opponent)
-        opponent_stability = self.stability(self.next_state((state, player), action)[0], opponent, player)
-        if player_stability + opponent_stability:
-            stability_eval = (player_stability - opponent_stability) / (player_stability + opponent_stability)
-
-        eval = (count_eval*100)  + (corner_eval*100) + (edge_eval*100) + (mobility*100) + (stability_eval*100)
-        sys.stdout.write("\x1b7\x1b[%d;%dfEnding eval: %f\x1b8" % (12, 22, eval))
+        """ Returns the evaluation of `state` for `player_to_check`, from
+            its features. The last move, `action`, is already on the board.
+        """
+        features = self.features(state, player_to_check)
+
+        def ratio(pair):
+            mine, theirs = pair
+            return (mine - theirs) / (mine + theirs) if mine + theirs else 0
+
+        count_weight, corner_weight, edge_weight, mobility_weight, stability_weight = \
+            self.ending_weights[features.empties]
+        eval = (ratio(features.discs)*count_weight) + (ratio(features.corners)*corner_weight) + \
+               (ratio(features.edges)*edge_weight) + (ratio(features.mobility)*mobility_weight) + \
+               (ratio(features.stability)*stability_weight)
+        if self.display:
+            sys.stdout.write("\x1b7\x1b[%d;%dfEnding eval: %f\x1b8" % (12, 22, eval))
         return eval
 
+    def features(self, state, player):
+        """ Returns the Features of `state` for `player` from one pass over
+            the tiles. Every empty square is checked for a move of either
+            side and for neighbouring discs. Every disc is counted, and the
+            discs of the other side in a line running from it to an empty
+            square are marked unstable.
+        """
+        board, rays = self.board, self.rays
+        corners, x_squares, c_squares, edges = self.squares
+        # Counts by cell code, white and black being 0 and 1.
+        discs, corner, edge, mobility, potential = [0, 0], [0, 0], [0, 0], [0, 0], [0, 0]
+        unstable = (set(), set())
+        empties = 0
+
+        for tile, colour in enumerate(state):
+            if colour == board:
+                empties += 1
+                near, can_move = [False, False], [False, False]
+                for ray in rays[tile]:
+                    first = state[ray[0]]
+                    if first == board:
+                        continue
+                    near[first] = True
+                    if not can_move[first ^ 1]:
+                        for t in ray:
+                            if state[t] != first:
+                                if state[t] != board:
+                                    can_move[first ^ 1] = True
+                                break
+                mobility[0] += can_move[0]
+                mobility[1] += can_move[1]
+                potential[0] += near[1]
+                potential[1] += near[0]
+            else:
+                discs[colour] += 1
+                if tile in corners:
+                    corner[colour] += 1
+                if tile in edges:
+                    edge[colour] += 1
+                other = colour ^ 1
+                for ray in rays[tile]:
+                    for i, t in enumerate(ray):
+                        if state[t] != other:
+                            if i and state[t] == board:
+                                unstable[other].update(ray[:i])
+                            break
+
+        opponent = player ^ 1
+        return Features(empties, (discs[player], discs[opponent]), (corner[player], corner[opponent]),
+                        (edge[player], edge[opponent]), (mobility[player], mobility[opponent]),
+                        (potential[player], potential[opponent]),
+                        (discs[player] - len(unstable[player]), discs[opponent] - len(unstable[opponent])))
+
+    def phase_weights(self, empties):
+        """ Returns the ending evaluation weights for the game phase with
+            `empties` empty squares.
+        """
+        for bound, weights in zip(self.weights['phases'], self.weights['ending']):
+            if empties < bound:
+                return weights
+        return self.weights['ending'][-1]
+
     def opponent(self, player):
         return self.second_player if player is self.first_player else self.first_player
 
     def parity(self, depth, state, placed, count):
-        for d in DIRECTIONS:
-            if outside_board(placed, d):
-                continue
-            if state[placed+d] == self.board:
+        for ray in self.rays[placed]:
+            tile = ray[0]
+            if state[tile] == self.board:
                 count[0] += 1
-                state[placed+d] = 1 #visited
-                self.parity(depth + 1, state, placed+d, count)
+                state[tile] = 1 #visited
+                self.parity(depth + 1, state, tile, count)
 
         if depth == 0:
             return count[0] % 2
 
-    def stability(self, state, player, opponent):
-        bad_piece = set()
-
-        for piece, colour in enumerate(state):
-            if colour != opponent:
-                continue
-
-            for d in DIRECTIONS:
-                if outside_board(piece, d):
-                    continue
-
-                to_store = set()
-                tile = piece + d
-                while state[tile] == player and not outside_board(tile, d):
-                    to_store.add((int(tile%WIDTH), int(tile/HEIGHT)))
-                    tile += d
-
-                if state[tile] == self.board:
-                    bad_piece.update(to_store)
-
-        return state.count(player) - len(bad_piece)
-
     def next_state(self, current_state, action):
-        placed   = action[0] + (action[1] * WIDTH)
-        state    = copy.copy(current_state[0])
-        player   = copy.copy(current_state[1])
+        placed   = action[0] + (action[1] * self.width)
+        state    = bytearray(current_state[0])
+        player   = current_state[1]
         opponent = self.opponent(player)
 
         state[placed] = player
-        for d in DIRECTIONS:
-            if outside_board(placed, d):
+        for ray in self.rays[placed]:
+            if state[ray[0]] != opponent:
                 continue
+            for i, tile in enumerate(ray):
+                if state[tile] != opponent:
+                    if state[tile] == player:
+                        for piece in ray[:i]:
+                            state[piece] = player
+                    break
 
-            to_flip = []
-            tile = placed + d
-            while state[tile] == opponent and not outside_board(tile, d):
-                to_flip.append(tile)
-                tile += d
-
-            if state[tile] == player:
-                for piece in to_flip:
-                    state[piece] = player
-
-        return state, opponent
+        return bytes(state), opponent
 
     def get_moves(self, state, player):
-        """ Returns a generator of (x,y) coordinates.
+        """ Returns the sorted list of (x,y) coordinates.
         """
-        moves = [self.mark_move(self.opponent(player), tile, state, d)
-                 for tile, colour in enumerate(state)
-                 for d in DIRECTIONS
-                 if colour == player and not outside_board(tile, d)]
-
-        return list(set([(x, y) for found, x, y in moves if found]))
-
-    def mark_move(self, opponent, tile, pieces, direction):
-        tile += direction
-
-        while pieces[tile] == opponent and not outside_board(tile, direction):
-            tile += direction
-            if pieces[tile] == self.board:
-                return True, int(tile%WIDTH), int(tile/HEIGHT)
+        board, width = self.board, self.width
+        opponent = self.opponent(player)
+        moves = []
+        for tile, colour in enumerate(state):
+            if colour != board:
+                continue
+            for ray in self.rays[tile]:
+                if state[ray[0]] != opponent:
+                    continue
+                found = False
+                for t in ray:
+                    if state[t] != opponent:
+                        found = state[t] == player
+                        break
+                if found:
+                    moves.append((tile % width, tile // width))
+                    break
 
-        return False, int(tile%WIDTH), int(tile/HEIGHT)
+        return sorted(moves)
 
     def cutoff_test(self, depth):
-        return depth >= self.max_depth or datetime.datetime.now() > self.lifetime
+        return depth >= self.max_depth
+
+    def visit(self, timed):
+        """ Counts a node, or raises SearchAborted instead once the search
+            is out of budget, so a node limit is never exceeded.
+        """
+        if self.out_of_budget(timed):
+            self.timed_out = True
+            raise SearchAborted
+        self.nodes += 1
+
+    def out_of_budget(self, timed):
+        """ Returns True if the search was stopped or has used up its nodes,
+            or, without a node limit, its time when `timed`.
+        """
+        if self.node_limit is not None:
+            if self.nodes >= self.node_limit:
+                return True
+            timed = False
+        if self.nodes % POLL_INTERVAL:
+            return False
+        return self.stop.is_set() or (timed and datetime.datetime.now() > self.lifetime)
@@ -0,0 +1,277 @@
+""" Batch analysis: streams positions from a file through a pool of engines
+    and writes one result line per position, in input order.
+
+    $ python -m game.analyse positions.txt results.tsv --depth 4 --processes 4
+
+    Positions are read one per line in the text form of Position.to_string,
+    or as packed records of Position.pack with --binary. Result lines hold
+    the position, best move, score, depth and node count separated by tabs,
+    with a score of None and a depth of 0 when the search was cut short.
+    With --lines N they end with the N best moves, each as its score and
+    principal variation, separated by ' | '. Running the same command again
+    resumes after the last complete line.
+"""
+import argparse
+import collections
+import itertools
+import math
+import multiprocessing
+import os
+from game.ai import AlphaBetaPruner
+from game.position import Position
+from game.settings import *
+from game.symmetry import canonical, inverse_move
+
+__author__ = 'yuessiah'
+
+RECORD_SIZE = 1 + 2 * ((WIDTH * HEIGHT + 7) // 8)
+
+# Number of analysed positions kept to answer repeated or symmetric positions.
+CACHE_SIZE = 1 << 16
+
+# Profiler of the engine in this process, when profiling.
+_profiler = None
+
+
+def start_profiler(prefix, memory=False):
+    """ Installs a profiler in this process, writing to files named after
+        `prefix` and the process id.
+    """
+    from game.profiler import Profiler
+    global _profiler
+    _profiler = Profiler('{0}.{1}'.format(prefix, os.getpid()), memory)
+    _profiler.install()
+
+
+def stop_profiler():
+    global _profiler
+    if _profiler:
+        _profiler.uninstall()
+        _profiler = None
+
+
+def read_positions(path, binary=False):
+    """ Yields the Positions stored in the file one at a time.
+    """
+    if binary:
+        with open(path, 'rb') as f:
+            while True:
+                record = f.read(RECORD_SIZE)
+                if len(record) < RECORD_SIZE:
+                    return
+                yield Position.unpack(record)
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    yield Position.from_string(line)
+
+
+def analyse(job):
+    """ Searches one position and returns (move, score, depth, nodes, lines).
+        Runs in the worker processes, so the position comes in packed.
+    """
+    packed, tiles, depth, duration, solve_empties, node_limit, cache_file, top = job
+    position = Position.unpack(packed, tiles)
+    if _profiler:
+        _profiler.start_move()
+        try:
+            return _analyse(position, depth, duration, solve_empties, node_limit, cache_file, top)
+        finally:
+            _profiler.end_move(position.to_string())
+    return _analyse(position, depth, duration, solve_empties, node_limit, cache_file, top)
+
+
+def _analyse(position, depth, duration, solve_empties, node_limit, cache_file, top):
+    cache = None
+    if cache_file:
+        from game.cache import shared
+        cache = shared(cache_file)
+    pruner = AlphaBetaPruner(None, duration, position, STATES[position.player], STATES[position.player ^ 1],
+                             display=False, node_limit=node_limit, cache=cache)
+    empties = position.cells.count(BOARD_CELL)
+    lines = ()
+    try:
+        if empties <= solve_empties:
+            score, move = pruner.solve()
+            depth = empties
+            if pruner.timed_out:
+                score, depth = None, 0
+            elif top:
+                lines = ((coordinate(move), score, True, (coordinate(move),)),)
+        elif top:
+            search = pruner.analysis(depth or pruner.default_depth(), top)
+            depth, found = 0, ()
+            for depth, found in search:
+                pass
+            move = found[0].move if found else pruner.get_moves(*pruner.state)[0]
+            score = found[0].score if found else None
+            lines = tuple((coordinate(line.move), line.score, line.exact, tuple(coordinate(m) for m in line.pv))
+                          for line in found[:top])
+        else:
+            move = pruner.alpha_beta_search(depth)
+            score, depth = pruner.score, pruner.max_depth
+            if pruner.timed_out:
+                # The move is the best found so far, but no depth was finished.
+                score, depth = None, 0
+    except NoMovesError:
+        return 'pass', None, 0, pruner.nodes, lines
+
+    return coordinate(move), score, depth, pruner.nodes, lines
+
+
+class _Ready(object):
+    """ Stands in for an AsyncResult when analysing without a pool.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def analyse_stream(positions, depth=None, duration=86400, solve_empties=0, processes=1, cache_size=CACHE_SIZE,
+                   node_limit=None, profile=None, profile_memory=False, cache_file=None, lines=0):
+    """ Yields (position, (move, score, depth, nodes, lines)) for every
+        position in input order. At most a few positions per process are in flight, so
+        memory stays constant whatever the number of positions.
+
+        Positions are analysed in their canonical form, so a position
+        symmetric to a recent one is answered from the cache. With a node
+        limit every search stops after `node_limit` nodes instead of
+        `duration` seconds, so results do not depend on the machine.
+
+        With a `profile` prefix every engine process writes its profiles to
+        files named after the prefix and its process id. With a
+        `cache_file`, solved positions are shared with every other run using it.
+
+        With `lines` the searches deepen one ply at a time and give exact
+        scores to the best `lines` moves. Their (move, score, exact,
+        principal variation) come in best first, at no cost to other
+        moves. Solved positions give their best move only.
+
+        A search that runs out of time or nodes before finishing gives the
+        best move it found, with no score and a depth of 0, or the last
+        depth it completed when deepening.
+    """
+    if profile and processes <= 1:
+        start_profiler(profile, profile_memory)
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, start_profiler if profile else None,
+                                    (profile, profile_memory) if profile else ())
+    window = max(processes, 1) * 4
+    cache = collections.OrderedDict()
+    in_flight = {}
+    pending = collections.deque()
+
+    def finish():
+        position, symmetry, key, result = pending.popleft()
+
+        def restore(move):
+            return coordinate(inverse_move(parse_coordinate(move), symmetry, math.isqrt(len(position.cells))))
+
+        result = result.get()
+        if in_flight.get(key) is not None:
+            del in_flight[key]
+            cache[key] = result
+            if len(cache) > cache_size:
+                cache.popitem(last=False)
+        move = result[0]
+        if move != 'pass':
+            move = restore(move)
+        found = tuple((restore(m), score, exact, tuple(restore(p) for p in pv))
+                      for m, score, exact, pv in result[4])
+        return position, (move,) + tuple(result[1:4]) + (found,)
+
+    try:
+        for position in positions:
+            key, symmetry = canonical(position)
+            if key in cache:
+                cache.move_to_end(key)
+                result = _Ready(cache[key])
+            elif key in in_flight:
+                result = in_flight[key]
+            else:
+                job = (key.pack(), len(key.cells), depth, duration, solve_empties, node_limit, cache_file, lines)
+                result = pool.apply_async(analyse, (job,)) if pool else _Ready(analyse(job))
+                in_flight[key] = result
+            pending.append((position, symmetry, key, result))
+            if len(pending) >= window:
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        if pool:
+            pool.terminate()
+        stop_profiler()
+
+
+def completed_lines(path):
+    """ Returns the number of complete result lines in `path`, dropping a
+        partly written last line left by an interrupted run.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    count = end = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            count += 1
+            end += len(line)
+
+    with open(path, 'r+b') as f:
+        f.truncate(end)
+    return count
+
+
+def format_score(score):
+    return '{0:.2f}'.format(score) if isinstance(score, float) else score
+
+
+def format_result(position, result):
+    move, score, depth, nodes, lines = result
+    fields = [position.to_string(), move, format_score(score), depth, nodes]
+    if lines:
+        fields.append(' | '.join('{0}{1} {2}'.format('' if exact else '<=', format_score(value), ' '.join(pv))
+                                 for m, value, exact, pv in lines))
+    return '\t'.join(str(field) for field in fields) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a file of positions with a pool of engines")
+    parser.add_argument('positions', help="File of positions, one per line")
+    parser.add_argument('output', help="File the results are written to, and resumed from")
+    parser.add_argument('--binary', help="Read packed positions instead of lines", action='store_true')
+    parser.add_argument('--depth', help="Number of plies to search every position", type=int, default=None)
+    parser.add_argument('--time', help="Number of seconds allowed per position", type=float, default=86400)
+    parser.add_argument('--nodes', help="Number of nodes allowed per position, instead of a time limit",
+                        type=int, default=None)
+    parser.add_argument('--solve', help="Solve positions with at most this many empty squares exactly",
+                        type=int, default=0)
+    parser.add_argument('--profile', help="Write profiles of every process to PROFILE.<pid>.txt and .folded")
+    parser.add_argument('--profile-memory', help="Add the memory allocated to the profiles", action='store_true')
+    parser.add_argument('--processes', help="Number of engine processes", type=int, default=os.cpu_count())
+    parser.add_argument('--cache', help="Look up and store solved positions in this cache file")
+    parser.add_argument('--lines', help="Give the scores and principal variations of this many best moves",
+                        type=int, default=0)
+
+    args = parser.parse_args()
+
+    done = completed_lines(args.output)
+    positions = itertools.islice(read_positions(args.positions, args.binary), done, None)
+
+    with open(args.output, 'a') as out:
+        for position, result in analyse_stream(positions, args.depth, args.time, args.solve, args.processes,
+                                                   node_limit=args.nodes, profile=args.profile,
+                                                   profile_memory=args.profile_memory, cache_file=args.cache,
+                                                   lines=args.lines):
+            out.write(format_result(position, result))
+            out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+""" Batch engine: plays many games at once on NumPy bitboards. Every ply the
+    legal moves, the chosen moves, the flips and the passes and game ends of
+    all running games are computed together in a few array operations.
+
+    $ python -m game.batch --games 100000 --seed 1
+    $ python -m game.batch --games 100000 --plies 8 --openings openings.txt
+
+    The first command plays complete random games and reports how fast. The
+    second stops every game after 8 plies and writes the distinct positions
+    reached, up to symmetry, one per line in the text form game.analyse
+    reads. Requires NumPy.
+"""
+import argparse
+import time
+import numpy as np
+from game import bitboard
+from game.position import Position, START
+from game.settings import *
+from game.symmetry import canonical
+
+__author__ = 'yuessiah'
+
+TILES = np.arange(WIDTH * HEIGHT, dtype=np.uint64)
+ONE = np.uint64(1)
+
+
+def lowest(moves):
+    """ Returns the lowest set tile of every board.
+    """
+    return moves & (~moves + ONE)
+
+
+def random_picker(rng):
+    """ Returns a picker choosing one of the legal moves of every board
+        uniformly, with the numpy Generator `rng`.
+    """
+    def pick(own, opp, moves):
+        skip = (rng.random(len(moves)) * bitboard.popcount(moves)).astype(np.int64)
+        for i in range(int(skip.max(initial=0))):
+            moves = np.where(skip > i, moves & (moves - ONE), moves)
+        return lowest(moves)
+    return pick
+
+
+def weighted_picker(weights, rng):
+    """ Returns a picker choosing the legal move on tile t of every board with
+        a probability proportional to weights[t], uniformly where all legal
+        moves weigh 0.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    uniform = random_picker(rng)
+
+    def pick(own, opp, moves):
+        total = np.zeros(len(moves))
+        for tile, weight in enumerate(weights):
+            total += ((moves >> TILES[tile]) & ONE) * weight
+        target = rng.random(len(moves)) * total
+        chosen = np.zeros_like(moves)
+        for tile, weight in enumerate(weights):
+            legal = ((moves >> TILES[tile]) & ONE).astype(bool) & (weight > 0)
+            target -= legal * weight
+            found = legal & (target < 0) & (chosen == 0)
+            chosen[found] = ONE << TILES[tile]
+        missing = chosen == 0
+        if missing.any():
+            chosen[missing] = uniform(own[missing], opp[missing], moves[missing])
+        return chosen
+    return pick
+
+
+class Batch(object):
+    """N games played together.
+
+    `own` and `opp` hold the bitboards of the player to move and of the
+    other player, `player` the cell code of the player to move and `done`
+    whether the game is over, one element per game. A picker is any
+    function taking the own, opp and legal move bitboards of the running
+    games that returns one legal move tile of each.
+    """
+
+    def __init__(self, own, opp, player):
+        self.own = np.array(own, dtype=np.uint64)
+        self.opp = np.array(opp, dtype=np.uint64)
+        self.player = np.array(player, dtype=np.uint8)
+        self.done = np.zeros(len(self.own), dtype=bool)
+        self.plies = 0
+
+
+    @classmethod
+    def start(cls, games):
+        """ Returns `games` games at the start position.
+        """
+        return cls.from_positions([START] * games)
+
+
+    @classmethod
+    def from_positions(cls, positions):
+        """ Returns a game from every 8x8 Position.
+        """
+        own, opp = bitboard.from_positions(positions)
+        return cls(own, opp, [position.player for position in positions])
+
+
+    def positions(self):
+        """ Returns the Position of every game.
+        """
+        white = np.where(self.player == WHITE_CELL, self.own, self.opp)
+        black = np.where(self.player == WHITE_CELL, self.opp, self.own)
+        cells = np.full((len(self.own), len(TILES)), BOARD_CELL, dtype=np.uint8)
+        cells[((white[:, None] >> TILES) & ONE).astype(bool)] = WHITE_CELL
+        cells[((black[:, None] >> TILES) & ONE).astype(bool)] = BLACK_CELL
+        return [Position(row.tobytes(), int(player)) for row, player in zip(cells, self.player)]
+
+
+    def __len__(self):
+        return len(self.own)
+
+
+    def step(self, pick):
+        """ Plays one ply of every running game and returns the number of
+            games still running. Games without a legal move pass, and end
+            when the other player has none either.
+        """
+        running = np.flatnonzero(~self.done)
+        own, opp = self.own[running], self.opp[running]
+        moves = bitboard.legal_moves(own, opp)
+
+        stuck = moves == 0
+        if stuck.any():
+            over = np.zeros_like(stuck)
+            over[stuck] = bitboard.legal_moves(opp[stuck], own[stuck]) == 0
+            self.done[running[over]] = True
+            running, own, opp, moves = running[~over], own[~over], opp[~over], moves[~over]
+
+        playing = moves != 0
+        chosen = np.zeros_like(moves)
+        if playing.any():
+            chosen[playing] = pick(own[playing], opp[playing], moves[playing])
+        flipped = bitboard.flips(own, opp, chosen)
+        self.own[running] = opp & ~flipped
+        self.opp[running] = own | flipped | chosen
+        self.player[running] ^= 1
+        self.plies += 1
+        return len(running)
+
+
+    def play(self, pick, plies=None):
+        """ Plays every game to its end, or `plies` more plies, passes
+            included, and returns the number of games still running.
+        """
+        running = int((~self.done).sum())
+        for _ in range(plies if plies is not None else 2 * len(TILES)):
+            if not running:
+                break
+            running = self.step(pick)
+        return running
+
+
+    def discs(self):
+        """ Returns the numbers of black and white discs of every game.
+        """
+        own, opp = bitboard.popcount(self.own), bitboard.popcount(self.opp)
+        black = self.player == BLACK_CELL
+        return np.where(black, own, opp), np.where(black, opp, own)
+
+
+    def results(self):
+        """ Returns the final disc difference for black of every game, the
+            empty squares going to the winner.
+        """
+        black, white = self.discs()
+        empties = len(TILES) - black - white
+        return black - white + np.sign(black - white) * empties
+
+
+def openings(batch):
+    """ Returns the Positions of the batch, one per class of symmetric
+        positions, in the order first reached.
+    """
+    keys = np.stack([batch.own, batch.opp, batch.player.astype(np.uint64)], axis=1)
+    index = np.sort(np.unique(keys, axis=0, return_index=True)[1])
+    seen = set()
+    result = []
+    for position in Batch(batch.own[index], batch.opp[index], batch.player[index]).positions():
+        key = canonical(position)[0]
+        if key not in seen:
+            seen.add(key)
+            result.append(position)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play random games in batches of NumPy bitboards")
+    parser.add_argument('--games', help="Number of games played at once", type=int, default=100000)
+    parser.add_argument('--plies', help="Stop the games after this many plies", type=int, default=None)
+    parser.add_argument('--seed', help="Seed of the random moves", type=int, default=None)
+    parser.add_argument('--openings', help="Write the distinct positions reached to this file")
+
+    args = parser.parse_args()
+
+    batch = Batch.start(args.games)
+    started = time.perf_counter()
+    running = batch.play(random_picker(np.random.default_rng(args.seed)), args.plies)
+    seconds = time.perf_counter() - started
+    print('{0} games, {1} plies in {2:.2f}s: {3:.0f} games/min, {4:.0f} moves/s'.format(
+        args.games, batch.plies, seconds, args.games / seconds * 60,
+        (bitboard.popcount(batch.own | batch.opp) - 4).sum() / seconds))
+
+    if not running:
+        results = batch.results()
+        print('black {0:.1%}  draw {1:.1%}  white {2:.1%}'.format(
+            (results > 0).mean(), (results == 0).mean(), (results < 0).mean()))
+
+    if args.openings:
+        found = openings(batch)
+        with open(args.openings, 'w') as f:
+            for position in found:
+                f.write(position.to_string() + '\n')
+        print('{0} distinct positions written to {1}'.format(len(found), args.openings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+""" Search benchmark: times the engine on stored endgame positions with known
+    best moves and exact scores, and compares the results with a baseline.
+
+    $ python -m game.benchmark --driver solve --save baseline.json
+    $ python -m game.benchmark --driver solve --baseline baseline.json
+    $ python -m game.benchmark --driver search --depth 4
+    $ python -m game.benchmark --startup
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from game.ai import AlphaBetaPruner
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+# Positions in the style of the FFO test suite, with fewer empty squares so
+# they solve in seconds in Python. Every entry holds a name, the position,
+# all moves reaching the best result and the exact final disc difference
+# for the player to move, empty squares going to the winner.
+SUITE = (
+    ('#1', 'OXXXXXXXOOOOOOO-XOXXXOOO-XOOOXOO--OOXOOO-OOXOOOOO-OXOOOO--OOOOOO X', ('a4',), -6),
+    ('#2', 'OX-OOXXXO-OOXXXXOOOXOXOXOOXOXXOXOOOOOOXXOOXOXOXX-XO-OOOX--XO-O-O X', ('a7',), 20),
+    ('#3', '-XXXXO-OX-X-XXOOOOOX-OXX-OXXOOXXOXXOXXXX-XOXXXOXXXXOOOXX-OXOOXXX X', ('a8',), 2),
+    ('#4', 'XXXXO-X-OOOXOXO-OOOOOO--OOOOOXOOOOOOXOOOOOOOXXOX--OOOOXXOOO-XXXX X', ('f1',), 24),
+    ('#5', 'OOOOO-OXOOOOOOOXOOOXOXOXOOXOXXXX-XOOXXXXXOOOOXXXOOOOO-X-OOO--O-- X', ('f1', 'f7'), -20),
+    ('#6', 'OXXXXXO-OXXXXX--XOXXXXXO-XOOXXOO--OOXOOO-OOXOOOOO-OXOOOO--OOOOOO X', ('a4', 'b7'), -24),
+    ('#7', 'OX-OOXXXO-OOXXXXOOOXOXOXOOXOXXOX-XXXXOXXOOXOXOXX--O-OOOX--XO-O-O X', ('b7',), 20),
+    ('#8', '-XXXXO--X-X-XO-OOOOX-OOX-OXXXOXXOXXOXXXX-XOXXXOXXXXOOOXX-OXOOXXX X', ('g1',), 18),
+    ('#9', 'XXXXO---OOOXOOO-OOO-XO--OOOXOXOOOOOOXOOOOOOOXXOX--OOOOXXOOO-XXXX X', ('d3',), 40),
+    ('#10', 'OOOOO-OXOOOOOOOXOOOXOXOXOOXOOXXX-XOOX-XXXOOOOXXXOOOOO-X--XO--O-- X', ('a8',), 6),
+    ('#11', 'OXXXXXO--XXXXX--XXXXXXXO-XXOXXOO--OXXOOO-OOOOOOOO-O-OOOO--OOOOOO X', ('b5',), -24),
+    ('#12', 'OX-OOXXXO-OOXXXXOOOXOXOXOOXOXXOX-XXXXOXXOOOOXOXX--O-OOOX-----O-O X', ('c1', 'g8'), 18),
+    ('#13', '-XXXXO--X-X-XO--OOOX-OXX-OXXXOXXOXOOXXXX-OOXXXOX-OXOOOXX-OXOOXXX X', ('g1',), 0),
+)
+
+
+def solve_driver(position, depth=None, node_limit=None, cache=None):
+    """ Solves the position and returns (move, score, nodes).
+    """
+    pruner = _pruner(position, node_limit, cache)
+    score, move = pruner.solve()
+    return move, score, pruner.nodes
+
+
+def search_driver(position, depth=None, node_limit=None, cache=None):
+    """ Searches the position to `depth` plies and returns (move, None, nodes).
+    """
+    pruner = _pruner(position, node_limit, cache)
+    move = pruner.alpha_beta_search(depth)
+    return move, None, pruner.nodes
+
+
+def _pruner(position, node_limit=None, cache=None):
+    return AlphaBetaPruner(None, 86400, position, STATES[position.player], STATES[position.player ^ 1],
+                           display=False, node_limit=node_limit, cache=cache)
+
+
+DRIVERS = {'solve': solve_driver, 'search': search_driver}
+
+# Seconds a new interpreter may take to import the game, and a new worker
+# process to start and answer.
+IMPORT_TARGET = 0.1
+SPAWN_TARGET = 0.5
+
+
+def run(suite, driver, depth=None, node_limit=None, profiler=None, cache=None):
+    """ Runs the driver on every entry of the suite and returns a list of
+        result dicts. With a node limit the moves and node counts are the
+        same on every run, so only the times may differ. An installed
+        profiler gets a report for every position, and a PositionCache
+        answers the positions solved before.
+    """
+    results = []
+    for name, text, best, score in suite:
+        position = Position.from_string(text)
+        if profiler:
+            profiler.start_move()
+        started = time.perf_counter()
+        move, found, nodes = DRIVERS[driver](position, depth, node_limit, cache)
+        seconds = time.perf_counter() - started
+        if profiler:
+            profiler.end_move(name)
+        results.append({'position': name, 'driver': driver, 'depth': depth, 'node_limit': node_limit,
+                        'empties': position.cells.count(BOARD_CELL), 'move': coordinate(move), 'score': found,
+                        'correct': coordinate(move) in best and found in (None, score),
+                        'nodes': nodes, 'seconds': seconds, 'nps': nodes / seconds if seconds else 0.0})
+    return results
+
+
+def _ready():
+    return True
+
+
+def startup(runs=5):
+    """ Returns the best seconds over `runs` for a new interpreter to import
+        the game, and for a spawned worker process to start and answer.
+    """
+    script = 'import time; t = time.perf_counter(); import game.game; print(time.perf_counter() - t)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    imports = min(float(subprocess.check_output([sys.executable, '-c', script], cwd=root)) for _ in range(runs))
+
+    context = multiprocessing.get_context('spawn')
+    spawns = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with context.Pool(1) as pool:
+            pool.apply(_ready)
+            spawns.append(time.perf_counter() - started)
+    return imports, min(spawns)
+
+
+def compare(results, baseline):
+    """ Returns lines comparing every result with the matching baseline
+        result, and whether any position stopped being solved correctly.
+    """
+    previous = {(r['position'], r['driver'], r['depth'], r.get('node_limit')): r for r in baseline}
+    lines, regressed = [], False
+    for result in results:
+        old = previous.get((result['position'], result['driver'], result['depth'], result['node_limit']))
+        if old is None:
+            continue
+        if old['correct'] and not result['correct']:
+            regressed = True
+        lines.append('{0:<8} time x{1:.2f}  nodes x{2:.2f}  {3}'.format(
+            result['position'], result['seconds'] / old['seconds'] if old['seconds'] else 0.0,
+            result['nodes'] / old['nodes'] if old['nodes'] else 0.0,
+            'ok' if result['correct'] or not old['correct'] else 'REGRESSED'))
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the engine on positions with known results")
+    parser.add_argument('--driver', help="Search to run", choices=sorted(DRIVERS), default='solve')
+    parser.add_argument('--depth', help="Number of plies for the search driver", type=int, default=None)
+    parser.add_argument('--nodes', help="Stop every search after this many nodes", type=int, default=None)
+    parser.add_argument('--max-empties', help="Skip positions with more empty squares", type=int, default=64)
+    parser.add_argument('--baseline', help="Compare with the results stored in this file")
+    parser.add_argument('--save', help="Store the results in this file as the new baseline")
+    parser.add_argument('--profile', help="Write per-position profiles to PROFILE.txt and call stacks to "
+                        "PROFILE.folded; times are then not comparable")
+    parser.add_argument('--profile-memory', help="Add the memory allocated to the profiles", action='store_true')
+    parser.add_argument('--startup', help="Time imports and worker spawns against their targets instead",
+                        action='store_true')
+    parser.add_argument('--cache', help="Look up and store solved positions in this cache file; times are then "
+                        "not comparable")
+
+    args = parser.parse_args()
+
+    if args.startup:
+        imports, spawn = startup()
+        print('import {0:.1f} ms (target {1:.0f} ms), worker spawn {2:.1f} ms (target {3:.0f} ms)'.format(
+            imports * 1000, IMPORT_TARGET * 1000, spawn * 1000, SPAWN_TARGET * 1000))
+        if imports > IMPORT_TARGET or spawn > SPAWN_TARGET:
+            exit(1)
+        return
+
+    suite = [entry for entry in SUITE if Position.from_string(entry[1]).cells.count(BOARD_CELL) <= args.max_empties]
+    profiler = None
+    if args.profile:
+        from game.profiler import Profiler
+        profiler = Profiler(args.profile, args.profile_memory)
+        profiler.install()
+    cache = None
+    if args.cache:
+        from game.cache import PositionCache
+        cache = PositionCache(args.cache)
+    results = run(suite, args.driver, args.depth, args.nodes, profiler, cache)
+    if cache is not None:
+        cache.close()
+
+    for result in results:
+        print('{position:<8} {empties:>2} empties  {move} {score!s:>4}  {nodes:>9} nodes {seconds:>8.3f}s '
+              '{nps:>9.0f} nodes/s  {0}'.format('ok' if result['correct'] else 'WRONG', **result))
+    print('{0}/{1} correct, {2} nodes in {3:.3f}s'.format(
+        sum(r['correct'] for r in results), len(results),
+        sum(r['nodes'] for r in results), sum(r['seconds'] for r in results)))
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            lines, regressed = compare(results, json.load(f)['results'])
+        print('\n'.join(lines))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'results': results}, f, indent=1)
+
+    if regressed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
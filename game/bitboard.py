@@ -0,0 +1,156 @@
+""" Vectorised bitboard operations on NumPy uint64 arrays, one board per
+    element. Bit i stands for tile i, so tile x + y * WIDTH.
+
+    Requires NumPy, which the game itself does not need.
+"""
+import numpy as np
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+NOT_A_FILE = np.uint64(0xFEFEFEFEFEFEFEFE)
+NOT_H_FILE = np.uint64(0x7F7F7F7F7F7F7F7F)
+CORNERS = np.uint64(0x8100000000000081)
+EDGES = np.uint64(0xFF818181818181FF)
+
+# (shift, mask) per direction, a negative shift moving towards bit 0.
+SHIFTS = {
+    NORTH: (-8, FULL),
+    NORTHEAST: (-7, NOT_A_FILE),
+    EAST: (1, NOT_A_FILE),
+    SOUTHEAST: (9, NOT_A_FILE),
+    SOUTH: (8, FULL),
+    SOUTHWEST: (7, NOT_H_FILE),
+    WEST: (-1, NOT_H_FILE),
+    NORTHWEST: (-9, NOT_H_FILE),
+}
+
+
+def shift(boards, direction):
+    """ Moves every disc one tile in `direction`, dropping those leaving the board.
+    """
+    amount, mask = SHIFTS[direction]
+    if amount > 0:
+        return (boards << np.uint64(amount)) & mask
+    return (boards >> np.uint64(-amount)) & mask
+
+
+def popcount(boards):
+    """ Returns the number of set bits of every board.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(boards).astype(np.int64)
+    boards = boards - ((boards >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    boards = (boards & np.uint64(0x3333333333333333)) + ((boards >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    boards = (boards + (boards >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((boards * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def legal_moves(own, opp):
+    """ Returns the bitboards of the tiles `own` can play on.
+    """
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for d in DIRECTIONS:
+        run = shift(own, d) & opp
+        for _ in range(5):
+            run |= shift(run, d) & opp
+        moves |= shift(run, d) & empty
+    return moves
+
+
+def flips(own, opp, moves):
+    """ Returns the discs of `opp` that `own` turns over by playing the one
+        tile set in each of `moves`, nothing where no tile is set.
+    """
+    flipped = np.zeros_like(own)
+    for d in DIRECTIONS:
+        run = shift(moves, d) & opp
+        for _ in range(5):
+            run |= shift(run, d) & opp
+        flipped |= np.where(shift(run, d) & own, run, np.uint64(0))
+    return flipped
+
+
+def unstable(own, opp):
+    """ Returns the discs of `own` that sit in a line running from a disc of
+        `opp` to an empty tile, the ones AlphaBetaPruner.features counts as unstable.
+    """
+    empty = ~(own | opp)
+    bad = np.zeros_like(own)
+    for d in DIRECTIONS:
+        back = -d
+        run = shift(opp, d) & own
+        for _ in range(5):
+            run |= shift(run, d) & own
+        open_run = shift(empty, back) & run
+        for _ in range(5):
+            open_run |= shift(open_run, back) & run
+        bad |= open_run
+    return bad
+
+
+def flip_vertical(boards):
+    """ Returns the boards upside down, row y going to row 7 - y.
+    """
+    return boards.byteswap()
+
+
+def mirror(boards):
+    """ Returns the boards left to right, column x going to column 7 - x.
+    """
+    for amount, mask in ((1, 0x5555555555555555), (2, 0x3333333333333333), (4, 0x0F0F0F0F0F0F0F0F)):
+        amount, mask = np.uint64(amount), np.uint64(mask)
+        boards = ((boards >> amount) & mask) | ((boards & mask) << amount)
+    return boards
+
+
+def transpose(boards):
+    """ Returns the boards flipped about the a1-h8 diagonal, tile (x, y)
+        going to (y, x).
+    """
+    for amount, mask in ((28, 0x0F0F0F0F00000000), (14, 0x3333000033330000), (7, 0x5500550055005500)):
+        amount, mask = np.uint64(amount), np.uint64(mask)
+        t = mask & (boards ^ (boards << amount))
+        boards = boards ^ t ^ (t >> amount)
+    return boards
+
+
+def symmetries(boards):
+    """ Yields the boards under each of the 8 symmetries of the square, in
+        the same order for any boards.
+    """
+    for turned in (boards, transpose(boards)):
+        for flipped in (turned, flip_vertical(turned)):
+            yield flipped
+            yield mirror(flipped)
+
+
+def canonical(own, opp):
+    """ Returns the (own, opp) boards of the symmetry of every position
+        that sorts first, the same for all symmetric positions.
+    """
+    best_own, best_opp = own, opp
+    for o, p in zip(symmetries(own), symmetries(opp)):
+        better = (o < best_own) | ((o == best_own) & (p < best_opp))
+        best_own, best_opp = np.where(better, o, best_own), np.where(better, p, best_opp)
+    return best_own, best_opp
+
+
+def from_positions(positions):
+    """ Returns (own, opp) bitboard arrays of the player to move in each Position.
+    """
+    size = (WIDTH * HEIGHT + 7) // 8
+    own, opp = [], []
+    for position in positions:
+        packed = position.pack()
+        white = int.from_bytes(packed[1:1 + size], 'little')
+        black = int.from_bytes(packed[1 + size:], 'little')
+        if position.player == WHITE_CELL:
+            own.append(white)
+            opp.append(black)
+        else:
+            own.append(black)
+            opp.append(white)
+    return np.array(own, dtype=np.uint64), np.array(opp, dtype=np.uint64)
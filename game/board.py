@@ -1,33 +1,91 @@
+from game import tables
 from game.piece import Piece
+from game.position import Position
 from game.settings import *
 
 __author__ = 'bengt, yuessiah'
 
+# Maps MOVE marks back to BOARD so marked and unmarked boards share a key.
+_UNMARK = bytes.maketrans(bytes((MOVE_CELL,)), bytes((BOARD_CELL,)))
 
-class Board(object):
-    """Board represents the current state of the Reversi board."""
 
-    def __init__(self, colour):
-        self.width  = WIDTH
-        self.height = HEIGHT
-        self.pieces = list((Piece(x, y, colour)
+class Board(object):
+    """Board represents the current state of the Reversi board.
+
+    The state lives in a single bytearray of cell codes (see settings.CELLS),
+    the `pieces` are views on it that are only built when asked for.
+    """
+
+    def __init__(self, colour, width=WIDTH, height=HEIGHT):
+        self.width  = width
+        self.height = height
+        self.colour = colour
+        self.rays   = tables.rays(width, height)
+        self.cells  = bytearray((BOARD_CELL,)) * (self.width * self.height)
+        self.flips  = bytearray(self.width * self.height)
+        self._pieces = None
+        self._moves_key = None
+        self._moves = {}
+
+
+    @property
+    def pieces(self):
+        """ Returns the list of Piece views on the board, row by row.
+        """
+        if self._pieces is None:
+            self._pieces = [Piece(x, y, self.colour, self.cells, self.flips, x + (y * self.width))
                             for y in range(0, self.height)
-                            for x in range(0, self.width)))
+                            for x in range(0, self.width)]
+        return self._pieces
+
+
+    def copy(self):
+        """ Returns an independent copy of the board.
+        """
+        board = Board.__new__(Board)
+        board.width  = self.width
+        board.height = self.height
+        board.colour = self.colour
+        board.rays   = self.rays
+        board.cells  = self.cells[:]
+        board.flips  = self.flips[:]
+        board._pieces = None
+        board._moves_key = self._moves_key
+        board._moves = self._moves
+        return board
+
+    __copy__ = copy
+
+
+    def set_position(self, position):
+        """ Sets the pieces to those of the specified Position, which must
+            have the size of the board.
+        """
+        if len(position.cells) != len(self.cells):
+            raise ValueError
+        self.cells[:] = position.cells
+
+
+    def snapshot(self, player):
+        """ Returns an immutable Position of the board with `player` to move.
+        """
+        return Position(bytes(self.cells).translate(_UNMARK), CELLS[player])
 
 
     def draw(self):
         """ Returns a representation of the board in monochrome or 256 RGB colour.
         """
-        labels = "  a.b.c.d.e.f.g.h."
+        margin = len(str(self.height))
+        labels = ' ' * margin + ' ' + ''.join(chr(ord('a') + x) + '.' for x in range(self.width))
 
         grid = ''
         i = 0
-        for row_of_pieces in chunks(self.pieces, 8):
+        for row_of_pieces in chunks(self.pieces, self.width):
             row = ''
             for p in row_of_pieces:
                 row += p.draw()
 
-            grid += '{0} {1}{0}\n'.format(str(i + 1), row)
+            grid += '{0:>{2}} {1}{0}\n'.format(str(i + 1), row, margin)
 
             i += 1
 
@@ -35,22 +93,28 @@ class Board(object):
         return output
 
 
+    def count(self, state):
+        """ Returns the number of pieces in the specified state.
+        """
+        return self.cells.count(CELLS[state])
+
+
     def set_white(self, x, y):
         """ Sets the specified piece's state to WHITE.
         """
-        self.pieces[x + (y * self.width)].set_white()
+        self.cells[x + (y * self.width)] = WHITE_CELL
 
 
     def set_black(self, x, y):
         """ Sets the specified piece's state to BLACK.
         """
-        self.pieces[x + (y * self.width)].set_black()
+        self.cells[x + (y * self.width)] = BLACK_CELL
 
 
     def set_move(self, x, y):
         """ Sets the specified piece's state to MOVE.
         """
-        self.pieces[x + (y * self.width)].set_move()
+        self.cells[x + (y * self.width)] = MOVE_CELL
 
 
     def flip(self, x, y):
@@ -62,15 +126,61 @@ class Board(object):
     def set_flipped(self, x, y):
         """ Sets the specified piece as flipped.
         """
-        self.pieces[x + (y * self.width)].set_flipped()
+        self.flips[x + (y * self.width)] = True
 
 
     def get_move_pieces(self, player):
         """ Returns a list of moves for the specified player.
         """
-        self.mark_moves(player)
-        moves = [piece for piece in self.pieces if piece.get_state() == MOVE]
-        self.clear_moves()
+        pieces = self.pieces
+        return [pieces[tile] for tile in self.get_flips(player)]
+
+
+    def legal_moves(self, player):
+        """ Returns the set of (x, y) coordinates the specified player can play.
+        """
+        return frozenset((tile % self.width, tile // self.width) for tile in self.get_flips(player))
+
+
+    def get_flips(self, player):
+        """ Returns a dict mapping each legal tile of the specified player to
+            the tiles its move flips, in row-major order.
+
+            The result is computed once per position and player, any change
+            to the cells invalidates it.
+        """
+        key = bytes(self.cells).translate(_UNMARK)
+        if key != self._moves_key:
+            self._moves_key = key
+            self._moves = {}
+
+        player = CELLS[player]
+        moves = self._moves.get(player)
+        if moves is None:
+            moves = self._moves[player] = self._find_flips(player)
+        return moves
+
+
+    def _find_flips(self, player):
+        cells = self.cells
+        opponent = player ^ 1
+        moves = {}
+        for tile, cell in enumerate(cells):
+            if cell < BOARD_CELL:
+                continue
+
+            flips = []
+            for ray in self.rays[tile]:
+                if cells[ray[0]] != opponent:
+                    continue
+                for i, t in enumerate(ray):
+                    if cells[t] != opponent:
+                        if cells[t] == player:
+                            flips.extend(ray[:i])
+                        break
+
+            if flips:
+                moves[tile] = tuple(flips)
         return moves
 
 
@@ -80,77 +190,63 @@ class Board(object):
 
             Returns: void
         """
-        [self.mark_move(player, p, d)
-         for p in self.pieces
-         for d in DIRECTIONS
-         if p.get_state() == player]
+        cells = self.cells
+        for tile in self.get_flips(player):
+            cells[tile] = MOVE_CELL
 
 
     def mark_move(self, player, piece, direction):
         """ Will mark moves from the current 'piece' in 'direction'.
         """
         x, y = piece.get_position()
-        opponent = get_opponent(player)
-        if outside_board(x + (y * WIDTH), direction):
+        self._mark_move(CELLS[player], x + (y * self.width), direction)
+
+
+    def _mark_move(self, player, tile, direction):
+        cells = self.cells
+        opponent = player ^ 1
+        if outside_board(tile, direction, self.width, self.height):
             return
 
-        tile = (x + (y * WIDTH)) + direction
+        tile += direction
 
-        if self.pieces[tile].get_state() == opponent:
-            while self.pieces[tile].get_state() == opponent:
-                if outside_board(tile, direction):
+        if cells[tile] == opponent:
+            while cells[tile] == opponent:
+                if outside_board(tile, direction, self.width, self.height):
                     break
                 else:
                     tile += direction
 
-            if self.pieces[tile].get_state() == BOARD:
-                self.pieces[tile].set_move()
+            if cells[tile] == BOARD_CELL:
+                cells[tile] = MOVE_CELL
 
 
     def make_move(self, coordinates, player):
         """ Will modify the internal state to represent performing the
             specified move for the specified player.
         """
-        moves = [piece.get_position() for piece in self.get_move_pieces(player)]
-        if coordinates not in moves:
+        x, y = coordinates
+        placed = x + (y * self.width)
+        flips = self.get_flips(player).get(placed) \
+            if 0 <= x < self.width and 0 <= y < self.height else None
+        if flips is None:
             raise ValueError
 
-        placed = coordinates[0] + (coordinates[1] * WIDTH)
-
-        p = self.pieces[placed]
-        if player == WHITE:
-            p.set_white()
-        else:
-            p.set_black()
-
-        for d in DIRECTIONS:
-            if outside_board(placed, d):
-                continue
-
-            tile = start = placed + d
-
-            to_flip = []
-            while self.pieces[tile].get_state() != BOARD:
-                if self.pieces[tile].get_state() == player or outside_board(tile, d):
-                    break
-                else:
-                    to_flip.append(self.pieces[tile])
-                    tile += d
-
-            if self.pieces[tile].get_state() == player:
-                for pp in to_flip:
-                    if player == WHITE:
-                        pp.set_white()
-                    else:
-                        pp.set_black()
+        self.clear_moves()
+        cells = self.cells
+        player = CELLS[player]
+        cells[placed] = player
+        for tile in flips:
+            cells[tile] = player
 
-            self.pieces[start].reset_flipped()
+        for ray in self.rays[placed]:
+            self.flips[ray[0]] = False
 
 
     def clear_moves(self):
         """ Sets all move pieces to board pieces.
         """
-        [x.set_board() for x in self.pieces if x.get_state() == MOVE]
+        self.cells[:] = self.cells.replace(bytes((MOVE_CELL,)), bytes((BOARD_CELL,)))
 
 
     def __repr__(self):
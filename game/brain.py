@@ -6,13 +6,21 @@ __author__ = 'bengt'
 
 
 class Brain(threading.Thread):
-    def __init__(self, duration, mutex, q, pieces, first_player, second_player):
+    def __init__(self, duration, mutex, q, position, first_player, second_player, soft=None,
+                 keep_searching=None, node_limit=None, session=None, display=True):
         self.mutex = mutex
         self.q = q
         self.duration = duration
-        self.pieces = pieces
+        self.position = position
         self.first_player = first_player
         self.second_player = second_player
+        self.soft = soft
+        self.keep_searching = keep_searching
+        self.node_limit = node_limit
+        self.session = session
+        self.display = display
+        self.stop_event = threading.Event()
+        self.pruner = None
         self.has_started = False
         self.lifetime = None
         threading.Thread.__init__(self)
@@ -20,9 +28,22 @@ class Brain(threading.Thread):
 
     def run(self):
         """ Starts the Minimax algorithm with the Alpha-Beta Pruning optimization
-            and puts the result in a queue once done.
+            and puts the result in a queue once done. With a soft limit the
+            search deepens one ply at a time until the time manager stops it.
         """
-        pruner = AlphaBetaPruner(self.mutex, self.duration, self.pieces, self.first_player, self.second_player)
-        result = pruner.alpha_beta_search()
+        pruner = AlphaBetaPruner(self.mutex, self.duration, self.position, self.first_player, self.second_player,
+                                 stop=self.stop_event, node_limit=self.node_limit, session=self.session,
+                                 display=self.display)
+        self.pruner = pruner
+        if self.soft is None:
+            result = pruner.alpha_beta_search()
+        else:
+            result = pruner.iterative_deepening(self.soft, self.keep_searching)
         self.q.put(result)
 
+
+    def stop(self):
+        """ Tells the search to finish. The best move found so far is put in
+            the queue a few milliseconds later.
+        """
+        self.stop_event.set()
@@ -0,0 +1,163 @@
+""" Persistent cache of solved positions, shared by every engine process.
+
+    Entries live in an SQLite database in WAL mode, so any number of
+    processes read it while one of them writes. Positions are keyed by the
+    packed form of their canonical position. Every entry holds the kind of
+    value (EXACT, LOWER or UPPER bound), the value, the number of empty
+    squares searched below it and the best move in the canonical
+    orientation, or -1. Writes are buffered and go in one transaction per
+    flush. Past `max_entries` the entries searched the least deep, then the
+    oldest, are dropped and the file is compacted.
+
+    $ python -m game.cache cache.db
+    $ python -m game.cache cache.db --compact --max-entries 100000
+"""
+import argparse
+import sqlite3
+import time
+from game.ai import EXACT
+from game.position import Position
+
+__author__ = 'yuessiah'
+
+# Number of entries the cache keeps, and the share of them left by compaction.
+MAX_ENTRIES = 1 << 20
+KEEP = 0.75
+
+# Positions with fewer empty squares are solved again rather than looked up.
+MIN_EMPTIES = 6
+
+# Seconds a process waits for another one to finish writing.
+TIMEOUT = 30
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS positions (
+    key BLOB PRIMARY KEY,
+    kind INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    move INTEGER NOT NULL,
+    stamp REAL NOT NULL
+) WITHOUT ROWID'''
+
+# Keeps the deeper of two entries, and an exact value over a bound.
+UPSERT = '''INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET kind = excluded.kind, value = excluded.value, depth = excluded.depth,
+    move = excluded.move, stamp = excluded.stamp
+WHERE excluded.depth > positions.depth OR (excluded.depth = positions.depth AND excluded.kind = {0})'''.format(EXACT)
+
+_opened = {}
+
+
+class PositionCache(object):
+    """Solved positions stored in the SQLite database at `path`."""
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, min_empties=MIN_EMPTIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.min_empties = min_empties
+        self.pending = {}
+        self.hits = self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=TIMEOUT, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute(SCHEMA)
+
+
+    def get(self, position):
+        """ Returns (kind, value, depth, move) stored for the canonical
+            (cells, player) position, or None.
+        """
+        key = Position(*position).pack()
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.connection.execute('SELECT kind, value, depth, move FROM positions WHERE key = ?',
+                                            (key,)).fetchone()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(entry[:4])
+
+
+    def put(self, position, kind, value, depth, move=-1):
+        """ Keeps the value of the canonical (cells, player) position until
+            the next flush. `move` is the tile of the best move, or -1.
+        """
+        key = Position(*position).pack()
+        old = self.pending.get(key)
+        if old is None or depth > old[2] or (depth == old[2] and kind == EXACT):
+            self.pending[key] = (kind, value, depth, move, time.time())
+
+
+    def flush(self):
+        """ Writes the buffered entries, and compacts the cache once it holds
+            more than `max_entries`.
+        """
+        if not self.pending:
+            return
+        with self.connection:
+            self.connection.executemany(UPSERT, ((key,) + entry for key, entry in self.pending.items()))
+        self.pending.clear()
+        if len(self) > self.max_entries:
+            self.compact()
+
+
+    def compact(self, max_entries=None):
+        """ Drops the shallowest and oldest entries down to KEEP of
+            `max_entries` and gives the freed space back to the file system.
+        """
+        keep = int((max_entries or self.max_entries) * KEEP)
+        with self.connection:
+            self.connection.execute('DELETE FROM positions WHERE key IN (SELECT key FROM positions '
+                                    'ORDER BY depth, stamp LIMIT max(0, (SELECT count(*) FROM positions) - ?))',
+                                    (keep,))
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.connection.execute('VACUUM')
+
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+    def __len__(self):
+        return self.connection.execute('SELECT count(*) FROM positions').fetchone()[0]
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def shared(path):
+    """ Returns the cache at `path` of this process, opening it on first use.
+    """
+    cache = _opened.get(path)
+    if cache is None:
+        cache = _opened[path] = PositionCache(path)
+    return cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or compact a cache of solved positions")
+    parser.add_argument('path', help="Cache file")
+    parser.add_argument('--compact', help="Drop entries down to the cap and shrink the file", action='store_true')
+    parser.add_argument('--max-entries', help="Number of entries to keep", type=int, default=MAX_ENTRIES)
+
+    args = parser.parse_args()
+
+    with PositionCache(args.path, args.max_entries) as cache:
+        if args.compact:
+            cache.compact()
+        rows = cache.connection.execute('SELECT depth, kind, count(*) FROM positions GROUP BY depth, kind').fetchall()
+        print('{0} entries'.format(len(cache)))
+        for depth, kind, count in rows:
+            print('{0:>3} empties  {1:<5} {2:>9}'.format(depth, ('exact', 'lower', 'upper')[kind], count))
+
+
+if __name__ == "__main__":
+    main()
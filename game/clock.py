@@ -0,0 +1,119 @@
+import time
+from game.settings import ENDGAME_EMPTY, HEIGHT, OPENING_EMPTY, WIDTH
+
+__author__ = 'yuessiah'
+
+
+class GameClock(object):
+    """Chess clock of one player: `total` seconds for the game plus
+    `increment` seconds after every move, or, when `moves` is set, `total`
+    seconds for every `moves` moves."""
+
+    def __init__(self, total, increment=0, moves=None):
+        self.total = total
+        self.increment = increment
+        self.moves = moves
+        self.remaining = total
+        self.played = 0
+        self.started = None
+
+
+    def moves_to_go(self):
+        """ Returns the number of moves left until the next time control, or
+            None for a sudden death clock.
+        """
+        if not self.moves:
+            return None
+        return self.moves - self.played % self.moves
+
+
+    def start(self):
+        """ Starts the clock for a move.
+        """
+        self.started = time.monotonic()
+
+
+    def stop(self):
+        """ Stops the clock after a move and returns the seconds it took.
+        """
+        elapsed = time.monotonic() - self.started
+        self.started = None
+        self.remaining -= elapsed
+        self.played += 1
+        if not self.flagged():
+            self.remaining += self.increment
+            if self.moves and self.played % self.moves == 0:
+                self.remaining += self.total
+        return elapsed
+
+
+    def flagged(self):
+        """ Returns True if the player has run out of time.
+        """
+        return self.remaining < 0
+
+
+    def __str__(self):
+        remaining = max(self.remaining, 0)
+        return '{0}:{1:04.1f}'.format(int(remaining // 60), remaining % 60)
+
+
+class TimeManager(object):
+    """Splits the time on a GameClock into budgets for single moves.
+
+    The remaining time is shared out over the moves the player still has to
+    make, weighted by game phase so the midgame gets most of it. Every move
+    gets a soft limit, after which no new search iteration starts, and a
+    hard limit the search never goes past.
+    """
+
+    # Weights of the opening, midgame and endgame moves.
+    OPENING, MIDGAME, ENDGAME = 0.5, 1.5, 1.0
+
+    # The hard limit is at most this many soft limits, and this share of the clock.
+    HARD_FACTOR = 3.0
+    MAX_SHARE = 0.5
+
+    def __init__(self, clock):
+        self.clock = clock
+
+
+    def phase_weight(self, empties, tiles=WIDTH * HEIGHT):
+        if empties > tiles * OPENING_EMPTY:
+            return self.OPENING
+        elif empties > tiles * ENDGAME_EMPTY:
+            return self.MIDGAME
+        return self.ENDGAME
+
+
+    def budget(self, empties, moves, tiles=WIDTH * HEIGHT):
+        """ Returns (soft, hard) limits in seconds for a move with `empties`
+            empty squares and `moves` legal moves on a board of `tiles`
+            squares. A forced move gets none.
+        """
+        if moves <= 1:
+            return 0.0, 0.0
+
+        clock = self.clock
+        future = range(empties, 0, -2)
+        if clock.moves_to_go():
+            future = future[:clock.moves_to_go()]
+        share = self.phase_weight(empties, tiles) / sum(self.phase_weight(e, tiles) for e in future)
+
+        available = max(clock.remaining, 0)
+        soft = available * share + clock.increment * 0.9
+        hard = min(soft * self.HARD_FACTOR, (available + clock.increment) * self.MAX_SHARE)
+        return min(soft, hard), hard
+
+
+    def keep_searching(self, elapsed, soft, hard, last_iteration, stable_iterations):
+        """ Returns True if another search iteration should start, given the
+            time taken so far and by the last iteration, and the number of
+            iterations in a row that returned the same best move.
+        """
+        if elapsed >= soft:
+            return False
+        if stable_iterations >= 3 and elapsed >= soft / 2:
+            return False
+        # The next iteration takes several times as long as the last one.
+        return elapsed + last_iteration * 4 < hard
@@ -3,11 +3,16 @@ import os
 import queue
 import threading
 import sys
-from game.ai import AlphaBetaPruner
+from game.ai import AlphaBetaPruner, EngineSession
 from game.brain import Brain
+from game.clock import TimeManager
 from game.settings import *
 __author__ = 'bengt, yuessiah'
 
+# Seconds the engine thinks about a hint, and number of moves it shows.
+HINT_TIME = 5
+HINT_LINES = 3
+
 
 class Controller(object):
     """ Interface for different types of controllers of the board
@@ -25,12 +30,27 @@ class Controller(object):
         pass
 
 
+    def close(self):
+        """ Frees what the controller holds once the game is over.
+        """
+        pass
+
+
+    def printed(self):
+        """ Returns True if the last move printed more below the board than
+            its one line of prompt, which may have scrolled the screen.
+        """
+        return False
+
+
 class PlayerController(Controller):
     """ Controller for a real, alive and kicking player.
     """
 
-    def __init__(self, colour):
+    def __init__(self, colour, hint_time=HINT_TIME):
         self.colour = colour
+        self.hint_time = hint_time
+        self.extra_lines = False
 
 
     def next_move(self, board):
@@ -38,22 +58,26 @@ class PlayerController(Controller):
 
             Processes input from the user, parses it, and then returns the
             chosen move if it is valid, otherwise the user can retry sending
-            new input until successful.
+            new input until successful. Entering '?' shows the best moves.
         """
         result = None
+        self.extra_lines = False
         while result is None:
-            event = input('Enter a coordinate: ')
+            event = input('Enter a coordinate or ? for a hint: ')
             # if event[0] == '/':
             #     if event[1:] == 'quit' or event[1:] == 'q':
             #         print('Quitting. Thank you for playing.')
             #         exit()
             # else:
+            if event.strip() == '?':
+                self.hint(board)
+                self.extra_lines = True
+                continue
             try:
-                if len(event) != 2:
+                if not 2 <= len(event) <= 3:
                     raise ValueError
-                x, y = event[0], event[1]
-                result = self._parse_coordinates(x, y)
-                found_moves = [p.get_position() for p in board.get_move_pieces(self.get_colour())]
+                result = parse_coordinate(event)
+                found_moves = board.legal_moves(self.get_colour())
 
                 if not found_moves:
                     raise NoMovesError
@@ -64,10 +88,35 @@ class PlayerController(Controller):
             except (TypeError, ValueError):
                 result = None
                 print("Invalid coordinates, retry.")
+                self.extra_lines = True
 
         return result
 
 
+    def printed(self):
+        return self.extra_lines
+
+
+    def hint(self, board, lines=HINT_LINES, out=None):
+        """ Prints the best `lines` moves with their scores and expected
+            replies, again after every depth the engine completes within
+            `hint_time` seconds.
+        """
+        out = out if out is not None else sys.stdout
+        opponent = BLACK if self.colour is WHITE else WHITE
+        pruner = AlphaBetaPruner(None, self.hint_time, board.snapshot(self.colour), self.colour, opponent,
+                                 display=False)
+        try:
+            for depth, found in pruner.analysis(top=lines):
+                out.write('Depth {0}: {1}\n'.format(depth, '   '.join(
+                    '{0}{1:+.2f} {2}'.format('' if line.exact else '<=', line.score,
+                                             ' '.join(coordinate(move) for move in line.pv))
+                    for line in found[:lines])))
+                out.flush()
+        except NoMovesError:
+            out.write('No moves, pass.\n')
+
+
     def get_colour(self):
         """ Returns the colour of the controller.
         """
@@ -82,26 +131,24 @@ class PlayerController(Controller):
         return "PlayerController"
 
 
-    @staticmethod
-    def _parse_coordinates(x, y):
-        """ Parses board coordinates into (x, y) coordinates.
-        """
-        return ord(x) - ord('a'), ord(y) - ord('0') - 1
-
-
 stdoutmutex = threading.Lock()
 workQueue = queue.Queue(1)
-threads = []
 
 
 class AiController(Controller):
     """ Artificial Intelligence Controller.
     """
 
-    def __init__(self, id, colour, duration):
+    def __init__(self, id, colour, duration, clock=None, node_limit=None, process=False):
         self.id = str(id)
         self.colour = colour
         self.duration = duration
+        self.node_limit = node_limit
+        self.time_manager = TimeManager(clock) if clock and node_limit is None else None
+        self.session = EngineSession()
+        self.brain = None
+        self.process = process
+        self.engine = None
 
 
     def next_move(self, board):
@@ -113,34 +160,91 @@ class AiController(Controller):
 
             Meanwhile the AiController will output to stdout to show
             that it hasn't crashed.
-        """
 
+            A single legal move is played at once. With a game clock the
+            time manager gives the Brain its soft and hard limits. With a
+            node limit the search is bounded by nodes instead, and always
+            gives the same move in the same position. Every Brain of the
+            game shares the controller's EngineSession, so a search starts
+            from what the searches of the previous moves found.
 
-        brain = Brain(self.duration, stdoutmutex, workQueue, board.pieces, self.colour,
-                      BLACK if self.colour is WHITE else WHITE)
+            With `process` the search runs in an EngineProcess started on
+            the first move and kept for the game instead, which keeps its
+            own session, and its progress is shown from there.
+        """
+        moves = board.legal_moves(self.colour)
+        if len(moves) == 1:
+            return next(iter(moves))
+
+        duration, soft, keep_searching = self.duration, None, None
+        if self.time_manager:
+            soft, hard = self.time_manager.budget(board.count(BOARD), len(moves), board.width * board.height)
+            duration = min(duration, hard)
+            keep_searching = self.time_manager.keep_searching
+
+        if self.process:
+            return self.next_move_in_process(board, duration, soft)
+
+        brain = Brain(duration, stdoutmutex, workQueue, board.snapshot(self.colour), self.colour,
+                      BLACK if self.colour is WHITE else WHITE, soft, keep_searching, self.node_limit,
+                      self.session)
+        self.brain = brain
         brain.start()
 
-        threads.append(brain)
-
         print('Brain is thinking...', end='')
-        update_step_duration = datetime.timedelta(microseconds=10000)
-        goal_time = datetime.datetime.now() + update_step_duration
-        accumulated_time = datetime.datetime.now()
+        update_step_duration = 0.01
 
-        while workQueue.empty():
-            if accumulated_time >= goal_time:
+        while True:
+            try:
+                result = workQueue.get(timeout=update_step_duration)
+                break
+            except queue.Empty:
                 sys.stdout.write("\x1b7\x1b[%d;%dfDate: %s\x1b8" % (14, 22, datetime.datetime.now()))
-                goal_time = datetime.datetime.now() + update_step_duration
                 sys.stdout.flush()
 
-            accumulated_time = datetime.datetime.now()
+        print()
+
+        brain.join()
+        self.brain = None
+        return result
+
+
+    def next_move_in_process(self, board, duration, soft):
+        if self.engine is None:
+            from game.engine_process import EngineProcess
+            self.engine = EngineProcess()
+        self.engine.start(board.snapshot(self.colour), duration, soft, self.node_limit)
+
+        print('Brain is thinking...', end='')
+        update_step_duration = 0.01
+
+        while not self.engine.poll(update_step_duration):
+            nodes, depth, complexity = self.engine.progress()
+            sys.stdout.write("\x1b7\x1b[%d;%dfMax depth: %d\x1b8" % (10, 22, depth))
+            sys.stdout.write("\x1b7\x1b[%d;%dfComplexity: %d\x1b8" % (13, 22, complexity))
+            sys.stdout.write("\x1b7\x1b[%d;%dfDate: %s\x1b8" % (14, 22, datetime.datetime.now()))
+            sys.stdout.flush()
 
         print()
+        return self.engine.result()
 
-        for thread in threads:
-            thread.join()
 
-        return workQueue.get()
+    def stop(self):
+        """ Makes a move being searched get played at once, the best found so far.
+        """
+        brain = self.brain
+        if brain is not None:
+            brain.stop()
+        if self.engine is not None:
+            self.engine.stop()
+
+
+    def close(self):
+        """ Ends the engine process of the game, if there is one.
+        """
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
 
 
     def get_colour(self):
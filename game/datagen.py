@@ -0,0 +1,149 @@
+""" Self-play dataset generation: plays games from randomised openings across
+    processes and writes their positions into memory-mapped .npy shards.
+
+    $ python -m game.datagen data/ --shards 64 --size 65536 --depth 2 --processes 4
+
+    Every shard holds `size` records of DTYPE and is written by one worker
+    straight to disk, under a .part name until it is complete. Running the
+    same command again only makes the shards that are missing. Requires NumPy.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import numpy as np
+from game.ai import AlphaBetaPruner
+from game.board import Board
+from game.position import START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+# The white and black bitboards, the player to move, the search score for the
+# player to move (NaN for random moves) and the final disc difference for the
+# player to move, empty squares going to the winner.
+DTYPE = np.dtype([('white', '<u8'), ('black', '<u8'), ('player', 'u1'), ('score', '<f4'), ('result', 'i1')])
+
+SHARD_NAME = 'shard-{0:05d}.npy'
+
+
+def play_game(rng, depth=0, epsilon=0.1, opening=0):
+    """ Plays a game and returns (positions, scores, result): the Positions
+        played, the search score of each, and the final disc difference for
+        white. The first `opening` moves and an `epsilon` share of the others
+        are random, the rest are searched to `depth` plies. Moves are all
+        random with depth 0.
+    """
+    board = Board(False)
+    board.set_position(START)
+    player = BLACK
+    positions, scores = [], []
+    while True:
+        moves = sorted(board.legal_moves(player))
+        if not moves:
+            player = get_opponent(player)
+            if not board.legal_moves(player):
+                break
+            continue
+
+        position = board.snapshot(player)
+        positions.append(position)
+        if depth and len(positions) > opening and rng.random() >= epsilon:
+            pruner = AlphaBetaPruner(None, 86400, position, player, get_opponent(player), display=False)
+            move = pruner.alpha_beta_search(depth)
+            scores.append(pruner.score)
+        else:
+            move = rng.choice(moves)
+            scores.append(float('nan'))
+        board.make_move(move, player)
+        player = get_opponent(player)
+
+    white, black = board.count(WHITE), board.count(BLACK)
+    empties = board.count(BOARD)
+    return positions, scores, white - black + (empties if white > black else -empties if white < black else 0)
+
+
+def shard_path(directory, index):
+    return os.path.join(directory, SHARD_NAME.format(index))
+
+
+def make_shard(job):
+    """ Plays games until shard `index` is full and returns (index, games).
+        Runs in the worker processes and only sends the counts back.
+    """
+    directory, index, size, depth, epsilon, opening, seed = job
+    rng = random.Random(None if seed is None else '{0}/{1}'.format(seed, index))
+    path = shard_path(directory, index)
+    part = path + '.part'
+    shard = np.lib.format.open_memmap(part, mode='w+', dtype=DTYPE, shape=(size,))
+
+    size_bytes = (WIDTH * HEIGHT + 7) // 8
+    filled = games = 0
+    while filled < size:
+        positions, scores, result = play_game(rng, depth, epsilon, opening)
+        games += 1
+        count = min(len(positions), size - filled)
+        packed = [position.pack() for position in positions[:count]]
+        rows = slice(filled, filled + count)
+        shard['white'][rows] = [int.from_bytes(p[1:1 + size_bytes], 'little') for p in packed]
+        shard['black'][rows] = [int.from_bytes(p[1 + size_bytes:], 'little') for p in packed]
+        shard['player'][rows] = [p[0] for p in packed]
+        shard['score'][rows] = scores[:count]
+        shard['result'][rows] = [result if p[0] == WHITE_CELL else -result for p in packed]
+        filled += count
+
+    shard.flush()
+    del shard
+    os.replace(part, path)
+    return index, games
+
+
+def generate(directory, shards, size, depth=0, epsilon=0.1, opening=8, seed=None, processes=1):
+    """ Yields (index, games) as every missing shard of `directory` is made.
+        With a seed, a shard holds the same games whichever run makes it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(directory, index, size, depth, epsilon, opening, seed)
+            for index in range(shards) if not os.path.exists(shard_path(directory, index))]
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            yield from pool.imap_unordered(make_shard, jobs)
+    else:
+        yield from map(make_shard, jobs)
+
+
+def load(directory):
+    """ Returns the complete shards of `directory`, memory-mapped read-only.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.startswith('shard-') and name.endswith('.npy'))
+    return [np.load(os.path.join(directory, name), mmap_mode='r') for name in names]
+
+
+def dataset(shard):
+    """ Returns the (own, opp, labels) arrays of a shard, as game.tuning.fit takes them.
+    """
+    white = shard['player'] == WHITE_CELL
+    return (np.where(white, shard['white'], shard['black']), np.where(white, shard['black'], shard['white']),
+            shard['result'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write self-play positions into memory-mapped shards")
+    parser.add_argument('directory', help="Directory of the shards, resumed from")
+    parser.add_argument('--shards', help="Number of shards", type=int, default=16)
+    parser.add_argument('--size', help="Number of positions per shard", type=int, default=1 << 16)
+    parser.add_argument('--depth', help="Search depth of the players, 0 for random play", type=int, default=0)
+    parser.add_argument('--epsilon', help="Chance of a random move when searching", type=float, default=0.1)
+    parser.add_argument('--opening', help="Number of random moves every game starts with", type=int, default=8)
+    parser.add_argument('--seed', help="Seed of the random moves", type=int, default=None)
+    parser.add_argument('--processes', help="Number of worker processes", type=int, default=os.cpu_count())
+
+    args = parser.parse_args()
+
+    for index, games in generate(args.directory, args.shards, args.size, args.depth, args.epsilon, args.opening,
+                                 args.seed, args.processes):
+        print('{0} written, {1} games'.format(shard_path(args.directory, index), games))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+""" Distributed search: a coordinator splits the moves of the root between
+    worker processes, on this machine or others, which search them with
+    AlphaBetaPruner and send back their values over TCP.
+
+    $ python -m game.distributed worker coordinator-host:7000
+    $ python -m game.distributed search positions.txt --listen 0.0.0.0:7000 --workers 8 --depth 6
+    $ python -m game.distributed search positions.txt --local 4 --depth 5
+    $ python -m game.distributed speedup --workers 1 2 4 --depth 5
+
+    The split follows Young Brothers Wait: the first move of the root is
+    searched alone to get a bound, then its younger brothers are handed
+    out together, each against the best score known when it leaves, so
+    they only need to show they are no better. Workers get up to PREFETCH
+    jobs at once and search them in order. A worker with nothing left
+    steals the last job still waiting at the busiest worker, which is
+    cancelled there. The jobs of a worker whose connection drops go back
+    to the front of the queue. A search that runs out of time cancels the
+    jobs still out and returns the best move found so far.
+
+    Messages are a HEADER of kind and payload length followed by a payload
+    of fixed fields, network byte order: JOB carries the job id, depth,
+    board width, move tile, floor and the packed root Position; RESULT the
+    job id, value and nodes; CANCEL the job id; CANCELLED the job id and
+    the nodes searched before it stopped; HELLO the process id of a worker.
+
+    The speedup command searches the same positions with each number of
+    local workers and reports the time and speedup against one worker and
+    against the plain engine. Workers on one machine only speed a search
+    up with as many free cores.
+"""
+import argparse
+import collections
+import datetime
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from game.ai import AlphaBetaPruner, EngineSession, SearchAborted
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+HELLO, JOB, RESULT, CANCEL, CANCELLED = range(5)
+
+HEADER = struct.Struct('!BH')
+HELLO_BODY = struct.Struct('!I')
+JOB_BODY = struct.Struct('!IBBBd')
+RESULT_BODY = struct.Struct('!IdQ')
+CANCEL_BODY = struct.Struct('!I')
+CANCELLED_BODY = struct.Struct('!IQ')
+
+# Jobs sent to a worker before it has answered the first of them.
+PREFETCH = 2
+
+# Seconds a search waits for a worker to connect when none is left.
+WORKER_TIMEOUT = 30
+
+Job = collections.namedtuple('Job', 'index move opening floor')
+
+
+def send_message(sock, kind, payload):
+    sock.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+
+def read_exactly(sock, size):
+    """ Returns `size` bytes read from the socket, or None if it closes first.
+    """
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_message(sock):
+    """ Returns the (kind, payload) of the next message, or None when the
+        connection is closed.
+    """
+    try:
+        header = read_exactly(sock, HEADER.size)
+        if header is None:
+            return None
+        kind, size = HEADER.unpack(header)
+        payload = read_exactly(sock, size)
+    except OSError:
+        return None
+    return None if payload is None else (kind, payload)
+
+
+def parse_address(text):
+    """ Returns the (host, port) of a 'host:port' string, the host defaulting
+        to all interfaces.
+    """
+    host, _, port = text.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+class Connection(object):
+    """A worker as the coordinator sees it: its socket and the ids of the
+    jobs it was sent and has not answered, in the order it searches them.
+    """
+
+    def __init__(self, sock, pid):
+        self.sock = sock
+        self.pid = pid
+        self.jobs = []
+
+
+    def send(self, kind, payload):
+        try:
+            send_message(self.sock, kind, payload)
+        except OSError:
+            # The reader thread reports the lost connection.
+            pass
+
+
+class Coordinator(object):
+    """Hands out the root moves of searches to the workers connected to it.
+
+    Like AlphaBetaPruner, a search leaves its score, its nodes, summed over
+    the workers, and whether it timed out in `score`, `nodes` and
+    `timed_out`. `stolen`, `reassigned` and `cancelled` count the jobs
+    moved between workers, taken back from lost workers and cancelled.
+    """
+
+    def __init__(self, address=('127.0.0.1', 0), prefetch=PREFETCH):
+        self.server = socket.create_server(address)
+        self.address = self.server.getsockname()[:2]
+        self.prefetch = prefetch
+        self.events = queue.Queue()
+        self.workers = []
+        self.pending = collections.deque()
+        self.results = {}
+        self.jobs = {}
+        self.next_id = self.first_id = 0
+        self.score = None
+        self.nodes = 0
+        self.timed_out = False
+        self.stolen = self.reassigned = self.cancelled = 0
+        threading.Thread(target=self.accept, daemon=True).start()
+
+
+    def accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.listen, args=(sock,), daemon=True).start()
+
+
+    def listen(self, sock):
+        """ Passes the messages of a worker on to the events queue.
+        """
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        message = read_message(sock)
+        if message is None or message[0] != HELLO:
+            sock.close()
+            return
+        connection = Connection(sock, HELLO_BODY.unpack(message[1])[0])
+        self.events.put(('joined', connection, None))
+        while True:
+            message = read_message(sock)
+            if message is None:
+                sock.close()
+                self.events.put(('lost', connection, None))
+                return
+            self.events.put(('message', connection, message))
+
+
+    def wait_for_workers(self, count, timeout=WORKER_TIMEOUT):
+        """ Waits until `count` workers are connected and returns how many are.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self.workers) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self.handle(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return len(self.workers)
+
+
+    def search(self, position, depth=None, duration=None, stop=None):
+        """ Returns the best move of `position` as an (x, y) tuple, searched
+            `depth` plies deep, or as deep as AlphaBetaPruner would, for at
+            most `duration` seconds or until `stop` is set. Moves with equal
+            scores may be chosen differently from AlphaBetaPruner.
+        """
+        pruner = AlphaBetaPruner(None, 0, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False)
+        moves = pruner.get_moves(*pruner.state)
+        if not moves:
+            raise NoMovesError
+        depth = depth if depth is not None else pruner.default_depth()
+        children = pruner.distinct_moves(pruner.state, moves)
+        self.root = (pruner.state, depth, pruner.width)
+        self.openings = [pruner.opening_evaluation(state[0], pruner.first_player, move) for state, move in children]
+        self.children = children
+        self.pending = collections.deque(range(len(children)))
+        self.results = {}
+        self.best = None
+        self.jobs = {}
+        self.first_id = self.next_id
+        self.nodes = 0
+        self.timed_out = False
+
+        deadline = time.monotonic() + duration if duration is not None else None
+        lost_all = None
+        self.dispatch()
+        while len(self.results) < len(children):
+            if stop is not None and stop.is_set() or deadline is not None and time.monotonic() >= deadline:
+                self.timed_out = True
+                break
+            if not self.workers:
+                lost_all = lost_all or time.monotonic()
+                if time.monotonic() - lost_all > WORKER_TIMEOUT:
+                    raise ConnectionError('no worker left to search on')
+            else:
+                lost_all = None
+            timeout = 0.1 if deadline is None else min(0.1, max(deadline - time.monotonic(), 0))
+            try:
+                self.handle(self.events.get(timeout=timeout))
+            except queue.Empty:
+                continue
+            self.dispatch()
+
+        for connection in self.workers:
+            for job_id in connection.jobs:
+                self.cancel(connection, job_id)
+            connection.jobs = []
+        self.jobs = {}
+
+        if self.best is None:
+            self.score = None
+            return moves[0]
+        self.score = self.results[self.best]
+        return children[self.best][1]
+
+
+    def handle(self, event):
+        """ Updates the workers and the search with a joined or lost worker or
+            a message from one.
+        """
+        what, connection, message = event
+        if what == 'joined':
+            self.workers.append(connection)
+        elif what == 'lost':
+            if connection in self.workers:
+                self.workers.remove(connection)
+            for job_id in reversed(connection.jobs):
+                job = self.jobs.pop(job_id, None)
+                if job is not None and job.index not in self.results and not self.out(job.index):
+                    self.pending.appendleft(job.index)
+                    self.reassigned += 1
+            connection.jobs = []
+        else:
+            kind, payload = message
+            if kind == RESULT:
+                job_id, value, nodes = RESULT_BODY.unpack(payload)
+                self.finish(connection, job_id, nodes)
+                job = self.jobs.pop(job_id, None)
+                if job is not None and job.index not in self.results:
+                    self.record(job, value)
+            elif kind == CANCELLED:
+                self.finish(connection, *CANCELLED_BODY.unpack(payload))
+
+
+    def finish(self, connection, job_id, nodes):
+        """ Counts the nodes of a job that came back. Job ids only grow, so
+            late replies to the jobs of an earlier search are left out.
+        """
+        if job_id >= self.first_id:
+            self.nodes += nodes
+        if job_id in connection.jobs:
+            connection.jobs.remove(job_id)
+
+
+    def record(self, job, value):
+        """ Keeps the result of a job, exact if it is above the floor the job
+            was searched against, and cancels the other copies of it.
+        """
+        if value > job.floor:
+            score = job.opening + value
+            if self.best is None or score > self.results[self.best] or \
+                    score == self.results[self.best] and job.index < self.best:
+                self.best = job.index
+        else:
+            score = job.opening + job.floor
+        self.results[job.index] = score
+        for connection in self.workers:
+            for job_id in list(connection.jobs):
+                if self.jobs[job_id].index == job.index:
+                    self.cancel(connection, job_id)
+                    connection.jobs.remove(job_id)
+                    del self.jobs[job_id]
+
+
+    def out(self, index):
+        """ Returns True if a job of the move `index` is at a worker.
+        """
+        return any(self.jobs[job_id].index == index for connection in self.workers for job_id in connection.jobs)
+
+
+    def dispatch(self):
+        """ Sends the queued moves to the least busy workers, and lets idle
+            workers steal jobs still waiting elsewhere. The younger brothers
+            wait for the first move.
+        """
+        if not self.workers:
+            return
+        while self.pending:
+            if self.pending[0] != 0 and self.best is None:
+                break
+            connection = min(self.workers, key=lambda c: len(c.jobs))
+            if len(connection.jobs) >= self.prefetch:
+                break
+            self.send_job(connection, self.pending.popleft())
+
+        for thief in self.workers:
+            if thief.jobs or self.pending:
+                continue
+            victim = max(self.workers, key=lambda c: len(c.jobs))
+            if len(victim.jobs) < 2:
+                break
+            job_id = victim.jobs.pop()
+            self.cancel(victim, job_id)
+            self.send_job(thief, self.jobs.pop(job_id).index)
+            self.stolen += 1
+
+
+    def send_job(self, connection, index):
+        state, move = self.children[index]
+        opening = self.openings[index]
+        floor = -float('Inf') if self.best is None else self.results[self.best] - opening
+        root, depth, width = self.root
+        job_id = self.next_id
+        self.next_id += 1
+        self.jobs[job_id] = Job(index, move, opening, floor)
+        connection.jobs.append(job_id)
+        connection.send(JOB, JOB_BODY.pack(job_id, depth, width, move[0] + move[1] * width, floor) +
+                        Position(*root).pack())
+
+
+    def cancel(self, connection, job_id):
+        self.cancelled += 1
+        connection.send(CANCEL, CANCEL_BODY.pack(job_id))
+
+
+    def close(self):
+        """ Stops accepting workers and closes their connections, which ends
+            their processes.
+        """
+        self.server.close()
+        for connection in self.workers:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.sock.close()
+        self.workers = []
+
+
+class Worker(object):
+    """Searches the jobs a coordinator sends, one at a time in the order they
+    came, keeping one EngineSession for all of them. A thread reads the
+    connection meanwhile, so a job can be cancelled while it is searched.
+    """
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.lock = threading.Condition()
+        self.send_lock = threading.Lock()
+        self.queue = collections.deque()
+        self.running = None
+        self.closed = False
+        self.stop = threading.Event()
+        self.session = EngineSession()
+
+
+    def send(self, kind, payload):
+        with self.send_lock:
+            send_message(self.sock, kind, payload)
+
+
+    def read(self):
+        while True:
+            message = read_message(self.sock)
+            with self.lock:
+                if message is None:
+                    self.closed = True
+                    self.stop.set()
+                    self.lock.notify()
+                    return
+                kind, payload = message
+                if kind == JOB:
+                    self.queue.append(payload)
+                    self.lock.notify()
+                elif kind == CANCEL:
+                    job_id = CANCEL_BODY.unpack(payload)[0]
+                    if job_id == self.running:
+                        self.stop.set()
+                    else:
+                        for queued in self.queue:
+                            if JOB_BODY.unpack_from(queued)[0] == job_id:
+                                self.queue.remove(queued)
+                                self.send(CANCELLED, CANCELLED_BODY.pack(job_id, 0))
+                                break
+
+
+    def run(self):
+        """ Serves jobs until the coordinator closes the connection.
+        """
+        self.send(HELLO, HELLO_BODY.pack(os.getpid()))
+        threading.Thread(target=self.read, daemon=True).start()
+        while True:
+            with self.lock:
+                while not self.queue and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    break
+                payload = self.queue.popleft()
+                job_id = JOB_BODY.unpack_from(payload)[0]
+                self.running = job_id
+                self.stop.clear()
+            value, nodes = self.search(payload)
+            with self.lock:
+                self.running = None
+            try:
+                if value is None:
+                    self.send(CANCELLED, CANCELLED_BODY.pack(job_id, nodes))
+                else:
+                    self.send(RESULT, RESULT_BODY.pack(job_id, value, nodes))
+            except OSError:
+                break
+        self.sock.close()
+
+
+    def search(self, payload):
+        """ Returns the (value, nodes) of a JOB payload, with a value of None
+            when the job was cancelled.
+        """
+        job_id, depth, width, tile, floor = JOB_BODY.unpack_from(payload)
+        position = Position.unpack(payload[JOB_BODY.size:], width * width)
+        self.session.start(position)
+        pruner = AlphaBetaPruner(None, 0, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False, stop=self.stop, session=self.session)
+        pruner.max_depth = depth
+        pruner.lifetime = datetime.datetime.max
+        move = tile % width, tile // width
+        try:
+            value = pruner.negamax(0, pruner.next_state(pruner.state, move), move, floor, float('Inf'))
+        except SearchAborted:
+            return None, pruner.nodes
+        return value, pruner.nodes
+
+
+def run_worker(address):
+    """ Connects to the coordinator at (host, port) and serves it until it
+        closes the connection.
+    """
+    try:
+        Worker(address).run()
+    except (ConnectionError, OSError):
+        pass
+
+
+def spawn(address, count):
+    """ Starts `count` worker processes connecting to `address` and returns them.
+    """
+    processes = [multiprocessing.Process(target=run_worker, args=(address,), daemon=True) for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def local(count, prefetch=PREFETCH):
+    """ Returns a coordinator with `count` worker processes on this machine,
+        and the processes.
+    """
+    coordinator = Coordinator(prefetch=prefetch)
+    processes = spawn(coordinator.address, count)
+    if coordinator.wait_for_workers(count) < count:
+        coordinator.close()
+        raise ConnectionError('only {0} of {1} workers connected'.format(len(coordinator.workers), count))
+    return coordinator, processes
+
+
+def shut_down(coordinator, processes):
+    coordinator.close()
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+
+def speedup(positions, depth, counts, report=None):
+    """ Searches the positions with the plain engine and with every number
+        of local workers in `counts`, and returns a (workers, seconds, nodes)
+        row for each, the plain engine as 0 workers. `report(rows)` is
+        called with the rows so far after every one.
+    """
+    rows = []
+    started = time.perf_counter()
+    nodes = 0
+    for position in positions:
+        pruner = AlphaBetaPruner(None, 86400, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False)
+        pruner.alpha_beta_search(depth)
+        nodes += pruner.nodes
+    rows.append((0, time.perf_counter() - started, nodes))
+    if report:
+        report(rows)
+
+    for count in counts:
+        coordinator, processes = local(count)
+        try:
+            started = time.perf_counter()
+            nodes = 0
+            for position in positions:
+                coordinator.search(position, depth)
+                nodes += coordinator.nodes
+            rows.append((count, time.perf_counter() - started, nodes))
+        finally:
+            shut_down(coordinator, processes)
+        if report:
+            report(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search positions on worker processes over TCP")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    worker = commands.add_parser('worker', help="Serve a coordinator")
+    worker.add_argument('coordinator', help="HOST:PORT of the coordinator")
+
+    searching = commands.add_parser('search', help="Search a file of positions on the workers")
+    searching.add_argument('positions', help="File of positions, one per line")
+    searching.add_argument('--listen', help="HOST:PORT to accept workers on", default='0.0.0.0:7000')
+    searching.add_argument('--workers', help="Number of workers to wait for", type=int, default=1)
+    searching.add_argument('--local', help="Number of workers to start on this machine", type=int, default=0)
+    searching.add_argument('--depth', help="Number of plies to search every position", type=int, default=None)
+    searching.add_argument('--time', help="Number of seconds allowed per position", type=float, default=None)
+
+    timing = commands.add_parser('speedup', help="Time searches against the number of local workers")
+    timing.add_argument('--positions', help="File of positions, instead of the random ones")
+    timing.add_argument('--workers', help="Numbers of workers to time", type=int, nargs='+', default=[1, 2, 4])
+    timing.add_argument('--depth', help="Number of plies to search every position", type=int, default=5)
+    timing.add_argument('--count', help="Number of random positions", type=int, default=8)
+    timing.add_argument('--seed', help="Seed of the random positions", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        run_worker(parse_address(args.coordinator))
+        return
+
+    from game.analyse import format_result, read_positions
+    if args.command == 'search':
+        coordinator = Coordinator(parse_address(args.listen))
+        processes = spawn(coordinator.address, args.local)
+        print('listening on {0}:{1}'.format(*coordinator.address))
+        coordinator.wait_for_workers(max(args.workers, args.local), timeout=86400)
+        try:
+            for position in read_positions(args.positions):
+                try:
+                    move = coordinator.search(position, args.depth, args.time)
+                except NoMovesError:
+                    continue
+                score = coordinator.score
+                print(format_result(position, (move, score, args.depth, coordinator.nodes, None)), end='')
+            print('{0} jobs stolen, {1} reassigned, {2} cancelled'.format(
+                coordinator.stolen, coordinator.reassigned, coordinator.cancelled))
+        finally:
+            shut_down(coordinator, processes)
+        return
+
+    if args.positions:
+        positions = list(read_positions(args.positions))
+    else:
+        from game.tournament import random_openings
+        positions = random_openings(args.count, 12, args.seed)
+
+    def report(rows):
+        workers, seconds, nodes = rows[-1]
+        print('{0:>7} {1:>9.2f}s {2:>10} nodes {3:>6.2f}x {4:>6.2f}x'.format(
+            workers or 'engine', seconds, nodes, rows[0][1] / seconds, rows[min(1, len(rows) - 1)][1] / seconds))
+
+    print('{0} positions at depth {1} on {2} CPUs, speedup against the engine and {3} workers:'.format(
+        len(positions), args.depth, os.cpu_count(), args.workers[0]))
+    speedup(positions, args.depth, args.workers, report)
+
+
+if __name__ == "__main__":
+    main()
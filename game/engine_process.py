@@ -0,0 +1,155 @@
+""" Engine in a worker process: AlphaBetaPruner searches in a process of its
+    own, started once and kept for the whole game, so a long search does not
+    hold the GIL the game's input handling and rendering need.
+
+    Searches are asked for and answered over a Pipe in compact messages: a
+    REQUEST of the time limit, soft limit, node limit and board width
+    followed by the packed Position, and a RESULT of the move, score, nodes
+    and the last depth completed. The worker keeps one EngineSession for all the searches it
+    is given. While it searches it copies the nodes, depth and number of
+    evaluated leaves into a shared array without a lock, so the game reads
+    progress at any time without waiting on the worker. A shared Event
+    stops a search, which then answers with the best move found so far.
+"""
+import multiprocessing
+import struct
+import threading
+import time
+from game.ai import AlphaBetaPruner, EngineSession
+from game.clock import TimeManager
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+REQUEST = struct.Struct('<ddqB')
+RESULT = struct.Struct('<bbdQB')
+
+# Fields of the shared progress array.
+NODES, DEPTH, COMPLEXITY, SEARCHES = range(4)
+
+# Seconds between two copies of the progress into the shared array.
+REPORT_INTERVAL = 0.01
+
+
+def serve(connection, stop, stats):
+    """ Answers the search requests coming over `connection` until it is
+        closed or an empty message comes.
+    """
+    session = EngineSession()
+    keep_searching = TimeManager(None).keep_searching
+    while True:
+        try:
+            data = connection.recv_bytes()
+        except EOFError:
+            return
+        if not data:
+            return
+        duration, soft, node_limit, width = REQUEST.unpack_from(data)
+        position = Position.unpack(data[REQUEST.size:], width * width)
+        pruner = AlphaBetaPruner(None, duration, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False, stop=stop, node_limit=node_limit if node_limit >= 0 else None,
+                                 session=session)
+        searching = threading.Event()
+        searching.set()
+        reporter = threading.Thread(target=report, args=(pruner, stats, searching), daemon=True)
+        reporter.start()
+        if soft < 0:
+            move = pruner.alpha_beta_search()
+            # A search cut short did not complete the depth it was given.
+            depth = 0 if pruner.timed_out else pruner.max_depth
+        else:
+            move = pruner.iterative_deepening(soft, keep_searching)
+            depth = pruner.max_depth
+        searching.clear()
+        reporter.join()
+        stats[SEARCHES] += 1
+        connection.send_bytes(RESULT.pack(move[0], move[1], float('nan') if pruner.score is None else pruner.score,
+                                          pruner.nodes, depth))
+
+
+def report(pruner, stats, searching):
+    while searching.is_set():
+        copy(pruner, stats)
+        time.sleep(REPORT_INTERVAL)
+    copy(pruner, stats)
+
+
+def copy(pruner, stats):
+    stats[NODES], stats[DEPTH], stats[COMPLEXITY] = pruner.nodes, pruner.max_depth, pruner.complexity
+
+
+class EngineProcess(object):
+    """A worker process searching the positions it is sent, one at a time.
+
+    After a search `score`, `nodes` and `depth` hold the score of the move,
+    or None, the nodes searched and the last depth completed, 0 if none was.
+    """
+
+    def __init__(self):
+        self.connection, child = multiprocessing.Pipe()
+        self.stop_event = multiprocessing.Event()
+        self.stats = multiprocessing.RawArray('q', 4)
+        self.process = multiprocessing.Process(target=serve, args=(child, self.stop_event, self.stats), daemon=True)
+        self.process.start()
+        child.close()
+        self.score = self.nodes = self.depth = None
+
+
+    def start(self, position, duration, soft=None, node_limit=None):
+        """ Starts searching `position` for `duration` seconds at most. With
+            a soft limit the search deepens one ply at a time until the time
+            manager stops it, with a node limit it stops after that many
+            nodes instead.
+        """
+        self.stop_event.clear()
+        self.connection.send_bytes(REQUEST.pack(duration, -1 if soft is None else soft,
+                                                -1 if node_limit is None else node_limit,
+                                                int(len(position.cells) ** 0.5)) + position.pack())
+
+
+    def poll(self, timeout=0):
+        """ Returns True once the result of the search is there, waiting up
+            to `timeout` seconds for it.
+        """
+        return self.connection.poll(timeout)
+
+
+    def result(self):
+        """ Waits for the search to finish and returns its move as an (x, y) tuple.
+        """
+        x, y, score, self.nodes, self.depth = RESULT.unpack(self.connection.recv_bytes())
+        self.score = None if score != score else score
+        return x, y
+
+
+    def search(self, position, duration, soft=None, node_limit=None):
+        self.start(position, duration, soft, node_limit)
+        return self.result()
+
+
+    def progress(self):
+        """ Returns the (nodes, depth, evaluated leaves) of the current search
+            so far, or of the last one.
+        """
+        return self.stats[NODES], self.stats[DEPTH], self.stats[COMPLEXITY]
+
+
+    def stop(self):
+        """ Makes the search answer at once with the best move found so far.
+        """
+        self.stop_event.set()
+
+
+    def close(self):
+        """ Ends the worker process.
+        """
+        if self.process.is_alive():
+            try:
+                self.connection.send_bytes(b'')
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.connection.close()
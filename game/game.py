@@ -1,8 +1,10 @@
-import os
 from collections import deque
 from game.board import Board
+from game.clock import GameClock
 from game.controllers import PlayerController, AiController
+from game.position import start
 from game.random_controller import RandomController
+from game.renderer import Renderer
 from game.settings import *
 
 __author__ = 'bengt, yuessiah'
@@ -14,18 +16,27 @@ class Game(object):
 
     def __init__(self, timeout=1,
                  players=['ai', 'ai'],
-                 colour=False):
-
-        self.board = Board(colour)
+                 colour=False,
+                 clock=None,
+                 node_limit=None,
+                 seed=None,
+                 profiler=None,
+                 size=WIDTH,
+                 process=False):
+
+        self.board = Board(colour, size, size)
+        self.renderer = Renderer(colour)
         self.timeout = timeout
+        self.node_limit = node_limit
+        self.seed = seed
+        self.profiler = profiler
+        self.process = process
+        self.clocks = {BLACK: GameClock(*clock), WHITE: GameClock(*clock)} if clock else {}
         self.ai_counter = 0
         self.list_of_colours = [BLACK, WHITE]
         self.ctrlers = deque([self.mk_ctrler(BLACK, players[0]), self.mk_ctrler(WHITE, players[1])])
         self.player = self.ctrlers[0].get_colour()
-        self.board.set_black(4, 3)
-        self.board.set_black(3, 4)
-        self.board.set_white(4, 4)
-        self.board.set_white(3, 3)
+        self.board.set_position(start(size, size))
         self.board.mark_moves(self.player)
         self.previous_move = [0, 0]
         self.previous_round_passed = False
@@ -34,28 +45,44 @@ class Game(object):
     def mk_ctrler(self, colour, ctrler_type):
         """ Returns a controller with the specified colour.
             'player' == PlayerController,
-            'ai' == AiController.
+            'random' == RandomController,
+            'mcts' == MctsController, on 8x8 boards,
+            'ai' == AiController, searching in a process of its own
+            with `process`.
         """
         if ctrler_type == 'player':
             return PlayerController(colour)
         elif ctrler_type == 'random':
-            return RandomController(colour)
+            return RandomController(colour, self.seed)
+        elif ctrler_type == 'mcts':
+            if (self.board.width, self.board.height) != (WIDTH, HEIGHT):
+                raise ValueError('MCTS plays on {0}x{1} boards only'.format(WIDTH, HEIGHT))
+            from game.mcts import MctsController
+            return MctsController(colour, self.timeout, self.clocks.get(colour), self.node_limit, self.seed)
         else:
             self.ai_counter += 1
-            return AiController(self.ai_counter, colour, self.timeout)
+            return AiController(self.ai_counter, colour, self.timeout, self.clocks.get(colour), self.node_limit,
+                                self.process)
+
+
+    def info(self):
+        """ Returns the lines of game information.
+        """
+        self.player = self.ctrlers[0].get_colour()
+        lines = ["Playing as:       " + self.player,
+                 "Current turn:     " + str(self.ctrlers[0]),
+                 "Previous move:    " + self.coordinate(self.previous_move),
+                 "Number of Black:  " + str(self.board.count(BLACK)),
+                 "Number of White:  " + str(self.board.count(WHITE))]
+        if self.clocks:
+            lines.append("Clock:            Black {0}  White {1}".format(self.clocks[BLACK], self.clocks[WHITE]))
+        return lines
 
 
     def show_info(self):
         """ Prints game information to stdout.
         """
-        self.player = self.ctrlers[0].get_colour()
-        print("Playing as:       " + self.player)
-        print("Current turn:     " + str(self.ctrlers[0]))
-        print("Previous move:    " + self.coordinate(self.previous_move))
-        print("Number of Black:  " + str(
-            len([p for p in self.board.pieces if p.get_state() == BLACK])))
-        print("Number of White:  " + str(
-            len([p for p in self.board.pieces if p.get_state() == WHITE])))
+        print('\n'.join(self.info()))
 
 
     def show_board(self):
@@ -78,24 +105,49 @@ class Game(object):
 
 
     def run(self):
+        """ Plays the game, then closes the controllers, and the engine
+            processes they hold, however the game ended.
+        """
+        try:
+            self.play()
+        finally:
+            for controller in self.ctrlers:
+                controller.close()
+
+
+    def play(self):
         """ The game loop will print game information, the board, the possible moves, and then wait for the
             current player to make its decision before it processes it and then goes on repeating itself.
         """
         while True:
-            os.system('clear')
-            self.show_info()
-            self.show_board()
+            lines = self.info()
+            self.renderer.render(lines, self.board, self.board.legal_moves(self.player))
 
             try:
                 self.show_commands()
+                clock = self.clocks.get(self.player)
+                if clock:
+                    clock.start()
+                if self.profiler:
+                    self.profiler.start_move()
                 next_move = self.ctrlers[0].next_move(self.board)
+                if self.profiler:
+                    self.profiler.end_move('{0} {1}'.format(self.player, self.coordinate(next_move)))
+                if clock:
+                    clock.stop()
+                    if clock.flagged():
+                        print("{0} lost on time.".format(self.player))
+                        exit()
                 self.board.make_move(next_move, self.ctrlers[0].get_colour())
+                if self.ctrlers[0].printed():
+                    # The screen may have scrolled, the next frame is drawn in full.
+                    self.renderer.invalidate()
                 self.previous_round_passed = False
             except NoMovesError:
                 if self.previous_round_passed:
                     print("Game Over")
-                    blacks = len([p for p in self.board.pieces if p.get_state() == BLACK])
-                    whites = len([p for p in self.board.pieces if p.get_state() == WHITE])
+                    blacks = self.board.count(BLACK)
+                    whites = self.board.count(WHITE)
 
                     if blacks > whites:
                         print("BLACK won this game.")
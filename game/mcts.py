@@ -0,0 +1,356 @@
+""" Monte Carlo Tree Search engine and controller.
+
+    The tree keeps its nodes in parallel arrays, one column per field, with
+    the children of a node stored next to each other. Selection follows UCT
+    from the root on plain integer bitboards and gives every node on the
+    way a virtual loss, so the next selection of the same batch goes down
+    another path. The leaves of a batch are then played out to the end
+    together, several times each, on game.batch, and the results are backed
+    up the paths. After every move the subtree of the new position is kept.
+
+    8x8 boards only. Requires NumPy.
+"""
+import array
+import datetime
+import math
+import sys
+import threading
+import time
+import numpy as np
+from game import batch, bitboard
+from game.clock import TimeManager
+from game.controllers import Controller
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+# UCT exploration constant.
+EXPLORATION = 1.4
+
+# Leaves selected per batch, random games played from every leaf, and the
+# visits a selection adds to every node on its path until it is backed up.
+LEAVES = 128
+ROLLOUTS = 4
+VIRTUAL_LOSS = 1
+
+# Playouts per move when no limit is given.
+PLAYOUTS = 20000
+
+# Moves of the root and of passes, and the `first` child of unexpanded and
+# final nodes.
+ROOT, PASS = -2, -1
+UNEXPANDED, FINAL = -1, -2
+
+MASK = (1 << 64) - 1
+_SHIFTS = tuple((int(amount), int(mask)) for amount, mask in bitboard.SHIFTS.values())
+
+
+def legal_moves(own, opp):
+    """ Returns the integer bitboard of the tiles `own` can play on.
+    """
+    empty = ~(own | opp) & MASK
+    moves = 0
+    for amount, mask in _SHIFTS:
+        if amount > 0:
+            run = (own << amount) & mask & opp
+            for _ in range(5):
+                run |= (run << amount) & mask & opp
+            moves |= (run << amount) & mask & empty
+        else:
+            run = (own >> -amount) & mask & opp
+            for _ in range(5):
+                run |= (run >> -amount) & mask & opp
+            moves |= (run >> -amount) & mask & empty
+    return moves
+
+
+def play(own, opp, tile):
+    """ Returns the (own, opp) bitboards of the next player after `own`
+        plays `tile`, or passes when `tile` is PASS.
+    """
+    if tile == PASS:
+        return opp, own
+    move = 1 << tile
+    flipped = 0
+    for amount, mask in _SHIFTS:
+        run = 0
+        x = move
+        while True:
+            x = ((x << amount) & mask & MASK) if amount > 0 else ((x >> -amount) & mask)
+            if not x & opp:
+                break
+            run |= x
+        if x & own:
+            flipped |= run
+    return opp & ~flipped, own | flipped | move
+
+
+class Tree(object):
+    """Search tree of the position (own, opp, player).
+
+    Every node is an index into the columns: the tile of the move leading
+    to it, its parent, its first child and number of children, its visits
+    and the wins of the player who made its move.
+    """
+
+    def __init__(self, own, opp, player):
+        self.state = own, opp, player
+        self.move = array.array('i', [ROOT])
+        self.parent = array.array('i', [-1])
+        self.first = array.array('i', [UNEXPANDED])
+        self.count = array.array('i', [0])
+        self.visits = array.array('d', [0.0])
+        self.wins = array.array('d', [0.0])
+
+
+    def __len__(self):
+        return len(self.move)
+
+
+    def expand(self, node, own, opp):
+        """ Adds the children of a node reached with (own, opp) to move.
+        """
+        moves = legal_moves(own, opp)
+        tiles = [tile for tile in range(64) if moves >> tile & 1]
+        if not tiles:
+            if not legal_moves(opp, own):
+                self.first[node] = FINAL
+                return
+            tiles = [PASS]
+        self.first[node] = len(self.move)
+        self.count[node] = len(tiles)
+        for tile in tiles:
+            self.move.append(tile)
+            self.parent.append(node)
+            self.first.append(UNEXPANDED)
+            self.count.append(0)
+            self.visits.append(0.0)
+            self.wins.append(0.0)
+
+
+    def select(self):
+        """ Descends from the root to a leaf, expanding the node it stops at,
+            and returns (path, own, opp, player) of the leaf. Every node of
+            the path gets a virtual loss.
+        """
+        own, opp, player = self.state
+        first, count, visits, wins, move = self.first, self.count, self.visits, self.wins, self.move
+        node = 0
+        path = [0]
+        visits[0] += VIRTUAL_LOSS
+        while True:
+            if first[node] == UNEXPANDED:
+                self.expand(node, own, opp)
+                if first[node] == FINAL:
+                    break
+                node = first[node]
+            elif first[node] == FINAL:
+                break
+            else:
+                children = range(first[node], first[node] + count[node])
+                log_total = math.log(visits[node])
+                best, node = -1.0, children[0]
+                for child in children:
+                    n = visits[child]
+                    if n == 0:
+                        node = child
+                        break
+                    value = wins[child] / n + EXPLORATION * math.sqrt(log_total / n)
+                    if value > best:
+                        best, node = value, child
+            own, opp = play(own, opp, move[node])
+            player ^= 1
+            path.append(node)
+            visits[node] += VIRTUAL_LOSS
+            if visits[node] == VIRTUAL_LOSS:
+                break
+        return path, own, opp, player
+
+
+    def backup(self, path, player, black_results):
+        """ Takes the virtual loss back from the path of a leaf with `player`
+            to move, and adds the playouts of `black_results`, the final disc
+            differences for black.
+        """
+        playouts = len(black_results)
+        black = sum(1.0 if r > 0 else 0.5 if r == 0 else 0.0 for r in black_results)
+        # The node of the leaf holds the wins of the player who moved into it.
+        mover = player ^ 1
+        for node in reversed(path):
+            self.visits[node] += playouts - VIRTUAL_LOSS
+            self.wins[node] += black if mover == BLACK_CELL else playouts - black
+            mover ^= 1
+
+
+    def search(self, pick, playouts, deadline=None, stop=None, report=None):
+        """ Runs batches of playouts until `playouts` are done, `deadline`
+            (a time.monotonic() value) would pass during the next batch or
+            `stop` is set, and returns the number played. There is always one
+            batch. `report(playouts)` is called after every batch.
+        """
+        done = 0
+        while done < playouts:
+            started = time.monotonic()
+            leaves = [self.select() for _ in range(max(1, min(LEAVES, (playouts - done) // ROLLOUTS)))]
+            games = batch.Batch([own for path, own, opp, player in leaves for _ in range(ROLLOUTS)],
+                                [opp for path, own, opp, player in leaves for _ in range(ROLLOUTS)],
+                                [player for path, own, opp, player in leaves for _ in range(ROLLOUTS)])
+            games.play(pick)
+            results = games.results().tolist()
+            for i, (path, own, opp, player) in enumerate(leaves):
+                self.backup(path, player, results[i * ROLLOUTS:(i + 1) * ROLLOUTS])
+            done += len(results)
+            if report:
+                report(done)
+            now = time.monotonic()
+            if (deadline is not None and 2 * now - started >= deadline) or (stop is not None and stop.is_set()):
+                break
+        return done
+
+
+    def children(self, node=0):
+        return range(self.first[node], self.first[node] + self.count[node]) if self.first[node] >= 0 else range(0)
+
+
+    def best_move(self):
+        """ Returns the tile of the most visited move of the root.
+        """
+        return self.move[max(self.children(), key=lambda child: self.visits[child])]
+
+
+    def find(self, own, opp, player, plies=2):
+        """ Returns the node at most `plies` plies below the root whose
+            position is (own, opp, player), or None.
+        """
+        frontier = [(0, self.state)]
+        for _ in range(plies):
+            following = []
+            for node, (o, p, colour) in frontier:
+                for child in self.children(node):
+                    state = play(o, p, self.move[child]) + (colour ^ 1,)
+                    if state == (own, opp, player):
+                        return child
+                    following.append((child, state))
+            frontier = following
+        return None
+
+
+    def reroot(self, node, state):
+        """ Returns a tree of the subtree under `node`, whose position is
+            `state`, leaving out every other node.
+        """
+        tree = Tree(*state)
+        tree.visits[0], tree.wins[0] = self.visits[node], self.wins[node]
+        queue = [(node, 0)]
+        for old, new in queue:
+            if self.first[old] == FINAL:
+                tree.first[new] = FINAL
+            elif self.first[old] >= 0:
+                tree.first[new], tree.count[new] = len(tree.move), self.count[old]
+                for child in self.children(old):
+                    queue.append((child, len(tree.move)))
+                    tree.move.append(self.move[child])
+                    tree.parent.append(new)
+                    tree.first.append(UNEXPANDED)
+                    tree.count.append(0)
+                    tree.visits.append(self.visits[child])
+                    tree.wins.append(self.wins[child])
+        return tree
+
+
+    def advance(self, own, opp, player):
+        """ Returns a tree of the position (own, opp, player), keeping the
+            subtree of the position if it is a ply or two below the root.
+        """
+        node = self.find(own, opp, player)
+        if node is None:
+            return Tree(own, opp, player)
+        return self.reroot(node, (own, opp, player))
+
+
+class MctsController(Controller):
+    """ Monte Carlo Tree Search controller.
+    """
+
+    def __init__(self, colour, duration, clock=None, playouts=None, seed=None, display=True):
+        self.colour = colour
+        self.duration = duration
+        self.playouts = playouts or PLAYOUTS
+        self.time_manager = TimeManager(clock) if clock else None
+        self.pick = batch.random_picker(np.random.default_rng(seed))
+        self.display = display
+        self.tree = None
+        self.stop_event = threading.Event()
+        self.started = None
+        self.played = 0
+        self.seconds = 0.0
+        self.reused = 0
+
+
+    def next_move(self, board):
+        """ Will return a single valid move as an (x, y) tuple.
+
+            Searches until the playouts of a move are done or its time is
+            up: `duration` seconds, or with a game clock the soft limit of
+            the time manager. The tree of the previous move is kept when the
+            position is one it searched.
+        """
+        moves = board.legal_moves(self.colour)
+        if len(moves) == 1:
+            return next(iter(moves))
+
+        budget = self.duration
+        if self.time_manager:
+            budget = min(budget, self.time_manager.budget(board.count(BOARD), len(moves),
+                                                          board.width * board.height)[0])
+
+        own, opp = bitboard.from_positions([board.snapshot(self.colour)])
+        state = int(own[0]), int(opp[0]), CELLS[self.colour]
+        if self.tree is not None:
+            self.tree = self.tree.advance(*state)
+            self.reused += self.tree.visits[0] > 0
+        else:
+            self.tree = Tree(*state)
+
+        self.stop_event.clear()
+        self.started = time.monotonic()
+        played = self.tree.search(self.pick, self.playouts, self.started + budget, self.stop_event, self.report)
+        self.played += played
+        self.seconds += time.monotonic() - self.started
+
+        tile = self.tree.best_move()
+        return tile % WIDTH, tile // WIDTH
+
+
+    def report(self, playouts):
+        if self.display:
+            sys.stdout.write("\x1b7\x1b[%d;%dfPlayouts: %d (%.0f/s)\x1b8" % (
+                13, 22, playouts, playouts / max(time.monotonic() - self.started, 1e-9)))
+            sys.stdout.write("\x1b7\x1b[%d;%dfDate: %s\x1b8" % (14, 22, datetime.datetime.now()))
+            sys.stdout.flush()
+
+
+    def playouts_per_second(self):
+        """ Returns the playouts per second of all moves searched so far.
+        """
+        return self.played / self.seconds if self.seconds else 0.0
+
+
+    def stop(self):
+        """ Makes a move being searched get played after the current batch.
+        """
+        self.stop_event.set()
+
+
+    def get_colour(self):
+        """ Returns the colour of the controller.
+        """
+        return self.colour
+
+
+    def __str__(self):
+        return "MCTS"
+
+
+    def __repr__(self):
+        return "MctsController"
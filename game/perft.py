@@ -0,0 +1,252 @@
+""" Perft: counts the leaf nodes of the move tree to a fixed depth with every
+    move generator, checks that they agree and reports how fast they are.
+
+    The engine and Board walk the same rays, so on 8x8 boards the NumPy
+    bitboard generator, which shares nothing with them, checks them both.
+
+    $ python -m game.perft --depth 6 --json perft.json
+"""
+import argparse
+import datetime
+import json
+import math
+import sys
+import time
+from game.ai import AlphaBetaPruner
+from game.board import Board
+from game.position import Position, START, start
+from game.settings import *
+
+try:
+    import numpy as np
+    from game import bitboard
+except ImportError:
+    np = None
+
+__author__ = 'yuessiah'
+
+# Leaf counts from the start position for depths 0 to 10, passes count as a ply.
+START_COUNTS = (1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284)
+
+# Stored positions, with the side to move, to cross-check the generators on.
+POSITIONS = (
+    ('start', START.to_string()),
+    ('opening', '----------------------X----OOOX---XOXXX----O-X---OOO--X--------- X'),
+    ('midgame', '----O-----X--OOO--X-O-OO--XOOOOX--XXOXOO---XXOO--OXOOOOO-X-X---- X'),
+    ('endgame', '-O--OO-X--OOOOOX-OOOX-OXOOOOXOOX-OOXXOOOOOOXXXO-OOXXOOOOOOOOOX-- X'),
+    ('pass', '-X---X--XXXXX---XX-XXX--XXXXXXX-XXXXOXOOXOOOOOOOXXXOOOOOX-XOOOOO O'),
+)
+
+
+def perft_board(position, depth):
+    """ Counts leaf nodes with Board.get_flips and Board.make_move.
+    """
+    size = math.isqrt(len(position.cells))
+    board = Board(False, size, size)
+    board.set_position(position)
+    return _perft_board(board, STATES[position.player], depth)
+
+
+def _perft_board(board, player, depth):
+    if depth == 0:
+        return 1
+
+    moves = board.get_flips(player)
+    opponent = get_opponent(player)
+    if not moves:
+        if not board.get_flips(opponent):
+            return 1
+        return _perft_board(board, opponent, depth - 1)
+
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for tile in moves:
+        child = board.copy()
+        child.make_move((tile % board.width, tile // board.width), player)
+        nodes += _perft_board(child, opponent, depth - 1)
+    return nodes
+
+
+def perft_marks(position, depth):
+    """ Counts leaf nodes with the per-direction Board.mark_move scan.
+    """
+    size = math.isqrt(len(position.cells))
+    board = Board(False, size, size)
+    board.set_position(position)
+    return _perft_marks(board, STATES[position.player], depth)
+
+
+def _marked_moves(board, player):
+    for piece in board.pieces:
+        if piece.get_state() == player:
+            for d in directions(board.width):
+                board.mark_move(player, piece, d)
+    moves = [piece.get_position() for piece in board.pieces if piece.get_state() == MOVE]
+    board.clear_moves()
+    return moves
+
+
+def _perft_marks(board, player, depth):
+    if depth == 0:
+        return 1
+
+    moves = _marked_moves(board, player)
+    opponent = get_opponent(player)
+    if not moves:
+        if not _marked_moves(board, opponent):
+            return 1
+        return _perft_marks(board, opponent, depth - 1)
+
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        child = board.copy()
+        child.make_move(move, player)
+        nodes += _perft_marks(child, opponent, depth - 1)
+    return nodes
+
+
+def perft_engine(position, depth):
+    """ Counts leaf nodes with AlphaBetaPruner.get_moves and AlphaBetaPruner.next_state.
+    """
+    pruner = AlphaBetaPruner(None, 0, position, STATES[position.player], STATES[position.player ^ 1])
+    return _perft_engine(pruner, pruner.state, depth)
+
+
+def _perft_engine(pruner, state, depth):
+    if depth == 0:
+        return 1
+
+    moves = pruner.get_moves(state[0], state[1])
+    if not moves:
+        opponent = pruner.opponent(state[1])
+        if not pruner.get_moves(state[0], opponent):
+            return 1
+        return _perft_engine(pruner, (state[0], opponent), depth - 1)
+
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        nodes += _perft_engine(pruner, pruner.next_state(state, move), depth - 1)
+    return nodes
+
+
+def perft_bitboard(position, depth):
+    """ Counts leaf nodes with bitboard.legal_moves and bitboard.flips, one
+        ply of every position of the tree at a time. 8x8 boards only.
+    """
+    own, opp = bitboard.from_positions([position])
+    finished = 0
+    for _ in range(depth):
+        moves = bitboard.legal_moves(own, opp)
+        passed = moves == 0
+        if passed.any():
+            over = passed.copy()
+            over[passed] = bitboard.legal_moves(opp[passed], own[passed]) == 0
+            finished += int(over.sum())
+            passed &= ~over
+
+        bits = np.unpackbits(moves.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        parents, tiles = np.nonzero(bits)
+        played = np.left_shift(np.uint64(1), tiles.astype(np.uint64))
+        flipped = bitboard.flips(own[parents], opp[parents], played)
+        # The player to move changes, whether a move was played or passed.
+        own, opp = (np.concatenate((opp[parents] ^ flipped, opp[passed])),
+                    np.concatenate((own[parents] | played | flipped, own[passed])))
+    return finished + len(own)
+
+
+BACKENDS = {'board': perft_board, 'marks': perft_marks, 'engine': perft_engine}
+if np is not None:
+    BACKENDS['bitboard'] = perft_bitboard
+
+# The number of tiles of the only board size a backend counts on.
+BOARD_TILES = {'bitboard': WIDTH * HEIGHT}
+
+
+def run(positions, depth, backends=tuple(BACKENDS)):
+    """ Runs perft on every (name, Position) with every backend and returns a
+        list of result dicts. Backends made for one board size skip the
+        others. Raises AssertionError when the backends disagree or the start
+        position gives the wrong count.
+    """
+    results = []
+    for name, position in positions:
+        counts = set()
+        backends_run = [backend for backend in backends if BOARD_TILES.get(backend, len(position.cells)) ==
+                        len(position.cells)]
+        for backend in backends_run:
+            started = time.perf_counter()
+            nodes = BACKENDS[backend](position, depth)
+            seconds = time.perf_counter() - started
+            counts.add(nodes)
+            results.append({'position': name, 'backend': backend, 'depth': depth, 'nodes': nodes,
+                            'seconds': seconds, 'nps': nodes / seconds if seconds else 0.0})
+
+        if len(counts) != 1:
+            raise AssertionError('backends disagree on {0} at depth {1}: {2}'.format(
+                name, depth, results[-len(backends_run):]))
+        if position == START and depth < len(START_COUNTS) and counts != {START_COUNTS[depth]}:
+            raise AssertionError('wrong count from the start position at depth {0}: {1}'.format(depth, counts))
+    return results
+
+
+def read_positions(path):
+    """ Yields (name, Position) from a file holding one position per line.
+    """
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield '{0}:{1}'.format(path, number), Position.from_string(line)
+
+
+def record(path, results):
+    """ Appends the results as JSON lines to `path`, to track them over time.
+    """
+    stamp = datetime.datetime.now().isoformat()
+    with open(path, 'a') as f:
+        for result in results:
+            f.write(json.dumps(dict(result, date=stamp, python=sys.version.split()[0])) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and time leaf nodes of every move generator")
+    parser.add_argument('--depth', help="Number of plies to count", type=int, default=5)
+    parser.add_argument('--backend', help="Move generators to run", nargs='+', choices=sorted(BACKENDS),
+                        default=sorted(BACKENDS))
+    parser.add_argument('--file', help="Count from the positions in this file instead of the stored ones")
+    parser.add_argument('--size', help="Count from the start position of a board this many tiles a side "
+                        "instead of the stored positions", type=int, default=None)
+    parser.add_argument('--json', help="Append the results as JSON lines to this file")
+
+    args = parser.parse_args()
+
+    if args.file:
+        positions = list(read_positions(args.file))
+    elif args.size:
+        positions = [('start', start(args.size, args.size))]
+    else:
+        positions = [(name, Position.from_string(text)) for name, text in POSITIONS]
+
+    try:
+        results = run(positions, args.depth, args.backend)
+    except AssertionError as e:
+        print(e)
+        exit(1)
+
+    for result in results:
+        print('{position:<12} {backend:<8} depth {depth:<3} {nodes:>12} nodes {seconds:>9.3f}s {nps:>12.0f} nodes/s'
+              .format(**result))
+
+    if args.json:
+        record(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
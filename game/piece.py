@@ -1,35 +1,65 @@
 import sys
 from game.settings import *
-from game import color as clr
 
 __author__ = 'bengt'
 
 
+def coloured(text, fg=None, bg=None):
+    """ Returns `text` in the (red, green, blue) colours `fg` and `bg`.
+        game.color is only imported once a coloured piece is drawn.
+    """
+    from game import color
+    return color.format_color(text, fg=fg and color.rgb(*fg), bg=bg and color.rgb(*bg))
+
+
 class Piece(object):
-    """Pieces are laid out on the board on an 8x8 grid."""
+    """Pieces are laid out on the board on an 8x8 grid.
+
+    A piece is a lightweight view on one cell of a board's bytearray. Pieces
+    created on their own get a private single cell to look at.
+    """
 
-    def __init__(self, x, y, colour):
+    __slots__ = ('x', 'y', 'colour', '_cells', '_flips', '_index')
+
+    def __init__(self, x, y, colour=False, cells=None, flips=None, index=0):
         self.x = x
         self.y = y
-        self.state = 'BOARD'
-        self.flipped = False
         self.colour = colour
 
-        self.drawing = {
-            "WHITE": self.draw_white,
-            "BLACK": self.draw_black,
-            "BOARD": self.draw_board,
-            "MOVE": self.draw_move}
+        if cells is None:
+            cells = bytearray((BOARD_CELL,))
+            flips = bytearray(1)
+            index = 0
+
+        self._cells = cells
+        self._flips = flips
+        self._index = index
+
+
+    @property
+    def state(self):
+        return STATES[self._cells[self._index]]
+
+
+    @state.setter
+    def state(self, state):
+        self._cells[self._index] = CELLS[state]
+
+
+    @property
+    def flipped(self):
+        return bool(self._flips[self._index])
+
+
+    @flipped.setter
+    def flipped(self, flipped):
+        self._flips[self._index] = flipped
 
 
     def draw(self):
         """ Returns a string representation of the piece in its current state.
         """
-        result = ''
-        if self.state in self.drawing:
-            result = self.drawing[self.state]()
-
-        return result
+        return self.drawing[self._cells[self._index]](self)
 
 
     def draw_white(self):
@@ -37,12 +67,12 @@ class Piece(object):
         """
         if self.flipped:
             if self.colour:
-                return clr.format_color('><', fg=clr.rgb(4, 4, 4), bg=clr.rgb(5, 5, 5))
+                return coloured('><', fg=(4, 4, 4), bg=(5, 5, 5))
 
             return 'WF'
         else:
             if self.colour:
-                return clr.format_color('  ', bg=clr.rgb(5, 5, 5))
+                return coloured('  ', bg=(5, 5, 5))
 
             return 'WW'
 
@@ -52,11 +82,11 @@ class Piece(object):
         """
         if self.flipped:
             if self.colour:
-                return clr.format_color('><', fg=clr.rgb(2, 2, 2), bg=clr.rgb(1, 1, 1))
+                return coloured('><', fg=(2, 2, 2), bg=(1, 1, 1))
             return 'BF'
         else:
             if self.colour:
-                return clr.format_color('  ', bg=clr.rgb(1, 1, 1))
+                return coloured('  ', bg=(1, 1, 1))
 
             return 'BB'
 
@@ -65,7 +95,7 @@ class Piece(object):
         """ Returns a string representation of a board piece.
         """
         if self.colour:
-            return clr.format_color('  ', bg=clr.rgb(0, 3, 0))
+            return coloured('  ', bg=(0, 3, 0))
         else:
             return '..'
 
@@ -74,71 +104,73 @@ class Piece(object):
         """ Returns a string representation of a move piece.
         """
         if self.colour:
-            return clr.format_color('><', fg=clr.rgb(5, 0, 0), bg=clr.rgb(0, 3, 0))
+            return coloured('><', fg=(5, 0, 0), bg=(0, 3, 0))
 
         return 'MM'
 
 
+    # Shared by every piece and indexed by cell code.
+    drawing = (draw_white, draw_black, draw_board, draw_move)
+
+
     def set_black(self):
         """ Sets a piece's state to be BLACK.
         """
-        self.state = 'BLACK'
+        self._cells[self._index] = BLACK_CELL
 
 
     def set_white(self):
         """ Sets a piece's state to be WHITE.
         """
-        self.state = 'WHITE'
+        self._cells[self._index] = WHITE_CELL
 
 
     def set_move(self):
         """ Sets a piece's state to be MOVE.
         """
-        self.state = MOVE
+        self._cells[self._index] = MOVE_CELL
 
 
     def set_board(self):
         """ Sets the piece's state to be BOARD.
         """
-        self.state = BOARD
+        self._cells[self._index] = BOARD_CELL
 
 
     def get_state(self):
         """ Returns the piece's current state.
         """
-        return self.state
+        return STATES[self._cells[self._index]]
 
 
     def flip(self):
         """ Flips a piece from WHITE<->BLACK and marks it as flipped.
             Otherwise it returns a ValueError. (You can't flip a move/board piece)
         """
-        if self.state == BLACK:
-            self.state = WHITE
-        elif self.state == WHITE:
-            self.state = BLACK
-        else:
+        cell = self._cells[self._index]
+        if cell > BLACK_CELL:
             raise ValueError
 
-        self.flipped = True
+        self._cells[self._index] = cell ^ 1
+        self._flips[self._index] = True
 
 
     def set_flipped(self):
         """ Sets the piece to flipped.
         """
-        self.flipped = True
+        self._flips[self._index] = True
 
 
     def reset_flipped(self):
         """ Sets the piece to not be flipped.
         """
-        self.flipped = False
+        self._flips[self._index] = False
 
 
     def is_flipped(self):
         """ Returns True if the piece is flipped, otherwise False.
         """
-        return self.flipped
+        return bool(self._flips[self._index])
 
 
     def get_position(self):
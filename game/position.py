@@ -0,0 +1,84 @@
+from collections import namedtuple
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+# Maps every cell code to an ASCII bit for one colour, used to pack cells.
+_WHITE_BITS = bytes.maketrans(bytes((WHITE_CELL, BLACK_CELL, BOARD_CELL, MOVE_CELL)), b'1000')
+_BLACK_BITS = bytes.maketrans(bytes((WHITE_CELL, BLACK_CELL, BOARD_CELL, MOVE_CELL)), b'0100')
+
+# Text form of the cell codes: 'O' for white, 'X' for black and '-' for empty.
+_TO_TEXT = bytes.maketrans(bytes((WHITE_CELL, BLACK_CELL, BOARD_CELL, MOVE_CELL)), b'OX--')
+_FROM_TEXT = bytes.maketrans(b'OXo-.x', bytes((WHITE_CELL, BLACK_CELL, WHITE_CELL, BOARD_CELL, BOARD_CELL, BLACK_CELL)))
+
+
+class Position(namedtuple('Position', ['cells', 'player'])):
+    """Immutable snapshot of a board and the player to move.
+
+    `cells` holds one cell code per tile (WHITE_CELL, BLACK_CELL or
+    BOARD_CELL) and `player` is the cell code of the player to move, which
+    is the (state, player) pair AlphaBetaPruner searches on.
+    Positions pickle to their packed form: the player followed by a white
+    and a black bitboard.
+    """
+
+    __slots__ = ()
+
+    def pack(self):
+        """ Returns the position packed into bytes.
+        """
+        cells = self.cells
+        size = (len(cells) + 7) // 8
+        white = int(cells.translate(_WHITE_BITS)[::-1], 2)
+        black = int(cells.translate(_BLACK_BITS)[::-1], 2)
+        return bytes((self.player,)) + white.to_bytes(size, 'little') + black.to_bytes(size, 'little')
+
+
+    @classmethod
+    def unpack(cls, data, tiles=WIDTH * HEIGHT):
+        """ Returns the position packed into `data` by Position.pack.
+        """
+        size = (len(data) - 1) // 2
+        white = int.from_bytes(data[1:1 + size], 'little')
+        black = int.from_bytes(data[1 + size:], 'little')
+        cells = bytes(WHITE_CELL if white >> tile & 1 else BLACK_CELL if black >> tile & 1 else BOARD_CELL
+                      for tile in range(tiles))
+        return cls(cells, data[0])
+
+
+    def to_string(self):
+        """ Returns the position as text: one character per tile followed by a
+            space and the player to move, e.g. '---...-OX---...--- X'.
+        """
+        return '{0} {1}'.format(self.cells.translate(_TO_TEXT).decode(), 'OX'[self.player])
+
+
+    @classmethod
+    def from_string(cls, text):
+        """ Returns the position written as text by Position.to_string.
+        """
+        text = text.split()
+        if len(text) != 2 or text[1] not in ('O', 'X'):
+            raise ValueError
+        cells = text[0].encode().translate(_FROM_TEXT)
+        if not cells or max(cells) > BOARD_CELL:
+            raise ValueError
+        return cls(cells, 'OX'.index(text[1]))
+
+
+    def __reduce__(self):
+        return Position.unpack, (self.pack(), len(self.cells))
+
+
+def start(width=WIDTH, height=HEIGHT):
+    """ Returns the start position of a board of the given size: two white
+        and two black discs crossed in the centre, black to move.
+    """
+    cells = bytearray((BOARD_CELL,)) * (width * height)
+    centre = (height // 2 - 1) * width + width // 2 - 1
+    cells[centre] = cells[centre + width + 1] = WHITE_CELL
+    cells[centre + 1] = cells[centre + width] = BLACK_CELL
+    return Position(bytes(cells), BLACK_CELL)
+
+
+START = start()
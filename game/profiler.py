@@ -0,0 +1,157 @@
+""" Profiling hooks for the engine's hot functions.
+
+    A Profiler wraps the methods of AlphaBetaPruner named in HOT_FUNCTIONS
+    while it is installed, and counts their calls and time. Nothing is
+    wrapped while no Profiler is installed, so profiling costs nothing
+    when it is off. Every move gets a report of its calls and time, and
+    optionally the memory tracemalloc saw it allocate. The time of every
+    call stack is kept in the collapsed format flamegraph tools read:
+
+    $ ./reversi.py --verify --profile run
+    $ flamegraph.pl run.folded > run.svg
+"""
+import time
+import tracemalloc
+from game.ai import AlphaBetaPruner
+
+__author__ = 'yuessiah'
+
+HOT_FUNCTIONS = ('alpha_beta_search', 'iterative_deepening', 'solve', 'negamax', 'exact', 'get_moves',
+                 'next_state', 'opening_evaluation', 'ending_evaluation', 'features', 'parity')
+
+
+class Profiler(object):
+    """Counts calls and time of hot functions, per move and per call stack.
+
+    Follows one searching thread at a time. With a `prefix`, every report is
+    appended to `prefix`.txt and the call stacks are written to
+    `prefix`.folded after every move.
+    """
+
+    def __init__(self, prefix=None, memory=False, functions=HOT_FUNCTIONS, target=AlphaBetaPruner):
+        self.prefix = prefix
+        self.memory = memory
+        self.functions = functions
+        self.target = target
+        self.originals = {}
+        self.stats = {}
+        self.stacks = {}
+        self.frames = []
+        self.started = None
+        self.tracing = False
+
+
+    def install(self):
+        """ Wraps the hot functions of the target class.
+        """
+        for name in self.functions:
+            function = self.target.__dict__[name]
+            self.originals[name] = function
+            setattr(self.target, name, self._wrap(name, function))
+
+
+    def uninstall(self):
+        """ Puts the original functions back, and stops tracing memory if
+            the profiler started it.
+        """
+        for name, function in self.originals.items():
+            setattr(self.target, name, function)
+        self.originals = {}
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+
+    def __enter__(self):
+        self.install()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
+    def _wrap(self, name, function):
+        stats, stacks, frames = self.stats, self.stacks, self.frames
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            path = frames[-1][0] + (name,) if frames else (name,)
+            frame = [path, 0.0]
+            frames.append(frame)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                frames.pop()
+                if frames:
+                    frames[-1][1] += elapsed
+                own = elapsed - frame[1]
+                entry = stats.get(name)
+                if entry is None:
+                    entry = stats[name] = [0, 0.0, 0.0]
+                entry[0] += 1
+                if name not in path[:-1]:
+                    entry[1] += elapsed
+                entry[2] += own
+                stacks[path] = stacks.get(path, 0.0) + own
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+
+    def start_move(self):
+        """ Starts counting for a new move. Memory is traced only while the
+            profiler is installed.
+        """
+        self.stats.clear()
+        self.started = time.perf_counter()
+        if self.memory and self.originals:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+
+
+    def end_move(self, label):
+        """ Returns the report lines of the move since start_move, and writes
+            them out with the call stacks if there is a prefix. Moves without
+            calls to the hot functions give no report.
+        """
+        if not self.stats:
+            return []
+
+        seconds = time.perf_counter() - self.started
+        lines = ['== {0}: {1:.3f}s'.format(label, seconds),
+                 '{0:<20} {1:>10} {2:>10} {3:>10} {4:>10}'.format('function', 'calls', 'total s', 'self s', 'us/call')]
+        for name, (calls, total, own) in sorted(self.stats.items(), key=lambda item: -item[1][2]):
+            lines.append('{0:<20} {1:>10} {2:>10.3f} {3:>10.3f} {4:>10.1f}'.format(
+                name, calls, total, own, own / calls * 1e6))
+
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append('memory: peak {0:.1f} KiB'.format(peak / 1024))
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:5]:
+                lines.append('  {0}: {1:.1f} KiB in {2} blocks'.format(
+                    stat.traceback[0], stat.size / 1024, stat.count))
+
+        if self.prefix:
+            with open(self.prefix + '.txt', 'a') as f:
+                f.write('\n'.join(lines) + '\n\n')
+            self.write_collapsed(self.prefix + '.folded')
+        return lines
+
+
+    def collapsed(self):
+        """ Returns the call stacks as 'outer;inner microseconds' lines.
+        """
+        return ['{0} {1}'.format(';'.join(path), int(own * 1e6))
+                for path, own in sorted(self.stacks.items()) if own >= 1e-6]
+
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.collapsed()) + '\n')
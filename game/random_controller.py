@@ -6,16 +6,17 @@ class RandomController(Controller):
     WHITE = -1
     BOARD = 0
 
-    def __init__(self, colour):
+    def __init__(self, colour, seed=None):
         self.colour = colour
         self.history = []
+        self.random = random.Random(seed)
 
 
     def next_move(self, board):
         """ Will return a single valid move as an (x, y) tuple.
         """
         found_moves = [p.get_position() for p in board.get_move_pieces(self.get_colour())]
-        return random.choice(found_moves)
+        return self.random.choice(found_moves)
 
 
     def get_colour(self):
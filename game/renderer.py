@@ -0,0 +1,99 @@
+import sys
+from game.piece import Piece
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[K'
+CLEAR_BELOW = '\x1b[J'
+
+
+def goto(row, column):
+    """ Returns the escape sequence moving the cursor to the 1-based row and column.
+    """
+    return '\x1b[%d;%dH' % (row, column)
+
+
+class Renderer(object):
+    """Renderer draws the status lines and the board to the terminal.
+
+    The first frame is drawn in full, after that only the status lines and
+    cells that changed since the previous frame are repainted. Every frame
+    goes out in a single write.
+    """
+
+    # Drawn cells per colour mode, indexed by (cell code << 1) | flipped.
+    _cell_tables = {}
+
+    def __init__(self, colour, out=None):
+        self.colour = colour
+        self.out = out if out is not None else sys.stdout
+        self.cells = self.cell_table(colour)
+        self.lines = None
+        self.frame = None
+
+
+    @classmethod
+    def cell_table(cls, colour):
+        """ Returns the drawn string of every cell state, computed once per colour mode.
+        """
+        colour = bool(colour)
+        if colour not in cls._cell_tables:
+            table = []
+            for cell in range(len(STATES)):
+                for flipped in (False, True):
+                    piece = Piece(0, 0, colour)
+                    piece.state = STATES[cell]
+                    piece.flipped = flipped
+                    table.append(piece.draw())
+            cls._cell_tables[colour] = tuple(table)
+        return cls._cell_tables[colour]
+
+
+    def invalidate(self):
+        """ Forces the next frame to be drawn in full.
+        """
+        self.lines = None
+        self.frame = None
+
+
+    def render(self, lines, board, moves=()):
+        """ Draws the status `lines` followed by the `board`, with the tiles in
+            `moves` drawn as MOVE pieces. Leaves the cursor below the board.
+        """
+        width, height = board.width, board.height
+        frame = bytearray(board.cells)
+        for x, y in moves:
+            frame[x + (y * width)] = MOVE_CELL
+        for tile, flipped in enumerate(board.flips):
+            frame[tile] = (frame[tile] << 1) | flipped
+
+        top = len(lines) + 1
+        bottom = top + height + 1
+        margin = len(str(height))
+        if self.frame is None or len(self.frame) != len(frame) or len(self.lines) != len(lines):
+            output = [CLEAR_SCREEN, self.draw_full(lines, frame, width, height)]
+        else:
+            output = [goto(row + 1, 1) + line + CLEAR_LINE
+                      for row, (line, old) in enumerate(zip(lines, self.lines))
+                      if line != old]
+            output.extend(goto(top + 1 + tile // width, margin + 2 + 2 * (tile % width)) + self.cells[cell]
+                          for tile, (cell, old) in enumerate(zip(frame, self.frame))
+                          if cell != old)
+
+        output.append(goto(bottom + 1, 1) + CLEAR_BELOW)
+        self.out.write(''.join(output))
+        self.out.flush()
+
+        self.lines = list(lines)
+        self.frame = frame
+
+
+    def draw_full(self, lines, frame, width, height):
+        margin = len(str(height))
+        labels = ' ' * margin + ' ' + ''.join(chr(ord('a') + x) + '.' for x in range(width))
+        cells = self.cells
+        rows = ['{0:>{2}} {1}{0}'.format(y + 1, ''.join(cells[c] for c in frame[y * width:(y + 1) * width]), margin)
+                for y in range(height)]
+        return '\n'.join(list(lines) + [labels] + rows + [labels])
@@ -1,7 +1,21 @@
 __author__ = 'bengt'
 
 BOARD, WHITE, BLACK, MOVE = 'BOARD', 'WHITE', 'BLACK', 'MOVE'
+
+# Small integer codes used by the bytearray backed board. White and black
+# differ in the lowest bit only, so `cell ^ 1` gives the opponent.
+WHITE_CELL, BLACK_CELL, BOARD_CELL, MOVE_CELL = 0, 1, 2, 3
+CELLS = {WHITE: WHITE_CELL, BLACK: BLACK_CELL, BOARD: BOARD_CELL, MOVE: MOVE_CELL}
+STATES = (WHITE, BLACK, BOARD, MOVE)
+
+# Default board size. Boards, positions and the engine also take other even
+# sizes, square for symmetries, from MIN_SIZE to MAX_SIZE tiles a side.
 WIDTH, HEIGHT = 8, 8
+MIN_SIZE, MAX_SIZE = 4, 14
+
+# Shares of the board still empty when the opening ends and the endgame
+# starts, 44 and 20 empty squares on the default board.
+OPENING_EMPTY, ENDGAME_EMPTY = 44 / 64.0, 20 / 64.0
 NORTH = -HEIGHT
 NORTHEAST = -HEIGHT + 1
 EAST = 1
@@ -14,6 +28,13 @@ NORTHWEST = -HEIGHT - 1
 DIRECTIONS = (NORTH, NORTHEAST, EAST, SOUTHEAST, SOUTH, SOUTHWEST, WEST, NORTHWEST)
 
 
+def directions(width=WIDTH):
+    """ Returns the tile offsets of the 8 directions on a board `width` tiles wide,
+        in the order of DIRECTIONS.
+    """
+    return -width, -width + 1, 1, width + 1, width, width - 1, -1, -width - 1
+
+
 def chunks(l, n):
     """ Yield successive n-sized chunks from l.
     """
@@ -30,16 +51,48 @@ def get_opponent(player):
         raise ValueError
 
 
+def coordinate(move):
+    """ Transforms an (x, y) tuple into an 'a1'..'h8' string, up to 'n14'.
+    """
+    x, y = move
+    return '{0}{1}'.format(chr(ord('a') + x), y + 1)
+
+
+def parse_coordinate(text):
+    """ Transforms an 'a1'..'h8' string, up to 'n14', into an (x, y) tuple.
+    """
+    return ord(text[0]) - ord('a'), int(text[1:]) - 1
+
+
 class NoMovesError(Exception):
     pass
 
 
-def outside_board(tile, direction):
-    tile_top = 0  <= tile <= 7
-    tile_bot = 56 <= tile <= 63
-    tile_right = tile % WIDTH == 7
-    tile_left  = tile % WIDTH == 0
-    return (direction in (NORTH, NORTHEAST, NORTHWEST) and tile_top)   or \
-           (direction in (SOUTH, SOUTHWEST, SOUTHEAST) and tile_bot)   or \
-           (direction in (NORTHEAST, EAST, SOUTHEAST)  and tile_right) or \
-           (direction in (NORTHWEST, WEST, SOUTHWEST)  and tile_left)
+def outside_board(tile, direction, width=WIDTH, height=HEIGHT):
+    """ Returns True if a step in `direction` from `tile` leaves the board.
+    """
+    dy = (direction + width // 2) // width
+    dx = direction - dy * width
+    x = tile % width + dx
+    y = tile // width + dy
+    return not (0 <= x < width and 0 <= y < height)
+
+
+def make_rays(width=WIDTH, height=HEIGHT):
+    """ Returns, for every tile, the tiles met walking in each direction up to
+        the edge of the board. Directions that leave the board straight away
+        are left out.
+    """
+    rays = []
+    for tile in range(width * height):
+        tile_rays = []
+        for d in directions(width):
+            ray = []
+            t = tile
+            while not outside_board(t, d, width, height):
+                t += d
+                ray.append(t)
+            if ray:
+                tile_rays.append(tuple(ray))
+        rays.append(tuple(tile_rays))
+    return tuple(rays)
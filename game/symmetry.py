@@ -0,0 +1,95 @@
+""" The 8 symmetries of the square board (rotations and reflections), and
+    canonical forms of positions under them. Symmetric positions share a
+    canonical form, so caches keyed on it hold them once.
+"""
+import math
+import operator
+from game import tables
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+# Where each symmetry sends tile (x, y) on a board of `n` tiles a side.
+MAPPINGS = (
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (n - 1 - y, x),
+    lambda x, y, n: (n - 1 - x, n - 1 - y),
+    lambda x, y, n: (y, n - 1 - x),
+    lambda x, y, n: (n - 1 - x, y),
+    lambda x, y, n: (x, n - 1 - y),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - 1 - y, n - 1 - x),
+)
+
+
+def make_transforms(n=WIDTH):
+    """ Returns, for every symmetry, the tuple of source tiles of each
+        transformed tile and the tuple of transformed tiles of each source.
+    """
+    transforms = []
+    for mapping in MAPPINGS:
+        forward = [0] * (n * n)
+        source = [0] * (n * n)
+        for y in range(n):
+            for x in range(n):
+                tx, ty = mapping(x, y, n)
+                forward[x + y * n] = tx + ty * n
+                source[tx + ty * n] = x + y * n
+        transforms.append((tuple(source), tuple(forward)))
+    return tuple(transforms)
+
+
+TRANSFORMS = tables.transforms()
+
+# Item getters gathering the transformed cells, per number of tiles.
+_GATHERS = {len(TRANSFORMS[0][0]): tuple(operator.itemgetter(*source) for source, forward in TRANSFORMS)}
+
+
+def _gathers(tiles):
+    gathers = _GATHERS.get(tiles)
+    if gathers is None:
+        gathers = _GATHERS[tiles] = tuple(operator.itemgetter(*source)
+                                          for source, forward in tables.transforms(math.isqrt(tiles)))
+    return gathers
+
+
+def transform_cells(cells, symmetry):
+    """ Returns the cells transformed by the symmetry with index `symmetry`.
+    """
+    return bytes(_gathers(len(cells))[symmetry](cells))
+
+
+def transform_move(move, symmetry, n=WIDTH):
+    """ Returns the (x, y) move transformed by the symmetry.
+    """
+    return MAPPINGS[symmetry](move[0], move[1], n)
+
+
+def inverse_move(move, symmetry, n=WIDTH):
+    """ Returns the (x, y) move that the symmetry sends to `move`.
+    """
+    tile = (TRANSFORMS if n == WIDTH else tables.transforms(n))[symmetry][0][move[0] + move[1] * n]
+    return tile % n, tile // n
+
+
+def canonical(position):
+    """ Returns (canonical position, symmetry): the smallest transform of the
+        (cells, player) position, and the index of the symmetry giving it.
+    """
+    cells = position[0]
+    gathers = _gathers(len(cells))
+    best, symmetry = cells, 0
+    for i in range(1, len(gathers)):
+        transformed = bytes(gathers[i](cells))
+        if transformed < best:
+            best, symmetry = transformed, i
+    return Position(best, position[1]), symmetry
+
+
+def canonical_key(position):
+    """ Returns a hashable key shared by all symmetric (cells, player) positions.
+    """
+    cells = position[0]
+    gathers = _gathers(len(cells))
+    return min(cells, *(bytes(gather(cells)) for gather in gathers[1:])), position[1]
@@ -0,0 +1,167 @@
+""" Precomputed tables, generated once and cached in a binary file.
+
+    The cache file holds every table of one board size, and its name carries
+    the board size and the generator VERSION, so changing a generator only
+    needs VERSION bumped. The file is memory-mapped on the first use of a
+    table, and tables are read from it without copying. Set OTHELLO_TABLES
+    to keep the cache files in another directory.
+
+    File layout, little-endian: the header MAGIC, VERSION, width, height and
+    number of tables, then an ENTRY per table giving its name, array type
+    code, offset and length, then the tables themselves, 8-byte aligned.
+"""
+import array
+import mmap
+import os
+import struct
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+VERSION = 1
+MAGIC = b'OTBL'
+HEADER = struct.Struct('<4sHHHH')
+ENTRY = struct.Struct('<16scxxxII')
+
+CACHE_DIR = os.environ.get('OTHELLO_TABLES',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__'))
+
+
+def _rays(width, height):
+    """ Flattens make_rays: for every tile the number of rays, then every ray
+        as its length followed by its tiles.
+    """
+    flat = []
+    for tile_rays in make_rays(width, height):
+        flat.append(len(tile_rays))
+        for ray in tile_rays:
+            flat.append(len(ray))
+            flat.extend(ray)
+    return flat
+
+
+def _transforms(width, height):
+    """ Flattens make_transforms: the source tiles, then the forward tiles,
+        of every symmetry.
+    """
+    if width != height:
+        return []
+    from game.symmetry import make_transforms
+    return [tile for source, forward in make_transforms(width) for tile in source + forward]
+
+
+# Name, array type code and generator of every table.
+GENERATORS = (
+    ('rays', 'B', _rays),
+    ('transforms', 'B', _transforms),
+)
+
+_loaded = {}
+_decoded = {}
+
+
+def cache_path(width=WIDTH, height=HEIGHT):
+    return os.path.join(CACHE_DIR, 'tables-{0}x{1}-v{2}.bin'.format(width, height, VERSION))
+
+
+def build(width=WIDTH, height=HEIGHT):
+    """ Generates every table and returns the contents of a cache file.
+    """
+    tables = [(name.encode(), code, array.array(code, generator(width, height)).tobytes())
+              for name, code, generator in GENERATORS]
+    start = HEADER.size + ENTRY.size * len(tables)
+    entries, data = [], bytearray()
+    for name, code, payload in tables:
+        data += bytes(-(start + len(data)) % 8)
+        length = len(payload) // array.array(code).itemsize
+        entries.append(ENTRY.pack(name, code.encode(), start + len(data), length))
+        data += payload
+    return HEADER.pack(MAGIC, VERSION, width, height, len(tables)) + b''.join(entries) + bytes(data)
+
+
+def _parse(buffer, width, height):
+    """ Returns {name: memoryview} of the tables in `buffer`, or None if it
+        is not a cache file of this version and board size.
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, file_width, file_height, count = HEADER.unpack_from(buffer)
+    if (magic, version, file_width, file_height) != (MAGIC, VERSION, width, height):
+        return None
+
+    views = {}
+    whole = memoryview(buffer)
+    for i in range(count):
+        name, code, offset, length = ENTRY.unpack_from(buffer, HEADER.size + i * ENTRY.size)
+        code = code.decode()
+        size = array.array(code).itemsize
+        views[name.rstrip(b'\0').decode()] = whole[offset:offset + length * size].cast(code)
+    if any(name not in views for name, code, generator in GENERATORS):
+        return None
+    return views
+
+
+def _load(width, height):
+    path = cache_path(width, height)
+    try:
+        with open(path, 'rb') as f:
+            views = _parse(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), width, height)
+        if views is not None:
+            return views
+    except (OSError, ValueError):
+        pass
+
+    data = build(width, height)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        part = '{0}.{1}'.format(path, os.getpid())
+        with open(part, 'wb') as f:
+            f.write(data)
+        os.replace(part, path)
+    except OSError:
+        pass
+    return _parse(data, width, height)
+
+
+def table(name, width=WIDTH, height=HEIGHT):
+    """ Returns the table `name` of the board size as a read-only memoryview,
+        loading or generating the cache file on first use.
+    """
+    views = _loaded.get((width, height))
+    if views is None:
+        views = _loaded[width, height] = _load(width, height)
+    return views[name]
+
+
+def rays(width=WIDTH, height=HEIGHT):
+    """ Returns the tiles met walking from every tile in each direction, as
+        make_rays does, read from the cache.
+    """
+    result = _decoded.get(('rays', width, height))
+    if result is None:
+        result = _decoded['rays', width, height] = _decode_rays(table('rays', width, height), width * height)
+    return result
+
+
+def _decode_rays(flat, tiles):
+    result = []
+    i = 0
+    for tile in range(tiles):
+        count = flat[i]
+        i += 1
+        tile_rays = []
+        for _ in range(count):
+            length = flat[i]
+            tile_rays.append(tuple(flat[i + 1:i + 1 + length]))
+            i += 1 + length
+        result.append(tuple(tile_rays))
+    return tuple(result)
+
+
+def transforms(width=WIDTH):
+    """ Returns the (source, forward) tile tuples of every symmetry, as
+        make_transforms does, read from the cache.
+    """
+    n = width * width
+    flat = table('transforms', width, width)
+    return tuple((tuple(flat[i:i + n]), tuple(flat[i + n:i + 2 * n])) for i in range(0, len(flat), 2 * n))
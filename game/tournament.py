@@ -0,0 +1,156 @@
+""" Tournament: plays matches between two controllers with the same time
+    on their clocks and reports the score, the Elo difference it implies
+    and the playouts per second of MCTS players.
+
+    $ python -m game.tournament ai mcts --games 20 --clock 30
+    $ python -m game.tournament ai mcts --games 100 --clock 10 --openings openings.txt
+
+    Games are played in pairs from the same opening, each player taking
+    black once. Openings are read from a file of positions, such as the one
+    game.batch writes, or made by playing `--random-plies` random moves.
+"""
+import argparse
+import contextlib
+import math
+import os
+import random
+from game.board import Board
+from game.clock import GameClock
+from game.controllers import AiController
+from game.position import START
+from game.random_controller import RandomController
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+KINDS = ('ai', 'mcts', 'random')
+
+
+def make_controller(kind, colour, clock, seed=None):
+    """ Returns a controller of `kind` for `colour`, searching on `clock`.
+    """
+    if kind == 'random':
+        return RandomController(colour, seed)
+    if kind == 'mcts':
+        from game.mcts import MctsController
+        return MctsController(colour, clock.total, clock, playouts=1 << 62, seed=seed, display=False)
+    return AiController(kind, colour, clock.total, clock)
+
+
+def play_game(position, kinds, clock, seed=None):
+    """ Plays a game from `position` between a `kinds` (black, white) pair
+        and returns (black disc difference, controllers). A player running
+        out of time loses by every disc.
+    """
+    board = Board(False)
+    board.set_position(position)
+    clocks = {BLACK: GameClock(*clock), WHITE: GameClock(*clock)}
+    controllers = {colour: make_controller(kind, colour, clocks[colour], seed)
+                   for colour, kind in zip((BLACK, WHITE), kinds)}
+    player = STATES[position.player]
+    passed = False
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while True:
+            if not board.legal_moves(player):
+                if passed:
+                    break
+                passed = True
+            else:
+                passed = False
+                clocks[player].start()
+                move = controllers[player].next_move(board)
+                clocks[player].stop()
+                if clocks[player].flagged():
+                    return (-WIDTH * HEIGHT if player == BLACK else WIDTH * HEIGHT), controllers
+                board.make_move(move, player)
+            player = get_opponent(player)
+
+    blacks, whites = board.count(BLACK), board.count(WHITE)
+    empties = board.count(BOARD)
+    return blacks - whites + (empties if blacks > whites else -empties if blacks < whites else 0), controllers
+
+
+def random_openings(count, plies, seed=None):
+    """ Returns `count` positions reached by `plies` random moves from the start.
+    """
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        board = Board(False)
+        board.set_position(START)
+        player = BLACK
+        for _ in range(plies):
+            moves = sorted(board.legal_moves(player))
+            if moves:
+                board.make_move(rng.choice(moves), player)
+            player = get_opponent(player)
+        positions.append(board.snapshot(player))
+    return positions
+
+
+def elo(score):
+    """ Returns the Elo difference matching a share `score` of the points.
+    """
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def run(first, second, games, clock, openings, seed=None, report=None):
+    """ Plays `games` games between the kinds `first` and `second`, in pairs
+        from every opening, and returns (wins, draws, losses) of `first` and
+        the playouts per second of every MCTS player's moves, by kind.
+        `report(game, kinds, result)` is called after every game.
+    """
+    wins = draws = losses = 0
+    rates = {}
+    for game in range(games):
+        position = openings[(game // 2) % len(openings)]
+        kinds = (first, second) if game % 2 == 0 else (second, first)
+        result, controllers = play_game(position, kinds, clock, None if seed is None else seed + game)
+        score = result if game % 2 == 0 else -result
+        wins, draws, losses = wins + (score > 0), draws + (score == 0), losses + (score < 0)
+        for kind, controller in zip(kinds, (controllers[BLACK], controllers[WHITE])):
+            if kind == 'mcts':
+                rates.setdefault(kind, []).append((controller.played, controller.seconds))
+        if report:
+            report(game, kinds, result)
+    return (wins, draws, losses), {kind: sum(p for p, s in runs) / max(sum(s for p, s in runs), 1e-9)
+                                   for kind, runs in rates.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a match between two engines with equal time")
+    parser.add_argument('first', help="Kind of the first player", choices=KINDS)
+    parser.add_argument('second', help="Kind of the second player", choices=KINDS)
+    parser.add_argument('--games', help="Number of games", type=int, default=10)
+    parser.add_argument('--clock', help="Number of seconds on each player's clock for every game",
+                        type=float, default=30)
+    parser.add_argument('--increment', help="Number of seconds added to the clock after every move",
+                        type=float, default=0)
+    parser.add_argument('--openings', help="File of positions to start the games from")
+    parser.add_argument('--random-plies', help="Number of random moves the openings are made of, without a file",
+                        type=int, default=4)
+    parser.add_argument('--seed', help="Seed of the openings and random players", type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.openings:
+        from game.analyse import read_positions
+        openings = list(read_positions(args.openings))
+    else:
+        openings = random_openings((args.games + 1) // 2, args.random_plies, args.seed)
+
+    def report(game, kinds, result):
+        print('game {0:>3}: {1} (black) - {2} (white) {3:+d}'.format(game + 1, kinds[0], kinds[1], result))
+
+    (wins, draws, losses), rates = run(args.first, args.second, args.games, (args.clock, args.increment),
+                                       openings, args.seed, report)
+    score = (wins + draws / 2) / args.games
+    print('{0} - {1}: +{2} ={3} -{4}, {5:.1%}, Elo {6:+.0f}'.format(
+        args.first, args.second, wins, draws, losses, score, elo(score)))
+    for kind, rate in rates.items():
+        print('{0}: {1:.0f} playouts/s'.format(kind, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+""" Evaluation weight tuning: plays self-play games, extracts the evaluation
+    features of every position with vectorised bitboard operations and fits
+    weights for each game phase by least squares against the game results.
+
+    $ python -m game.tuning generate games.npz --games 10000
+    $ python -m game.tuning fit games.npz --output game/weights.json
+
+    The engine loads game/weights.json at startup. Requires NumPy.
+"""
+import argparse
+import json
+import os
+import random
+import numpy as np
+from game import bitboard, datagen
+from game.ai import DEFAULT_WEIGHTS, WEIGHTS_FILE
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+FEATURES = ('count', 'corner', 'edge', 'mobility', 'stability')
+
+# Labels are scaled so a win by every disc matches the largest evaluation
+# the default weights can give, five features at 100.
+LABEL_SCALE = 500.0 / (WIDTH * HEIGHT)
+
+DEFAULT_PHASES = (15, 30, 45, WIDTH * HEIGHT + 1)
+
+CHUNK = 1 << 20
+
+
+def self_play(games, depth=0, epsilon=0.1, seed=None):
+    """ Plays `games` games and returns (own, opp, labels): the bitboards of
+        the player to move and of the opponent in every position played, and
+        the final disc difference for the player to move, empty squares going
+        to the winner. Moves are random with depth 0, otherwise searched to
+        `depth` plies with an `epsilon` chance of a random move.
+    """
+    rng = random.Random(seed)
+    positions, labels = [], []
+    for _ in range(games):
+        played, scores, result = datagen.play_game(rng, depth, epsilon)
+        for position in played:
+            positions.append(position)
+            labels.append(result if position.player == WHITE_CELL else -result)
+
+    own, opp = bitboard.from_positions(positions)
+    return own, opp, np.array(labels, dtype=np.int8)
+
+
+def _ratio(a, b):
+    total = a + b
+    return np.divide(a - b, total, out=np.zeros(len(a)), where=total != 0)
+
+
+def features(own, opp):
+    """ Returns an (N, 5) array of the ending evaluation features of the
+        player owning `own`, as AlphaBetaPruner.ending_evaluation computes them.
+    """
+    own_discs, opp_discs = bitboard.popcount(own), bitboard.popcount(opp)
+    return np.stack([
+        _ratio(own_discs, opp_discs),
+        _ratio(bitboard.popcount(own & bitboard.CORNERS), bitboard.popcount(opp & bitboard.CORNERS)),
+        _ratio(bitboard.popcount(own & bitboard.EDGES), bitboard.popcount(opp & bitboard.EDGES)),
+        _ratio(bitboard.popcount(bitboard.legal_moves(own, opp)), bitboard.popcount(bitboard.legal_moves(opp, own))),
+        _ratio(own_discs - bitboard.popcount(bitboard.unstable(own, opp)),
+               opp_discs - bitboard.popcount(bitboard.unstable(opp, own))),
+    ], axis=1)
+
+
+def phase_of(own, opp, phases):
+    """ Returns the index of the game phase of every position.
+    """
+    empties = WIDTH * HEIGHT - bitboard.popcount(own | opp)
+    return np.searchsorted(np.asarray(phases), empties, side='right')
+
+
+def fit(datasets, phases=DEFAULT_PHASES):
+    """ Fits the ending weights of every phase by least squares over the
+        (own, opp, labels) datasets. Works chunk by chunk on the normal
+        equations, so the number of positions is only bounded by disk.
+        Phases without positions keep the default weights.
+    """
+    size = len(FEATURES)
+    xtx = np.zeros((len(phases), size, size))
+    xty = np.zeros((len(phases), size))
+    for own, opp, labels in datasets:
+        for start in range(0, len(own), CHUNK):
+            chunk_own, chunk_opp = np.asarray(own[start:start + CHUNK]), np.asarray(opp[start:start + CHUNK])
+            x = features(chunk_own, chunk_opp)
+            y = np.asarray(labels[start:start + CHUNK], dtype=np.float64) * LABEL_SCALE
+            phase = phase_of(chunk_own, chunk_opp, phases)
+            for i in range(len(phases)):
+                rows = phase == i
+                xtx[i] += x[rows].T @ x[rows]
+                xty[i] += x[rows].T @ y[rows]
+
+    default = DEFAULT_WEIGHTS['ending'][0]
+    ending = [np.linalg.lstsq(xtx[i], xty[i], rcond=None)[0].tolist() if xtx[i].any() else list(default)
+              for i in range(len(phases))]
+    return {'phases': list(phases), 'ending': ending, 'opening': list(DEFAULT_WEIGHTS['opening'])}
+
+
+def load(path):
+    """ Returns the (own, opp, labels) arrays stored in `path` by generate.
+    """
+    data = np.load(path)
+    return data['own'], data['opp'], data['labels']
+
+
+def datasets(paths):
+    """ Yields the (own, opp, labels) arrays of .npz files written by
+        generate, and of every shard in directories written by game.datagen.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for shard in datagen.load(path):
+                yield datagen.dataset(shard)
+        else:
+            yield load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on self-play games")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="Play games and store their positions")
+    generate.add_argument('output', help=".npz file to write")
+    generate.add_argument('--games', help="Number of games", type=int, default=1000)
+    generate.add_argument('--depth', help="Search depth of the players, 0 for random play", type=int, default=0)
+    generate.add_argument('--epsilon', help="Chance of a random move when searching", type=float, default=0.1)
+    generate.add_argument('--seed', help="Seed of the random moves", type=int, default=None)
+
+    fitting = commands.add_parser('fit', help="Fit weights on stored positions")
+    fitting.add_argument('data', help=".npz files written by generate, or shard directories written by game.datagen",
+                         nargs='+')
+    fitting.add_argument('--output', help="Weights file to write", default=WEIGHTS_FILE)
+    fitting.add_argument('--phases', help="Upper bounds of the empty squares of every phase", type=int,
+                         nargs='+', default=DEFAULT_PHASES)
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        own, opp, labels = self_play(args.games, args.depth, args.epsilon, args.seed)
+        np.savez(args.output, own=own, opp=opp, labels=labels)
+        print('{0} positions written to {1}'.format(len(own), args.output))
+    else:
+        weights = fit(datasets(args.data), args.phases)
+        with open(args.output, 'w') as f:
+            json.dump(weights, f, indent=1)
+        for bound, row in zip(weights['phases'], weights['ending']):
+            print('< {0:>2} empties: {1}'.format(bound, ', '.join(
+                '{0} {1:.1f}'.format(name, weight) for name, weight in zip(FEATURES, row))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+""" Game database: imports WTHOR archives of expert games into a record
+    store and an index of the positions they reach, for book building and
+    "games reaching this position" queries.
+
+    $ python -m game.wthor import games/ WTH_2001.wtb WTH_2002.wtb
+    $ python -m game.wthor query games/ '---------------------------OX------XO--------------------------- X'
+    $ python -m game.wthor book games/ book.txt --min-games 100 --plies 16
+
+    WTHOR files hold a HEADER and then one WTHOR_DTYPE record per game,
+    whose moves are 10 * row + column from 11 (a1) to 88 (h8), 0 after the
+    last one, with passes left out. Games are read in chunks and replayed
+    together on NumPy bitboards, and games with an illegal move are left
+    out. The others are appended to `games.bin`, STORE_DTYPE records after
+    a STORE_HEADER, their index in it being their game id. `index.db`, an
+    SQLite database, maps the hash of the canonical form of every position
+    reached in the first `plies` plies to the ids of its games, and to the
+    number of games, black wins, draws, white wins and sum of black's disc
+    differences. Positions where the player to move has to pass are
+    stored with the other player to move, and final positions with black
+    to move. Every imported file is recorded,
+    so importing it again does nothing and an interrupted import resumes
+    with the files it had not finished. Requires NumPy.
+"""
+import argparse
+import collections
+import os
+import sqlite3
+import struct
+import time
+import numpy as np
+from game import batch, bitboard
+from game.position import Position, START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+HEADER = struct.Struct('<BBBBIHHBBBx')
+WTHOR_DTYPE = np.dtype([('tournament', '<u2'), ('black', '<u2'), ('white', '<u2'), ('discs', 'u1'),
+                        ('theoretical', 'u1'), ('moves', 'u1', (60,))])
+
+STORE_MAGIC = b'OGMS'
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct('<4sI')
+STORE_DTYPE = np.dtype([('year', '<u2'), ('tournament', '<u2'), ('black', '<u2'), ('white', '<u2'),
+                        ('discs', 'u1'), ('theoretical', 'u1'), ('plies', 'u1'), ('result', 'i1'),
+                        ('moves', 'u1', (60,))])
+
+# Move byte of the plies after the last move, in the store.
+NO_MOVE = 255
+
+# Games replayed together.
+CHUNK = 1 << 14
+
+SCHEMA = ('''CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    black_wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    white_wins INTEGER NOT NULL,
+    total INTEGER NOT NULL
+)''', '''CREATE TABLE IF NOT EXISTS occurrences (
+    hash INTEGER NOT NULL,
+    game INTEGER NOT NULL,
+    PRIMARY KEY (hash, game)
+) WITHOUT ROWID''', '''CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    first INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    rejected INTEGER NOT NULL
+)''')
+
+UPSERT = '''INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(hash) DO UPDATE SET games = games + excluded.games, black_wins = black_wins + excluded.black_wins,
+    draws = draws + excluded.draws, white_wins = white_wins + excluded.white_wins, total = total + excluded.total'''
+
+# Games, black wins, draws, white wins and the sum of black's final disc
+# differences of the games reaching a position.
+Stats = collections.namedtuple('Stats', 'games black_wins draws white_wins total')
+
+ONE = np.uint64(1)
+_BLACK_START, _WHITE_START = (int(board[0]) for board in bitboard.from_positions([START]))
+
+
+def read_wthor(path, chunk=CHUNK):
+    """ Yields (year, records) for chunks of the games of a WTHOR file,
+        records being an array of WTHOR_DTYPE.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError('{0} is not a WTHOR file'.format(path))
+        fields = HEADER.unpack(header)
+        year, size = fields[6], fields[7]
+        if size not in (0, WIDTH):
+            raise ValueError('{0} holds games on a {1}x{1} board'.format(path, size))
+        while True:
+            data = f.read(chunk * WTHOR_DTYPE.itemsize)
+            count = len(data) // WTHOR_DTYPE.itemsize
+            if not count:
+                return
+            yield year, np.frombuffer(data[:count * WTHOR_DTYPE.itemsize], dtype=WTHOR_DTYPE)
+
+
+def tiles(moves):
+    """ Returns the tiles of WTHOR move bytes, NO_MOVE for 0, and whether
+        every byte of each game is a move or 0.
+    """
+    row, column = moves // 10, moves % 10
+    on_board = (row >= 1) & (row <= HEIGHT) & (column >= 1) & (column <= WIDTH)
+    result = np.where(on_board, (column.astype(np.int64) - 1) + (row.astype(np.int64) - 1) * WIDTH, NO_MOVE)
+    return result.astype(np.uint8), (on_board | (moves == 0)).all(axis=1)
+
+
+def normalise(own, opp, player):
+    """ Returns the (own, opp, player) of positions with the player to move
+        passing when only the other one has a move, and black to move once
+        neither has.
+    """
+    stuck = bitboard.legal_moves(own, opp) == 0
+    swap = stuck & ((bitboard.legal_moves(opp, own) != 0) | (player == WHITE_CELL))
+    return np.where(swap, opp, own), np.where(swap, own, opp), player ^ swap.astype(np.uint8)
+
+
+def replay(moves):
+    """ Plays the games of an array of move tiles, one row per game, and
+        returns (valid, plies, over, results, own, opp, player): whether every
+        move was legal, the number of moves, whether the game ended, black's
+        final disc difference with the empty squares going to the winner,
+        and the columns of positions reached, the first plies + 1 of which
+        every game reached.
+    """
+    count = len(moves)
+    own = np.full(count, _BLACK_START, dtype=np.uint64)
+    opp = np.full(count, _WHITE_START, dtype=np.uint64)
+    player = np.full(count, BLACK_CELL, dtype=np.uint8)
+    valid = np.ones(count, dtype=bool)
+    playing = np.ones(count, dtype=bool)
+    plies = np.zeros(count, dtype=np.int64)
+    owns, opps, players = [own], [opp], [player]
+    for ply in range(moves.shape[1]):
+        tile = moves[:, ply]
+        playing &= tile != NO_MOVE
+        if not playing.any():
+            break
+        move = np.where(playing, ONE << (tile.astype(np.uint64) & np.uint64(63)), np.uint64(0))
+        legal = (bitboard.legal_moves(own, opp) & move) != 0
+        valid &= legal | ~playing
+        playing &= legal
+        move = np.where(playing, move, np.uint64(0))
+        flipped = bitboard.flips(own, opp, move)
+        own, opp = np.where(playing, opp & ~flipped, own), np.where(playing, own | flipped | move, opp)
+        player = player ^ playing.astype(np.uint8)
+        own, opp, player = normalise(own, opp, player)
+        plies += playing
+        owns.append(own)
+        opps.append(opp)
+        players.append(player)
+
+    over = (bitboard.legal_moves(own, opp) == 0) & (bitboard.legal_moves(opp, own) == 0)
+    black = np.where(player == BLACK_CELL, own, opp)
+    white = np.where(player == BLACK_CELL, opp, own)
+    difference = bitboard.popcount(black) - bitboard.popcount(white)
+    empties = WIDTH * HEIGHT - bitboard.popcount(black | white)
+    results = difference + np.sign(difference) * empties
+    return valid, plies, over, results, np.stack(owns, axis=1), np.stack(opps, axis=1), np.stack(players, axis=1)
+
+
+def _mix(boards):
+    boards = boards ^ (boards >> np.uint64(30))
+    boards = boards * np.uint64(0xBF58476D1CE4E5B9)
+    boards = boards ^ (boards >> np.uint64(27))
+    boards = boards * np.uint64(0x94D049BB133111EB)
+    return boards ^ (boards >> np.uint64(31))
+
+
+def hashes(own, opp, player):
+    """ Returns the signed 64-bit hash of the canonical form of every
+        (own, opp, player) position.
+    """
+    own, opp = bitboard.canonical(own, opp)
+    return _mix(_mix(own ^ (player.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))) ^ opp).view(np.int64)
+
+
+class GameStore(object):
+    """Games appended to a file of STORE_DTYPE records."""
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION))
+        with open(path, 'rb') as f:
+            magic, version = STORE_HEADER.unpack(f.read(STORE_HEADER.size))
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError('{0} is not a game store of version {1}'.format(path, STORE_VERSION))
+        self._records = None
+
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - STORE_HEADER.size) // STORE_DTYPE.itemsize
+
+
+    def records(self):
+        """ Returns the records as a read-only memory-mapped array.
+        """
+        if self._records is None or len(self._records) != len(self):
+            self._records = np.memmap(self.path, dtype=STORE_DTYPE, mode='r', offset=STORE_HEADER.size,
+                                      shape=(len(self),)) if len(self) else np.zeros(0, dtype=STORE_DTYPE)
+        return self._records
+
+
+    def append(self, records):
+        with open(self.path, 'ab') as f:
+            f.write(records.tobytes())
+
+
+    def truncate(self, count):
+        """ Drops the games after the first `count`, left by an import that
+            did not finish.
+        """
+        self._records = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(STORE_HEADER.size + count * STORE_DTYPE.itemsize)
+
+
+class GameDatabase(object):
+    """The game store and position index kept in `directory`."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.store = GameStore(os.path.join(directory, 'games.bin'))
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.db'))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+        stored = self.connection.execute('SELECT coalesce(max(first + games), 0) FROM files').fetchone()[0]
+        if len(self.store) != stored:
+            self.store.truncate(stored)
+
+
+    def __len__(self):
+        return len(self.store)
+
+
+    def import_file(self, path, plies=60, report=None):
+        """ Imports the games of a WTHOR file, indexing the positions of
+            their first `plies` plies, and returns (games, rejected), or None
+            when the file was imported before. `report(games, rejected)` is
+            called after every chunk.
+        """
+        name = os.path.basename(path)
+        if self.connection.execute('SELECT 1 FROM files WHERE name = ?', (name,)).fetchone():
+            return None
+        first = len(self.store)
+        games = rejected = 0
+        with self.connection:
+            for year, chunk in read_wthor(path):
+                records = self.replay_chunk(year, chunk, first + games, plies)
+                rejected += len(chunk) - len(records)
+                games += len(records)
+                self.store.append(records)
+                if report:
+                    report(games, rejected)
+            self.connection.execute('INSERT INTO files VALUES (?, ?, ?, ?)', (name, first, games, rejected))
+        return games, rejected
+
+
+    def replay_chunk(self, year, chunk, first, plies):
+        """ Replays a chunk of WTHOR records, indexes the valid games with ids
+            from `first` on and returns their STORE_DTYPE records.
+        """
+        moves, well_formed = tiles(chunk['moves'])
+        valid, played, over, results, own, opp, player = replay(moves)
+        keep = np.flatnonzero(valid & well_formed)
+        moves, played, own, opp, player = moves[keep], played[keep], own[keep], opp[keep], player[keep]
+        # Games that did not end keep the result of the file.
+        results = np.where(over[keep], results[keep], 2 * chunk['discs'][keep].astype(np.int64) - WIDTH * HEIGHT)
+
+        records = np.zeros(len(keep), dtype=STORE_DTYPE)
+        records['year'] = year
+        for field in ('tournament', 'black', 'white', 'discs', 'theoretical'):
+            records[field] = chunk[field][keep]
+        records['plies'] = played
+        records['result'] = results
+        records['moves'] = moves
+
+        depth = min(plies, own.shape[1] - 1) + 1
+        reached = np.arange(depth)[None, :] <= played[:, None]
+        games = np.broadcast_to(np.arange(first, first + len(keep))[:, None], reached.shape)[reached]
+        outcome = np.broadcast_to(results[:, None], reached.shape)[reached]
+        keys = hashes(own[:, :depth][reached], opp[:, :depth][reached], player[:, :depth][reached])
+
+        order = np.argsort(keys, kind='stable')
+        self.connection.executemany('INSERT OR IGNORE INTO occurrences VALUES (?, ?)', zip(
+            keys[order].tolist(), games[order].tolist()))
+
+        unique, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros((len(unique), 5), dtype=np.int64)
+        np.add.at(totals, inverse, np.stack([np.ones_like(outcome), outcome > 0, outcome == 0, outcome < 0,
+                                             outcome], axis=1).astype(np.int64))
+        self.connection.executemany(UPSERT, ((key,) + tuple(row) for key, row in zip(
+            unique.tolist(), totals.tolist())))
+        return records
+
+
+    def key(self, position):
+        """ Returns the index hash of an 8x8 Position.
+        """
+        own, opp = bitboard.from_positions([position])
+        return int(hashes(*normalise(own, opp, np.array([position.player], dtype=np.uint8)))[0])
+
+
+    def lookup(self, position):
+        """ Returns the Stats of the games reaching the Position, or None.
+        """
+        row = self.connection.execute('SELECT games, black_wins, draws, white_wins, total FROM positions '
+                                      'WHERE hash = ?', (self.key(position),)).fetchone()
+        return Stats(*row) if row else None
+
+
+    def games(self, position, limit=None):
+        """ Returns the ids of the games reaching the Position, at most `limit`.
+        """
+        return [game for game, in self.connection.execute(
+            'SELECT game FROM occurrences WHERE hash = ? ORDER BY game LIMIT ?',
+            (self.key(position), -1 if limit is None else limit))]
+
+
+    def game(self, game):
+        """ Returns the STORE_DTYPE record of a game.
+        """
+        return self.store.records()[game]
+
+
+    def moves(self, game):
+        """ Returns the moves of a game as (x, y) tuples, passes left out.
+        """
+        record = self.game(game)
+        return [(int(tile) % WIDTH, int(tile) // WIDTH) for tile in record['moves'][:record['plies']]]
+
+
+    def continuations(self, position):
+        """ Returns (move, Position, Stats) for the legal moves of the Position
+            reached by some game, the most played first.
+        """
+        return [(move, child, stats) for move, child, key, stats in self.children(position)]
+
+
+    def children(self, position):
+        """ Returns (move, Position, key, Stats) for the legal moves of the
+            Position reached by some game, the most played first, looked up
+            in one query.
+        """
+        own, opp = bitboard.from_positions([position])
+        legal = int(bitboard.legal_moves(own, opp)[0])
+        tiles = [tile for tile in range(WIDTH * HEIGHT) if legal >> tile & 1]
+        if not tiles:
+            return []
+        moves = np.array([1 << tile for tile in tiles], dtype=np.uint64)
+        own, opp = np.repeat(own, len(tiles)), np.repeat(opp, len(tiles))
+        flipped = bitboard.flips(own, opp, moves)
+        after = normalise(opp & ~flipped, own | flipped | moves,
+                          np.full(len(tiles), position.player ^ 1, dtype=np.uint8))
+        keys = hashes(*after).tolist()
+        found = {row[0]: Stats(*row[1:]) for row in self.connection.execute(
+            'SELECT hash, games, black_wins, draws, white_wins, total FROM positions WHERE hash IN ({0})'.format(
+                ', '.join('?' * len(keys))), keys)}
+        result = [((tile % WIDTH, tile // WIDTH), child, key, found[key])
+                  for tile, child, key in zip(tiles, batch.Batch(*after).positions(), keys) if key in found]
+        result.sort(key=lambda entry: -entry[3].games)
+        return result
+
+
+    def book(self, min_games, plies, position=START):
+        """ Yields (Position, Stats) for the positions reached by `min_games`
+            games or more in the `plies` plies from `position`, depth first,
+            each once up to symmetry.
+        """
+        stats = self.lookup(position)
+        if stats is None or stats.games < min_games:
+            return
+        seen = {self.key(position)}
+        stack = [(position, stats, plies)]
+        while stack:
+            position, stats, left = stack.pop()
+            yield position, stats
+            if left:
+                children = []
+                for move, child, key, child_stats in self.children(position):
+                    if child_stats.games >= min_games and key not in seen:
+                        seen.add(key)
+                        children.append((child, child_stats, left - 1))
+                stack.extend(reversed(children))
+
+
+    def close(self):
+        self.connection.close()
+
+
+def format_stats(stats):
+    return '{0} games, black {1:.1%} draw {2:.1%} white {3:.1%}, average {4:+.1f}'.format(
+        stats.games, stats.black_wins / stats.games, stats.draws / stats.games, stats.white_wins / stats.games,
+        stats.total / stats.games)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import WTHOR game archives and query the positions they reach")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importing = commands.add_parser('import', help="Import WTHOR files")
+    importing.add_argument('database', help="Directory of the game store and index")
+    importing.add_argument('files', help="WTHOR .wtb files", nargs='+')
+    importing.add_argument('--plies', help="Number of plies of every game to index", type=int, default=60)
+
+    query = commands.add_parser('query', help="Show the games reaching a position and their moves from it")
+    query.add_argument('database', help="Directory of the game store and index")
+    query.add_argument('position', help="Position in the text form of game.analyse")
+    query.add_argument('--games', help="Number of game ids to show", type=int, default=10)
+
+    booking = commands.add_parser('book', help="Write the positions reached by enough games")
+    booking.add_argument('database', help="Directory of the game store and index")
+    booking.add_argument('output', help="File of positions to write, which game.analyse reads")
+    booking.add_argument('--min-games', help="Number of games a position needs", type=int, default=100)
+    booking.add_argument('--plies', help="Number of plies from the start", type=int, default=16)
+
+    args = parser.parse_args()
+
+    database = GameDatabase(args.database)
+    try:
+        if args.command == 'import':
+            started = time.perf_counter()
+            total = 0
+            for path in args.files:
+                result = database.import_file(path, args.plies)
+                if result is None:
+                    print('{0}: imported before'.format(path))
+                    continue
+                total += result[0]
+                print('{0}: {1} games, {2} rejected'.format(path, *result))
+            seconds = time.perf_counter() - started
+            print('{0} games in {1:.1f}s ({2:.0f}/s), {3} in the database'.format(
+                total, seconds, total / max(seconds, 1e-9), len(database)))
+        elif args.command == 'query':
+            position = Position.from_string(args.position)
+            stats = database.lookup(position)
+            if stats is None:
+                print('no game reaches this position')
+                return
+            print(format_stats(stats))
+            for move, child, child_stats in database.continuations(position):
+                print('{0}{1}: {2}'.format(chr(ord('a') + move[0]), move[1] + 1, format_stats(child_stats)))
+            print('games: {0}'.format(' '.join(str(game) for game in database.games(position, args.games))))
+        else:
+            count = 0
+            with open(args.output, 'w') as f:
+                for position, stats in database.book(args.min_games, args.plies):
+                    f.write(position.to_string() + '\n')
+                    count += 1
+            print('{0} positions written to {1}'.format(count, args.output))
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,48 @@
 
 import argparse
 from game.game import Game
+from game.settings import WIDTH, MIN_SIZE, MAX_SIZE
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--timeout', help="Number of seconds the brain is allowed to think before making its move",
                         type=int, default=86400)
+    parser.add_argument('--clock', help="Number of seconds on each player's clock for the whole game",
+                        type=float, default=None)
+    parser.add_argument('--increment', help="Number of seconds added to the clock after every move",
+                        type=float, default=0)
+    parser.add_argument('--moves', help="Give the clock time again after every this many moves",
+                        type=int, default=None)
+    parser.add_argument('--nodes', help="Number of nodes the brain searches per move, instead of a time limit",
+                        type=int, default=None)
+    parser.add_argument('--seed', help="Seed of the random player", type=int, default=None)
+    parser.add_argument('--size', help="Number of tiles on each side of the board, an even number from "
+                        "{0} to {1}".format(MIN_SIZE, MAX_SIZE), type=int, default=WIDTH,
+                        choices=range(MIN_SIZE, MAX_SIZE + 1, 2), metavar='SIZE')
+    parser.add_argument('--profile', help="Write per-move profiles of the brain to PROFILE.txt and its call "
+                        "stacks to PROFILE.folded", default=None)
+    parser.add_argument('--profile-memory', help="Add the memory allocated by every move to the profiles",
+                        action='store_true')
     parser.add_argument('--text', help="Display the game in text mode", action='store_false')
     parser.add_argument('--player', help="Player first", action='store_true')
     parser.add_argument('--ai', help="AI first", action='store_true')
     parser.add_argument('--verify', help="Verify AI using a random player", action='store_true')
+    parser.add_argument('--engine', help="Engine of the AI: alpha-beta search, or Monte Carlo tree search with "
+                        "--nodes playouts per move on 8x8 boards", choices=('ai', 'mcts'), default='ai')
+    parser.add_argument('--process', help="Run the alpha-beta search in a worker process kept for the whole game, "
+                        "can not be profiled",
+                        action='store_true')
 
     args = parser.parse_args()
+    if args.process and (args.profile or args.profile_memory):
+        parser.error("--profile and --profile-memory profile the brain in this process, not with --process")
 
     if args.timeout <= 0:
         exit()
 
+    clock = (args.clock, args.increment, args.moves) if args.clock else None
+
     players=['player', 'player']
     if args.player:
         players = ['player', 'ai']
@@ -25,8 +51,15 @@ def main():
         players = ['ai', 'player']
     elif args.verify:
         players = ['ai', 'random']
+    players = [args.engine if player == 'ai' else player for player in players]
+
+    profiler = None
+    if args.profile:
+        from game.profiler import Profiler
+        profiler = Profiler(args.profile, args.profile_memory)
+        profiler.install()
 
-    game = Game(args.timeout, players, args.text)
+    game = Game(args.timeout, players, args.text, clock, args.nodes, args.seed, profiler, args.size, args.process)
     game.run()
 
 
@@ -1,6 +1,23 @@
+import contextlib
+import datetime
+import io
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from unittest import mock
+from game.ai import AlphaBetaPruner, EngineSession
+from game.benchmark import SUITE
 from game.board import Board
-from game.controllers import AiController
+from game.brain import Brain
+from game.controllers import AiController, PlayerController
+from game.engine_process import EngineProcess, SEARCHES
+from game.game import Game
+from game.position import Position, START, start
+from game.random_controller import RandomController
 from game.settings import *
+from game.symmetry import canonical
 
 __author__ = 'bengt'
 
@@ -41,11 +58,267 @@ class TestAi(unittest.TestCase):
 
         print(b.draw())
 
-        ai = AiController(0, WHITE)
+        ai = AiController(0, WHITE, 1)
         move = ai.next_move(b)
 
         #self.assertEqual(, )
         self.assertIn(move, [p.get_position() for p in b.get_move_pieces(WHITE)])
 
+    def testSolve(self):
+        for name, text, best, score in SUITE:
+            position = Position.from_string(text)
+            if position.cells.count(BOARD_CELL) > 8:
+                continue
+
+            pruner = AlphaBetaPruner(None, 1, position, STATES[position.player], STATES[position.player ^ 1],
+                                     display=False)
+            found, move = pruner.solve()
+            self.assertEqual(found, score)
+            self.assertIn(coordinate(move), best)
+
+    def testSizes(self):
+        for size in (6, 10):
+            position = start(size, size)
+            board = Board(False, size, size)
+            board.set_position(position)
+            pruner = AlphaBetaPruner(None, 1, position, BLACK, WHITE, display=False)
+            self.assertEqual(set(pruner.get_moves(position.cells, position.player)), board.legal_moves(BLACK))
+            self.assertIn(pruner.alpha_beta_search(2), board.legal_moves(BLACK))
+            self.assertEqual(pruner.default_depth(), 4)
+
+        position = start(4, 4)
+        pruner = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False)
+        score, move = pruner.solve()
+        self.assertEqual(score, self.minimax(Board(False, 4, 4), position, BLACK, False))
+
+    def minimax(self, board, position, player, passed):
+        board.set_position(position)
+        moves = board.legal_moves(player)
+        if not moves:
+            if passed:
+                mine, theirs = position.cells.count(CELLS[player]), position.cells.count(CELLS[get_opponent(player)])
+                return mine - theirs + (len(position.cells) - mine - theirs) * ((mine > theirs) - (mine < theirs))
+            return -self.minimax(board, position, get_opponent(player), True)
+
+        best = -len(position.cells)
+        for move in moves:
+            board.set_position(position)
+            board.make_move(move, player)
+            best = max(best, -self.minimax(board, board.snapshot(get_opponent(player)), get_opponent(player), False))
+        return best
+
+    def testTimeout(self):
+        pruner = AlphaBetaPruner(None, 0.2, START, BLACK, WHITE, display=False)
+        began = time.monotonic()
+        move = pruner.alpha_beta_search(20)
+        self.assertLess(time.monotonic() - began, 0.5)
+        self.assertTrue(pruner.timed_out)
+        self.assertIn(move, [(2, 3), (3, 2), (4, 5), (5, 4)])
+
+    def testStop(self):
+        q = queue.Queue(1)
+        brain = Brain(86400, threading.Lock(), q, START, BLACK, WHITE, display=False)
+        brain.start()
+        time.sleep(0.2)
+        brain.stop()
+        move = q.get(timeout=1)
+        self.assertIn(move, [(2, 3), (3, 2), (4, 5), (5, 4)])
+        brain.join()
+
+        stop = threading.Event()
+        stop.set()
+        pruner = AlphaBetaPruner(None, 86400, Position.from_string(SUITE[-1][1]), BLACK, WHITE,
+                                 display=False, stop=stop)
+        score, move = pruner.solve()
+        self.assertTrue(pruner.timed_out)
+        self.assertIsNone(score)
+
+    def testSession(self):
+        position = Position.from_string(SUITE[12][1])
+        session = EngineSession()
+        pruner = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False, session=session)
+        move = pruner.alpha_beta_search(4)
+        fresh = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False)
+        self.assertEqual(fresh.alpha_beta_search(4), move)
+        self.assertEqual((session.pv[0][1], len(session.pv)), (move, 5))
+
+        expected, reply = session.pv[2]
+        empties = expected[0].count(BOARD_CELL)
+        pruner = AlphaBetaPruner(None, 86400, Position(*expected), BLACK, WHITE, display=False, session=session)
+        self.assertIn(pruner.alpha_beta_search(4), pruner.get_moves(*expected))
+        self.assertEqual((session.searches, session.predicted), (2, 1))
+        self.assertTrue(all(key[0].count(BOARD_CELL) <= empties for key in session.table))
+
+        # A new game clears the tables the engine already holds.
+        pruner = AlphaBetaPruner(None, 86400, START, BLACK, WHITE, display=False, session=session)
+        pruner.alpha_beta_search(2)
+        self.assertIs(pruner.table, session.table)
+        self.assertTrue(session.table)
+        self.assertTrue(all(key[0].count(BOARD_CELL) >= 58 for key in session.table))
+        self.assertEqual(session.searches, 1)
+
+        controller = AiController(0, BLACK, 86400)
+        board = Board(False)
+        board.set_position(START)
+        controller.next_move(board)
+        self.assertEqual(controller.session.searches, 1)
+        self.assertTrue(controller.session.table)
+
+    def testAnalysis(self):
+        position = Position.from_string(SUITE[1][1])
+        pruner = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False)
+        results = list(pruner.analysis(3))
+        self.assertEqual([depth for depth, lines in results], [1, 2, 3])
+        full = results[-1][1]
+        self.assertEqual(sorted(line.move for line in full), pruner.get_moves(*position))
+        self.assertTrue(all(line.exact and line.pv[0] == line.move for line in full))
+        self.assertEqual([line.score for line in full], sorted((line.score for line in full), reverse=True))
+
+        fresh = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False)
+        self.assertEqual(fresh.alpha_beta_search(3), full[0].move)
+        self.assertAlmostEqual(fresh.score, full[0].score)
+
+        top = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False)
+        depth, lines = list(top.analysis(3, top=2))[-1]
+        self.assertLess(top.nodes, pruner.nodes)
+        for line, expected in zip(lines[:2], full):
+            self.assertEqual((line.move, line.exact), (expected.move, True))
+            self.assertAlmostEqual(line.score, expected.score)
+        self.assertTrue(all(line.score <= lines[1].score for line in lines[2:] if not line.exact))
+
+        start_lines = list(AlphaBetaPruner(None, 86400, START, BLACK, WHITE, display=False).analysis(2))[-1][1]
+        self.assertEqual(len(set(line.score for line in start_lines)), 1)
+        self.assertTrue(all(len(line.pv) == 3 for line in start_lines))
+
+        board = Board(False)
+        board.set_position(position)
+        out = io.StringIO()
+        PlayerController(BLACK, hint_time=1).hint(board, out=out)
+        self.assertTrue(out.getvalue().startswith('Depth 1: '))
+
+    def testPlayerPrinted(self):
+        board = Board(False)
+        board.set_position(START)
+        player = PlayerController(BLACK)
+        for entered, printed in ((['d3'], False), (['z9', 'd3'], True), (['d3'], False)):
+            with mock.patch('builtins.input', side_effect=entered), contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(player.next_move(board), (3, 2))
+            self.assertEqual(player.printed(), printed)
+
+    def testPrincipalVariation(self):
+        # The moves of START lead to symmetric positions, only one of which
+        # is searched. The table keeps best moves on the canonical board, so
+        # the line after any of them is read in its own orientation.
+        pruner = AlphaBetaPruner(None, 86400, START, BLACK, WHITE, display=False)
+        depth, lines = list(pruner.analysis(5, top=3))[-1]
+        for move in pruner.get_moves(*START):
+            line = pruner.principal_variation(move)
+            self.assertEqual(len(line), depth + 1)
+            for ply, (state, move) in enumerate(line[1:], 1):
+                entry = pruner.table[canonical(state)[0]]
+                fresh = AlphaBetaPruner(None, 86400, START, BLACK, WHITE, display=False)
+                fresh.lifetime, fresh.max_depth = datetime.datetime.max, ply - 1 + entry[0]
+                scores = {m: -fresh.negamax(ply, fresh.next_state(state, m), m, -float('Inf'), float('Inf'))
+                          for m in fresh.get_moves(*state)}
+                self.assertAlmostEqual(scores[move], max(scores.values()))
+
+    def testEngineProcess(self):
+        position = Position.from_string(SUITE[0][1])
+        expected = AlphaBetaPruner(None, 86400, position, BLACK, WHITE, display=False, node_limit=2000)
+        move = expected.alpha_beta_search()
+        engine = EngineProcess()
+        try:
+            self.assertEqual(engine.search(position, 86400, node_limit=2000), move)
+            self.assertEqual((engine.score, engine.nodes), (expected.score, expected.nodes))
+            self.assertEqual(engine.progress()[0], expected.nodes)
+            self.assertEqual(engine.depth, 0 if expected.timed_out else expected.max_depth)
+            engine.search(START, 86400, node_limit=20)
+            self.assertEqual(engine.depth, 0)
+
+            # The progress of the new search shows up while it runs.
+            engine.start(START, 86400, soft=86400)
+            deadline = time.monotonic() + 60
+            while engine.progress()[0] <= expected.nodes and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertGreater(engine.progress()[0], expected.nodes)
+            engine.stop()
+            self.assertIn(engine.result(), [(2, 3), (3, 2), (4, 5), (5, 4)])
+            self.assertLess(engine.depth, 60)
+            self.assertEqual(engine.stats[SEARCHES], 3)
+        finally:
+            engine.close()
+        self.assertFalse(engine.process.is_alive())
+
+        controller = AiController(0, BLACK, 1, process=True)
+        board = Board(False)
+        board.set_position(START)
+        self.assertIn(controller.next_move(board), board.legal_moves(BLACK))
+        process = controller.engine.process
+        controller.next_move(board)
+        self.assertIs(controller.engine.process, process)
+        controller.close()
+        self.assertFalse(process.is_alive())
+
+    def testGameClosesEngine(self):
+        game = Game(players=['ai', 'random'], node_limit=100, seed=1, size=6, process=True)
+        controller = game.ctrlers[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(SystemExit, game.run)
+        self.assertIsNone(controller.engine)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def testNodeLimit(self):
+        position = Position.from_string(SUITE[0][1])
+        results = []
+        for _ in range(2):
+            pruner = AlphaBetaPruner(None, 0, position, STATES[position.player], STATES[position.player ^ 1],
+                                     display=False, node_limit=200)
+            move = pruner.alpha_beta_search(6)
+            results.append((move, pruner.score, pruner.nodes))
+            self.assertTrue(pruner.timed_out)
+            self.assertLessEqual(pruner.nodes, 200)
+        self.assertEqual(results[0], results[1])
+
+    def testFeatures(self):
+        pruner = AlphaBetaPruner(None, 1, START, BLACK, WHITE, display=False)
+        corners, x_squares, c_squares, edges = pruner.squares
+        rng = random.Random(3)
+        state = (START.cells, START.player)
+        while True:
+            cells = state[0]
+            for player in (WHITE_CELL, BLACK_CELL):
+                features = pruner.features(cells, player)
+                for colour, i in ((player, 0), (player ^ 1, 1)):
+                    other = colour ^ 1
+                    bad = set()
+                    for tile in range(len(cells)):
+                        for ray in pruner.rays[tile] if cells[tile] == other else ():
+                            for j, t in enumerate(ray):
+                                if cells[t] != colour:
+                                    if cells[t] == BOARD_CELL:
+                                        bad.update(ray[:j])
+                                    break
+                    self.assertEqual(features.discs[i], cells.count(colour))
+                    self.assertEqual(features.corners[i], sum(cells[t] == colour for t in corners))
+                    self.assertEqual(features.edges[i], sum(cells[t] == colour for t in edges))
+                    self.assertEqual(features.mobility[i], len(pruner.get_moves(cells, colour)))
+                    self.assertEqual(features.potential[i], sum(
+                        cells[t] == BOARD_CELL and any(cells[ray[0]] == other for ray in pruner.rays[t])
+                        for t in range(len(cells))))
+                    self.assertEqual(features.stability[i], cells.count(colour) - len(bad))
+                self.assertEqual(features.empties, cells.count(BOARD_CELL))
+            moves = pruner.get_moves(*state) or pruner.get_moves(cells, state[1] ^ 1)
+            if not moves:
+                break
+            if not pruner.get_moves(*state):
+                state = (cells, state[1] ^ 1)
+            state = pruner.next_state(state, rng.choice(moves))
+
+    def testSeededRandom(self):
+        b = Board(False)
+        b.set_position(START)
+        moves = [RandomController(BLACK, 7).next_move(b) for _ in range(2)]
+        self.assertEqual(moves[0], moves[1])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+from game.ai import AlphaBetaPruner
+from game.analyse import analyse_stream, completed_lines, format_result, read_positions
+from game.benchmark import SUITE
+from game.board import Board
+from game.position import Position, start
+from game.settings import *
+from game.symmetry import transform_cells, transform_move
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestAnalyse(unittest.TestCase):
+    def setUp(self):
+        self.suite = [entry for entry in SUITE if Position.from_string(entry[1]).cells.count(BOARD_CELL) <= 8]
+
+    def test_stream_in_order(self):
+        positions = [Position.from_string(text) for name, text, best, score in self.suite]
+        results = list(analyse_stream(iter(positions), solve_empties=8, processes=2))
+
+        self.assertEqual([position for position, result in results], positions)
+        for (name, text, best, score), (position, (move, found, depth, nodes, lines)) in zip(self.suite, results):
+            self.assertIn(move, best)
+            self.assertEqual(found, score)
+            self.assertEqual(depth, 8)
+
+    def test_lines(self):
+        positions = [Position.from_string(text) for name, text, best, score in self.suite[:4]]
+        positions.append(Position(transform_cells(positions[0].cells, 5), positions[0].player))
+        results = list(analyse_stream(iter(positions), depth=3, lines=2))
+
+        for position, (move, score, depth, nodes, lines) in results:
+            board = Board(False)
+            board.set_position(position)
+            self.assertIn(parse_coordinate(move), board.legal_moves(STATES[position.player]))
+            self.assertEqual(depth, 3)
+            self.assertEqual([line[:3] for line in lines][:1], [(move, score, True)])
+            self.assertEqual((len(lines), lines[0][3][0]), (2, move))
+            self.assertGreaterEqual(lines[0][1], lines[1][1])
+
+        first, symmetric = results[0][1][4], results[-1][1][4]
+        self.assertEqual([tuple(coordinate(transform_move(parse_coordinate(m), 5)) for m in line[3]) for line in first],
+                         [line[3] for line in symmetric])
+        self.assertEqual(format_result(*results[0]).split('\t')[-1].split(' | ')[0].split()[1], first[0][3][0])
+
+    def test_sizes(self):
+        first = start(6, 6)
+        after = AlphaBetaPruner(None, 1, first, BLACK, WHITE, display=False).next_state(first, (2, 1))
+        positions = [Position(*after), Position(transform_cells(after[0], 3), after[1])]
+        results = list(analyse_stream(iter(positions), depth=2, lines=2))
+
+        for position, (move, score, depth, nodes, lines) in results:
+            board = Board(False, 6, 6)
+            board.set_position(position)
+            legal = board.legal_moves(STATES[position.player])
+            self.assertIn(parse_coordinate(move), legal)
+            self.assertTrue(all(parse_coordinate(line[0]) in legal for line in lines))
+        self.assertEqual(transform_move(parse_coordinate(results[0][1][0]), 3, 6), parse_coordinate(results[1][1][0]))
+
+    def test_cut_short(self):
+        position = Position.from_string(self.suite[0][1])
+        searched, solved = [result for position, result in
+                            analyse_stream(iter([start(), position]), depth=6, solve_empties=8, node_limit=50)]
+
+        self.assertEqual((searched[1], searched[2]), (None, 0))
+        self.assertEqual((solved[1], solved[2]), (None, 0))
+        self.assertLessEqual(searched[3], 50)
+        deepened = list(analyse_stream(iter([start()]), depth=6, node_limit=50, lines=1))[0][1]
+        self.assertIn(deepened[2], range(1, 6))
+        self.assertEqual(deepened[1], deepened[4][0][1])
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            positions = os.path.join(directory, 'positions.txt')
+            with open(positions, 'w') as f:
+                f.write('\n'.join(text for name, text, best, score in self.suite))
+            self.assertEqual(len(list(read_positions(positions))), len(self.suite))
+
+            output = os.path.join(directory, 'results.tsv')
+            with open(output, 'w') as f:
+                f.write('first\nsecond\nthi')
+            self.assertEqual(completed_lines(output), 2)
+            with open(output) as f:
+                self.assertEqual(f.read(), 'first\nsecond\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+from game.ai import AlphaBetaPruner
+from game.position import START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+try:
+    import numpy as np
+    from game import batch
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+        self.pruner = AlphaBetaPruner(None, 0, START, BLACK, WHITE, display=False)
+
+    def test_matches_engine(self):
+        games = batch.Batch.start(50)
+        pick = batch.random_picker(self.rng)
+        while not games.done.all():
+            before = games.positions()
+            done = games.done.copy()
+            games.step(pick)
+            for position, after, was_done, is_done in zip(before, games.positions(), done, games.done):
+                moves = self.pruner.get_moves(*position)
+                if was_done or is_done:
+                    self.assertEqual(after, position)
+                    self.assertEqual(moves, [])
+                elif not moves:
+                    self.assertEqual(after, (position.cells, position.player ^ 1))
+                else:
+                    self.assertIn(after, [self.pruner.next_state(position, move) for move in moves])
+
+        for position, result in zip(games.positions(), games.results()):
+            self.assertEqual(self.pruner.final_score(position.cells, BLACK_CELL, WHITE_CELL), result)
+
+    def test_pickers(self):
+        games = batch.Batch.start(400)
+        moves = np.full(len(games), np.uint64(0x0000102004080000))
+        chosen = batch.random_picker(self.rng)(games.own, games.opp, moves)
+        self.assertEqual(set(chosen.tolist()), {1 << 19, 1 << 26, 1 << 37, 1 << 44})
+
+        weights = np.zeros(WIDTH * HEIGHT)
+        weights[37] = 1
+        chosen = batch.weighted_picker(weights, self.rng)(games.own, games.opp, moves)
+        self.assertEqual(set(chosen.tolist()), {1 << 37})
+        chosen = batch.weighted_picker(weights, self.rng)(games.own, games.opp, moves & ~np.uint64(1 << 37))
+        self.assertEqual(set(chosen.tolist()), {1 << 19, 1 << 26, 1 << 44})
+
+    def test_openings(self):
+        games = batch.Batch.start(200)
+        self.assertEqual(games.play(batch.random_picker(self.rng), 2), 200)
+        self.assertEqual(len(batch.openings(games)), 3)
+        self.assertEqual(games.play(batch.random_picker(self.rng)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
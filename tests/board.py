@@ -357,5 +357,56 @@ class TestBoard(unittest.TestCase):
 
         #b.make_move()
 
+    def test_copy(self):
+        b = Board(False)
+        b.set_white(3, 3)
+        b.set_black(4, 3)
+        c = b.copy()
+        c.set_black(3, 3)
+
+        self.assertEqual(b.pieces[27].get_state(), WHITE)
+        self.assertEqual(c.pieces[27].get_state(), BLACK)
+        self.assertEqual(c.count(BLACK), 2)
+        self.assertEqual(b.count(BLACK), 1)
+
+    def test_pieces_are_views(self):
+        b = Board(False)
+        b.pieces[9].set_white()
+        self.assertEqual(b.count(WHITE), 1)
+        b.set_black(1, 1)
+        self.assertEqual(b.pieces[9].get_state(), BLACK)
+
+    def test_legal_moves(self):
+        b = Board(False)
+        b.set_white(3, 3)
+        b.set_white(4, 4)
+        b.set_black(3, 4)
+        b.set_black(4, 3)
+
+        self.assertEqual(b.legal_moves(BLACK), {(3, 2), (2, 3), (5, 4), (4, 5)})
+        self.assertEqual(b.legal_moves(WHITE), {(4, 2), (5, 3), (2, 4), (3, 5)})
+
+        b.make_move((3, 2), BLACK)
+        self.assertEqual(b.count(BLACK), 4)
+        self.assertEqual(b.legal_moves(WHITE), {(2, 2), (4, 2), (2, 4)})
+        self.assertRaises(ValueError, b.make_move, (3, 2), WHITE)
+
+        b.set_black(4, 4)
+        self.assertEqual(b.legal_moves(WHITE), set())
+
+    def test_sizes(self):
+        b = Board(False, 10, 10)
+        self.assertEqual(b.draw().split('\n')[-2], '10 ' + '..' * 10 + '10')
+        self.assertRaises(ValueError, b.set_position, Board(False).snapshot(BLACK))
+
+        b = Board(False, 6, 6)
+        b.set_white(2, 2)
+        b.set_white(3, 3)
+        b.set_black(2, 3)
+        b.set_black(3, 2)
+        self.assertEqual(b.legal_moves(BLACK), {(2, 1), (1, 2), (4, 3), (3, 4)})
+        b.make_move((2, 1), BLACK)
+        self.assertEqual(b.count(BLACK), 4)
+
 if __name__ == '__main__':
     unittest.main()
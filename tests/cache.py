@@ -0,0 +1,81 @@
+import os
+import tempfile
+from game.ai import AlphaBetaPruner, EXACT, LOWER, UPPER
+from game.analyse import analyse_stream
+from game.benchmark import SUITE
+from game.cache import PositionCache
+from game.position import Position, START
+from game.settings import *
+from game.symmetry import transform_cells, transform_move
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def solve(self, position, cache):
+        pruner = AlphaBetaPruner(None, 86400, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False, cache=cache)
+        score, move = pruner.solve()
+        return score, move, pruner.nodes
+
+    def test_entries(self):
+        with PositionCache(self.path) as cache:
+            self.assertEqual(len(cache), 0)
+            cache.put(START, UPPER, 4, 10)
+            self.assertEqual(cache.get(START), (UPPER, 4, 10, -1))
+            cache.flush()
+            cache.put(START, LOWER, 2, 8)
+            cache.flush()
+            cache.put(START, EXACT, 6, 10, 19)
+            cache.flush()
+
+        with PositionCache(self.path) as other:
+            self.assertEqual(other.get(START), (EXACT, 6, 10, 19))
+            self.assertIsNone(other.get(Position(START.cells, WHITE_CELL)))
+
+    def test_compact(self):
+        with PositionCache(self.path, max_entries=8) as cache:
+            for i in range(10):
+                cells = bytearray(START.cells)
+                cells[i] = BLACK_CELL
+                cache.put(Position(bytes(cells), BLACK_CELL), EXACT, 0, i)
+            cache.flush()
+            self.assertEqual(len(cache), 6)
+            self.assertIsNotNone(cache.get(Position(bytes(cells), BLACK_CELL)))
+
+    def test_solve(self):
+        name, text, best, score = SUITE[9]
+        position = Position.from_string(text)
+        with PositionCache(self.path, min_empties=4) as cache:
+            found, move, nodes = self.solve(position, cache)
+            self.assertEqual(found, score)
+            self.assertGreater(len(cache), 1)
+
+        with PositionCache(self.path) as cache:
+            for symmetry in range(8):
+                transformed = Position(transform_cells(position.cells, symmetry), position.player)
+                found, move, nodes = self.solve(transformed, cache)
+                self.assertEqual((found, nodes), (score, 0))
+                self.assertIn(move, [transform_move(parse_coordinate(m), symmetry) for m in best])
+
+    def test_processes(self):
+        positions = [Position.from_string(text) for name, text, best, score in SUITE[:5]]
+        runs = [list(analyse_stream(iter(positions), solve_empties=64, processes=2, cache_file=self.path))
+                for _ in range(2)]
+        self.assertEqual([result[:2] for position, result in runs[0]],
+                         [result[:2] for position, result in runs[1]])
+        self.assertEqual([result[3] for position, result in runs[1]], [0] * len(positions))
+        with PositionCache(self.path) as cache:
+            self.assertGreater(len(cache), len(positions))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import time
+from game.ai import AlphaBetaPruner
+from game.clock import GameClock, TimeManager
+from game.position import START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestClock(unittest.TestCase):
+    def test_increment(self):
+        clock = GameClock(60, 2)
+        clock.start()
+        elapsed = clock.stop()
+        self.assertAlmostEqual(clock.remaining, 62 - elapsed)
+        self.assertIsNone(clock.moves_to_go())
+
+    def test_moves_in_time(self):
+        clock = GameClock(60, moves=2)
+        self.assertEqual(clock.moves_to_go(), 2)
+        clock.start()
+        clock.stop()
+        self.assertEqual(clock.moves_to_go(), 1)
+        clock.start()
+        clock.stop()
+        self.assertEqual(clock.moves_to_go(), 2)
+        self.assertGreater(clock.remaining, 119)
+
+    def test_flagged(self):
+        clock = GameClock(0.001, 10)
+        clock.start()
+        time.sleep(0.01)
+        clock.stop()
+        self.assertTrue(clock.flagged())
+        self.assertEqual(str(clock), '0:00.0')
+
+    def test_budget(self):
+        manager = TimeManager(GameClock(300))
+        self.assertEqual(manager.budget(30, 1), (0.0, 0.0))
+
+        opening, midgame, ending = manager.budget(58, 5), manager.budget(30, 5), manager.budget(10, 5)
+        self.assertGreater(midgame[0], opening[0])
+        for soft, hard in (opening, midgame, ending):
+            self.assertLessEqual(soft, hard)
+            self.assertLessEqual(hard, 150)
+
+    def test_phase_sizes(self):
+        manager = TimeManager(GameClock(300))
+        self.assertEqual([manager.phase_weight(e) for e in (45, 44, 21, 20)],
+                         [manager.OPENING, manager.MIDGAME, manager.MIDGAME, manager.ENDGAME])
+        self.assertEqual([manager.phase_weight(e, 36) for e in (25, 24, 12, 11)],
+                         [manager.OPENING, manager.MIDGAME, manager.MIDGAME, manager.ENDGAME])
+        self.assertEqual([manager.phase_weight(e, 100) for e in (69, 68, 32, 31)],
+                         [manager.OPENING, manager.MIDGAME, manager.MIDGAME, manager.ENDGAME])
+
+        opening, midgame = manager.budget(94, 5, 100), manager.budget(50, 5, 100)
+        self.assertGreater(midgame[0], opening[0])
+
+    def test_budget_moves_in_time(self):
+        manager = TimeManager(GameClock(60, moves=1))
+        soft, hard = manager.budget(30, 5)
+        self.assertEqual(hard, 30)
+
+    def test_keep_searching(self):
+        manager = TimeManager(GameClock(300))
+        self.assertTrue(manager.keep_searching(1, 10, 30, 0.5, 0))
+        self.assertFalse(manager.keep_searching(11, 10, 30, 0.5, 0))
+        self.assertFalse(manager.keep_searching(6, 10, 30, 0.5, 3))
+        self.assertFalse(manager.keep_searching(1, 10, 30, 8, 0))
+
+    def test_iterative_deepening(self):
+        pruner = AlphaBetaPruner(None, 5, START, BLACK, WHITE, display=False)
+        depths = []
+
+        def keep_searching(elapsed, soft, hard, last_iteration, stable):
+            depths.append(pruner.max_depth)
+            return len(depths) < 3
+
+        move = pruner.iterative_deepening(1, keep_searching)
+        self.assertEqual(depths, [1, 2, 3])
+        self.assertIn(move, [(2, 3), (3, 2), (4, 5), (5, 4)])
+
+if __name__ == '__main__':
+    unittest.main()
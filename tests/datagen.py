@@ -0,0 +1,59 @@
+import os
+import random
+import tempfile
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+try:
+    import numpy as np
+    from game import datagen, tuning
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestDatagen(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shards(self):
+        made = sorted(datagen.generate(self.directory, 3, 150, seed=5, processes=2))
+        self.assertEqual([index for index, games in made], [0, 1, 2])
+
+        shards = datagen.load(self.directory)
+        self.assertEqual(len(shards), 3)
+        for shard in shards:
+            self.assertEqual(shard.shape, (150,))
+            self.assertFalse((shard['white'] & shard['black']).any())
+            self.assertTrue(np.isin(shard['player'], [WHITE_CELL, BLACK_CELL]).all())
+            self.assertTrue((abs(shard['result'].astype(int)) <= WIDTH * HEIGHT).all())
+
+        own, opp, labels = datagen.dataset(shards[0])
+        self.assertEqual(len(own), 150)
+        weights = tuning.fit([(own, opp, labels)], phases=(WIDTH * HEIGHT + 1,))
+        self.assertEqual(len(weights['ending'][0]), len(tuning.FEATURES))
+
+    def test_resume(self):
+        list(datagen.generate(self.directory, 2, 100, seed=5))
+        first = np.array(datagen.load(self.directory)[1])
+        os.remove(datagen.shard_path(self.directory, 1))
+
+        made = list(datagen.generate(self.directory, 2, 100, seed=5))
+        self.assertEqual([index for index, games in made], [1])
+        self.assertEqual(np.array(datagen.load(self.directory)[1]).tobytes(), first.tobytes())
+        self.assertEqual(list(datagen.generate(self.directory, 2, 100, seed=5)), [])
+
+    def test_searched_scores(self):
+        positions, scores, result = datagen.play_game(random.Random(1), depth=1, epsilon=0, opening=4)
+        self.assertTrue(all(s != s for s in scores[:4]))
+        self.assertTrue(all(s == s for s in scores[4:]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import socket
+import threading
+import time
+from game import distributed
+from game.ai import AlphaBetaPruner
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+MIDGAME = Position.from_string('------O-----XO---X-XX----OOOXXX---OOO-O------------------------- X')
+
+
+class SlowWorker(distributed.Worker):
+    def search(self, payload):
+        time.sleep(0.2)
+        return super().search(payload)
+
+
+class TestDistributed(unittest.TestCase):
+    def setUp(self):
+        self.coordinator = distributed.Coordinator()
+        self.threads = []
+
+    def tearDown(self):
+        self.coordinator.close()
+        for thread in self.threads:
+            thread.join(5)
+
+    def start(self, worker=distributed.Worker):
+        thread = threading.Thread(target=worker(self.coordinator.address).run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        self.coordinator.wait_for_workers(len(self.threads))
+
+    def expected(self, position, depth):
+        pruner = AlphaBetaPruner(None, 86400, position, STATES[position.player], STATES[position.player ^ 1],
+                                 display=False)
+        move = pruner.alpha_beta_search(depth)
+        return move, pruner.score
+
+    def test_search(self):
+        coordinator, processes = distributed.local(2)
+        try:
+            for position in (MIDGAME, Position.from_string(MIDGAME.to_string()[:-1] + 'O')):
+                move, score = self.expected(position, 3)
+                self.assertEqual(coordinator.search(position, 3), move)
+                self.assertEqual(coordinator.score, score)
+                self.assertGreater(coordinator.nodes, 0)
+        finally:
+            distributed.shut_down(coordinator, processes)
+
+    def test_lost_worker(self):
+        # A worker that hangs up on its first job, which goes to the other one.
+        sock = socket.create_connection(self.coordinator.address)
+        distributed.send_message(sock, distributed.HELLO, distributed.HELLO_BODY.pack(0))
+        self.coordinator.wait_for_workers(1)
+        self.threads.append(None)
+        self.start()
+
+        def hang_up():
+            distributed.read_message(sock)
+            sock.close()
+        thread = threading.Thread(target=hang_up)
+        thread.start()
+        move = self.coordinator.search(MIDGAME, 2)
+        thread.join()
+        self.threads.remove(None)
+
+        self.assertEqual((move, self.coordinator.score), self.expected(MIDGAME, 2))
+        self.assertGreaterEqual(self.coordinator.reassigned, 1)
+        self.assertEqual(len(self.coordinator.workers), 1)
+
+    def test_stealing(self):
+        self.start(SlowWorker)
+        self.start()
+        move = self.coordinator.search(MIDGAME, 2)
+        self.assertEqual((move, self.coordinator.score), self.expected(MIDGAME, 2))
+        self.assertGreaterEqual(self.coordinator.stolen, 1)
+        self.assertGreaterEqual(self.coordinator.cancelled, 1)
+
+    def test_time_out(self):
+        self.start(SlowWorker)
+        stop = threading.Event()
+        stop.set()
+        moves = AlphaBetaPruner(None, 0, MIDGAME, BLACK, WHITE, display=False).get_moves(*MIDGAME)
+        self.assertIn(self.coordinator.search(MIDGAME, 2, stop=stop), moves)
+        self.assertTrue(self.coordinator.timed_out)
+        self.assertIsNone(self.coordinator.score)
+        self.assertEqual(self.coordinator.search(MIDGAME, 2, duration=60), self.expected(MIDGAME, 2)[0])
+
+    def test_stale_replies(self):
+        self.start()
+        self.coordinator.search(MIDGAME, 2)
+        # A late reply to a job of the last search comes in during the next one.
+        connection = self.coordinator.workers[0]
+        stale = distributed.CANCELLED_BODY.pack(self.coordinator.next_id - 1, 10 ** 9)
+        self.coordinator.events.put(('message', connection, (distributed.CANCELLED, stale)))
+        self.assertEqual(self.coordinator.search(MIDGAME, 2), self.expected(MIDGAME, 2)[0])
+        self.assertLess(self.coordinator.nodes, 10 ** 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import random
+from game.ai import AlphaBetaPruner
+from game.board import Board
+from game.position import Position, START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+try:
+    import numpy as np
+    from game import batch, bitboard, mcts, tournament
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestMcts(unittest.TestCase):
+    def setUp(self):
+        self.pick = batch.random_picker(np.random.default_rng(1))
+
+    def state(self, position):
+        own, opp = bitboard.from_positions([position])
+        return int(own[0]), int(opp[0]), position.player
+
+    def test_moves(self):
+        pruner = AlphaBetaPruner(None, 0, START, BLACK, WHITE, display=False)
+        rng = random.Random(1)
+        state = (START.cells, START.player)
+        while pruner.get_moves(*state):
+            own, opp, player = self.state(Position(*state))
+            moves = pruner.get_moves(*state)
+            self.assertEqual(mcts.legal_moves(own, opp), sum(1 << (x + y * WIDTH) for x, y in moves))
+            move = rng.choice(moves)
+            state = pruner.next_state(state, move)
+            self.assertEqual(mcts.play(own, opp, move[0] + move[1] * WIDTH) + (player ^ 1,),
+                             self.state(Position(*state)))
+
+    def test_tree(self):
+        tree = mcts.Tree(*self.state(START))
+        self.assertEqual(tree.search(self.pick, 2000), 2000)
+        self.assertEqual(tree.visits[0], 2000)
+        self.assertEqual(sum(tree.visits[child] for child in tree.children()), 2000)
+
+        def check(node, own, opp):
+            if tree.first[node] >= 0:
+                moves = mcts.legal_moves(own, opp)
+                expected = [tile for tile in range(64) if moves >> tile & 1] or [mcts.PASS]
+                self.assertEqual([tree.move[child] for child in tree.children(node)], expected)
+                for child in tree.children(node):
+                    check(child, *mcts.play(own, opp, tree.move[child]))
+        check(0, *tree.state[:2])
+
+        move = tree.best_move()
+        child = next(child for child in tree.children() if tree.move[child] == move)
+        reply = tree.first[child]
+        own, opp = mcts.play(*mcts.play(*tree.state[:2], move), tree.move[reply])
+        kept = tree.advance(own, opp, BLACK_CELL)
+        self.assertEqual((kept.state, kept.visits[0]), ((own, opp, BLACK_CELL), tree.visits[reply]))
+        self.assertLess(len(kept), len(tree))
+        self.assertEqual(tree.advance(*self.state(START)).visits[0], 0)
+
+    def test_tournament(self):
+        openings = tournament.random_openings(1, 4, seed=1)
+        (wins, draws, losses), rates = tournament.run('mcts', 'random', 2, (2, 0), openings, seed=1)
+        self.assertEqual(wins, 2)
+        self.assertGreater(rates['mcts'], 0)
+
+        board = Board(False)
+        board.set_position(openings[0])
+        controller = mcts.MctsController(STATES[openings[0].player], 1, playouts=1000, seed=1, display=False)
+        self.assertIn(controller.next_move(board), board.legal_moves(STATES[openings[0].player]))
+        self.assertEqual(controller.played, 1000)
+
+if __name__ == '__main__':
+    unittest.main()
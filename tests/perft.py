@@ -0,0 +1,36 @@
+from game.perft import BACKENDS, BOARD_TILES, POSITIONS, START_COUNTS, run
+from game.position import Position, START, start
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestPerft(unittest.TestCase):
+    def test_start(self):
+        for backend in BACKENDS.values():
+            for depth in range(5):
+                self.assertEqual(backend(START, depth), START_COUNTS[depth])
+
+    def test_stored_positions(self):
+        positions = [(name, Position.from_string(text)) for name, text in POSITIONS]
+        results = run(positions, 3)
+        self.assertEqual(len(results), len(positions) * len(BACKENDS))
+
+    def test_bitboard_oracle(self):
+        if 'bitboard' not in BACKENDS:
+            self.skipTest("NumPy is not installed")
+        positions = [(name, Position.from_string(text)) for name, text in POSITIONS]
+        results = run(positions, 4)
+        self.assertEqual(sum(result['backend'] == 'bitboard' for result in results), len(positions))
+        self.assertEqual(BACKENDS['bitboard'](START, 7), START_COUNTS[7])
+
+    def test_sizes(self):
+        for size in (4, 6, 10):
+            backends = [backend for backend in BACKENDS if backend not in BOARD_TILES]
+            self.assertEqual([result['backend'] for result in run([('start', start(size, size))], 4)], backends)
+        # The edges of a 10x10 board are out of reach for the first plies.
+        self.assertEqual(run([('start', start(10, 10))], 5)[0]['nodes'], START_COUNTS[5])
+
+if __name__ == '__main__':
+    unittest.main()
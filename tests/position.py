@@ -0,0 +1,43 @@
+import pickle
+from game.board import Board
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestPosition(unittest.TestCase):
+    def setUp(self):
+        self.board = Board(False)
+        self.board.set_white(3, 3)
+        self.board.set_white(4, 4)
+        self.board.set_black(3, 4)
+        self.board.set_black(4, 3)
+
+    def test_snapshot(self):
+        self.board.mark_moves(BLACK)
+        position = self.board.snapshot(BLACK)
+
+        self.assertEqual(position.player, BLACK_CELL)
+        self.assertEqual(position.cells.count(BOARD_CELL), 60)
+        self.assertEqual(position.cells[27], WHITE_CELL)
+        self.assertEqual(position.cells[28], BLACK_CELL)
+
+        self.assertEqual(hash(position), hash(self.board.copy().snapshot(BLACK)))
+
+        self.board.set_black(0, 0)
+        self.assertEqual(position.cells[0], BOARD_CELL)
+        self.assertNotEqual(position, self.board.snapshot(BLACK))
+
+    def test_pack(self):
+        position = self.board.snapshot(WHITE)
+        data = position.pack()
+
+        self.assertEqual(len(data), 17)
+        self.assertEqual(Position.unpack(data), position)
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+
+if __name__ == '__main__':
+    unittest.main()
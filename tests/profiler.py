@@ -0,0 +1,68 @@
+import glob
+import os
+import tempfile
+import tracemalloc
+from game.ai import AlphaBetaPruner
+from game.analyse import analyse_stream
+from game.benchmark import SUITE
+from game.position import Position, START
+from game.profiler import Profiler, HOT_FUNCTIONS
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmp.name, 'run')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def search(self):
+        pruner = AlphaBetaPruner(None, 86400, START, BLACK, WHITE, display=False)
+        return pruner.alpha_beta_search(3), pruner.nodes
+
+    def test_install(self):
+        originals = {name: AlphaBetaPruner.__dict__[name] for name in HOT_FUNCTIONS}
+        with Profiler():
+            self.assertIsNot(AlphaBetaPruner.__dict__['negamax'], originals['negamax'])
+        for name in HOT_FUNCTIONS:
+            self.assertIs(AlphaBetaPruner.__dict__[name], originals[name])
+
+    def test_move_report(self):
+        expected = self.search()
+        with Profiler(self.prefix, memory=True) as profiler:
+            profiler.start_move()
+            self.assertEqual(self.search(), expected)
+            lines = profiler.end_move('d3')
+
+        self.assertTrue(lines[0].startswith('== d3'))
+        self.assertEqual(profiler.stats['alpha_beta_search'][0], 1)
+        self.assertEqual(profiler.stats['negamax'][0], expected[1])
+        self.assertTrue(any(line.startswith('memory: peak') for line in lines))
+
+        with open(self.prefix + '.folded') as f:
+            stacks = f.read().split('\n')
+        self.assertTrue(any(line.startswith('alpha_beta_search;negamax;negamax;') for line in stacks))
+        with open(self.prefix + '.txt') as f:
+            self.assertIn('negamax', f.read())
+
+        profiler.start_move()
+        self.assertEqual(profiler.end_move('none'), [])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_analyse(self):
+        positions = [Position.from_string(text) for name, text, best, score in SUITE[:2]]
+        list(analyse_stream(iter(positions), depth=1, profile=self.prefix))
+        reports = glob.glob(self.prefix + '.*.txt')
+        self.assertEqual(len(reports), 1)
+        with open(reports[0]) as f:
+            self.assertEqual(f.read().count('== '), 2)
+        self.assertEqual(AlphaBetaPruner.__dict__['negamax'].__code__.co_name, 'negamax')
+
+if __name__ == '__main__':
+    unittest.main()
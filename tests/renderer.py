@@ -0,0 +1,60 @@
+import io
+from game.board import Board
+from game.renderer import Renderer, CLEAR_SCREEN
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.out = io.StringIO()
+        self.renderer = Renderer(False, self.out)
+        self.board = Board(False)
+        self.board.set_white(3, 3)
+        self.board.set_white(4, 4)
+        self.board.set_black(3, 4)
+        self.board.set_black(4, 3)
+
+    def frame(self, lines, moves=()):
+        self.out.seek(0)
+        self.out.truncate()
+        self.renderer.render(lines, self.board, moves)
+        return self.out.getvalue()
+
+    def test_full_frame(self):
+        result = self.frame(['info'])
+        self.assertTrue(result.startswith(CLEAR_SCREEN))
+        self.assertIn(self.board.draw(), result)
+
+    def test_diff_frame(self):
+        self.frame(['info', 'turn'], self.board.legal_moves(BLACK))
+        self.board.make_move((3, 2), BLACK)
+        result = self.frame(['info', 'turn 2'], self.board.legal_moves(WHITE))
+
+        self.assertNotIn(CLEAR_SCREEN, result)
+        self.assertIn('\x1b[2;1Hturn 2', result)
+        self.assertNotIn('\x1b[1;1H', result)
+        # d3 and d4 turn black, c4, f5 and e6 lose their marks, c3, e3 and c5 get one.
+        self.assertEqual(result.count('BB'), 2)
+        self.assertEqual(result.count('MM'), 3)
+        self.assertEqual(result.count('..'), 3)
+
+    def test_invalidate(self):
+        self.frame(['info', 'turn'], self.board.legal_moves(BLACK))
+        self.renderer.invalidate()
+        result = self.frame(['info', 'turn'], self.board.legal_moves(BLACK))
+        self.assertTrue(result.startswith(CLEAR_SCREEN))
+        self.assertIn('info\nturn\n', result)
+        self.assertEqual(result.count('MM'), 4)
+
+        # The frame after it goes back to repainting what changed.
+        self.board.make_move((3, 2), BLACK)
+        result = self.frame(['info', 'turn'], self.board.legal_moves(WHITE))
+        self.assertNotIn(CLEAR_SCREEN, result)
+        self.assertEqual(result.count('BB'), 2)
+
+if __name__ == '__main__':
+    unittest.main()
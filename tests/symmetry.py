@@ -0,0 +1,59 @@
+from game.board import Board
+from game.perft import POSITIONS
+from game.position import Position, START, start
+from game.settings import *
+from game.symmetry import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestSymmetry(unittest.TestCase):
+    def setUp(self):
+        self.positions = [Position.from_string(text) for name, text in POSITIONS]
+
+    def moves(self, position):
+        board = Board(False)
+        board.set_position(position)
+        return board.legal_moves(STATES[position.player])
+
+    def test_transforms(self):
+        for position in self.positions:
+            moves = self.moves(position)
+            for symmetry in range(len(TRANSFORMS)):
+                transformed = Position(transform_cells(position.cells, symmetry), position.player)
+                self.assertEqual(self.moves(transformed), {transform_move(m, symmetry) for m in moves})
+                self.assertEqual({inverse_move(transform_move(m, symmetry), symmetry) for m in moves}, moves)
+                self.assertEqual(canonical_key(transformed), canonical_key(position))
+                self.assertEqual(canonical(transformed)[0], canonical(position)[0])
+
+    def test_canonical(self):
+        for position in self.positions:
+            key, symmetry = canonical(position)
+            self.assertEqual(key.cells, transform_cells(position.cells, symmetry))
+            self.assertEqual(key, Position(*canonical_key(position)))
+
+    def test_start_moves_are_symmetric(self):
+        board = Board(False)
+        board.set_position(START)
+        children = set()
+        for move in board.legal_moves(BLACK):
+            child = board.copy()
+            child.make_move(move, BLACK)
+            children.add(canonical_key(child.snapshot(WHITE)))
+        self.assertEqual(len(children), 1)
+
+    def test_sizes(self):
+        for size in (6, 10):
+            board = Board(False, size, size)
+            board.set_position(start(size, size))
+            board.make_move(sorted(board.legal_moves(BLACK))[0], BLACK)
+            position = board.snapshot(WHITE)
+            key, symmetry = canonical(position)
+            self.assertEqual(key.cells, transform_cells(position.cells, symmetry))
+            for move in board.legal_moves(WHITE):
+                self.assertEqual(inverse_move(transform_move(move, symmetry, size), symmetry, size), move)
+
+if __name__ == '__main__':
+    unittest.main()
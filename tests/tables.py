@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import tempfile
+from game import tables
+from game.settings import *
+from game.symmetry import make_transforms
+
+__author__ = 'yuessiah'
+
+import unittest
+
+
+class TestTables(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = tables.CACHE_DIR, tables._loaded, tables._decoded
+        tables.CACHE_DIR, tables._loaded, tables._decoded = self.tmp.name, {}, {}
+
+    def tearDown(self):
+        tables.CACHE_DIR, tables._loaded, tables._decoded = self.saved
+        self.tmp.cleanup()
+
+    def test_tables(self):
+        self.assertEqual(tables.rays(), make_rays())
+        self.assertEqual(tables.transforms(), make_transforms())
+        self.assertTrue(os.path.exists(tables.cache_path()))
+        self.assertRaises(TypeError, tables.table('rays').__setitem__, 0, 1)
+
+    def test_cache_file(self):
+        tables.rays()
+        with open(tables.cache_path(), 'rb') as f:
+            data = f.read()
+        self.assertEqual(data, tables.build())
+
+        tables._loaded, tables._decoded = {}, {}
+        self.assertEqual(tables.rays(), make_rays())
+
+    def test_stale_cache(self):
+        stale = bytearray(tables.build())
+        stale[4] += 1
+        with open(tables.cache_path(), 'wb') as f:
+            f.write(stale)
+
+        self.assertEqual(tables.rays(), make_rays())
+        with open(tables.cache_path(), 'rb') as f:
+            self.assertEqual(f.read(), tables.build())
+
+    def test_startup(self):
+        # The first interpreter writes the cache, the next ones only read it.
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, OTHELLO_TABLES=self.tmp.name)
+        script = 'from game import tables; tables.rays()'
+        subprocess.check_call([sys.executable, '-c', script], cwd=root, env=env)
+        written = os.stat(tables.cache_path())
+        subprocess.check_call([sys.executable, '-c', script], cwd=root, env=env)
+        reused = os.stat(tables.cache_path())
+        self.assertEqual((reused.st_ino, reused.st_mtime_ns), (written.st_ino, written.st_mtime_ns))
+        with open(tables.cache_path(), 'rb') as f:
+            self.assertEqual(f.read(), tables.build())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+from game.ai import AlphaBetaPruner, DEFAULT_WEIGHTS
+from game.position import Position
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+try:
+    import numpy as np
+    from game import bitboard, tuning
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTuning(unittest.TestCase):
+    def setUp(self):
+        self.own, self.opp, self.labels = tuning.self_play(20, seed=1)
+
+    def test_self_play(self):
+        self.assertEqual(len(self.own), len(self.labels))
+        self.assertFalse((self.own & self.opp).any())
+        self.assertTrue((abs(self.labels.astype(int)) <= 64).all())
+
+    def test_features_match_engine(self):
+        x = tuning.features(self.own, self.opp)
+        weights = DEFAULT_WEIGHTS['ending'][0]
+        for i in range(0, len(self.own), 37):
+            own, opp = int(self.own[i]), int(self.opp[i])
+            state = bytes(WHITE_CELL if own >> t & 1 else BLACK_CELL if opp >> t & 1 else BOARD_CELL
+                          for t in range(WIDTH * HEIGHT))
+            pruner = AlphaBetaPruner(None, 1, Position(state, WHITE_CELL), WHITE, BLACK, display=False)
+            action = next((t % WIDTH, t // WIDTH) for t in range(WIDTH * HEIGHT) if state[t] == WHITE_CELL)
+            self.assertAlmostEqual(pruner.ending_evaluation(state, WHITE_CELL, action), float(x[i] @ weights))
+
+    def test_fit(self):
+        weights = tuning.fit([(self.own, self.opp, self.labels)], phases=(30, WIDTH * HEIGHT + 1))
+        self.assertEqual(len(weights['ending']), 2)
+        self.assertEqual(len(weights['ending'][0]), len(tuning.FEATURES))
+
+        pruner = AlphaBetaPruner(None, 1, Position(bytes(64), WHITE_CELL), WHITE, BLACK, display=False, weights=weights)
+        self.assertEqual(pruner.ending_weights[10], weights['ending'][0])
+        self.assertEqual(pruner.ending_weights[60], weights['ending'][1])
+
+if __name__ == '__main__':
+    unittest.main()
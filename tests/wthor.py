@@ -0,0 +1,110 @@
+import os
+import random
+import shutil
+import struct
+import tempfile
+from game.ai import AlphaBetaPruner
+from game.position import Position, START
+from game.settings import *
+
+__author__ = 'yuessiah'
+
+import unittest
+
+try:
+    import numpy as np
+    from game import bitboard, wthor
+    from game.symmetry import MAPPINGS, transform_cells
+except ImportError:
+    np = None
+
+
+def random_games(count, seed):
+    """ Returns the moves, passes left out, and final positions of random games.
+    """
+    pruner = AlphaBetaPruner(None, 0, START, BLACK, WHITE, display=False)
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        state, moves = (START.cells, START.player), []
+        while True:
+            legal = pruner.get_moves(*state)
+            if not legal:
+                state = (state[0], state[1] ^ 1)
+                legal = pruner.get_moves(*state)
+                if not legal:
+                    break
+            move = rng.choice(legal)
+            moves.append(move)
+            state = pruner.next_state(state, move)
+        games.append((moves, Position(*state)))
+    return games
+
+
+def write_wthor(path, games):
+    with open(path, 'wb') as f:
+        f.write(wthor.HEADER.pack(20, 24, 1, 1, len(games), 0, 2024, WIDTH, 0, 0))
+        for i, moves in enumerate(games):
+            record = bytes((y + 1) * 10 + x + 1 for x, y in moves)
+            f.write(struct.pack('<HHHBB', i, 1, 2, 32, 32) + record.ljust(60, b'\0'))
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestWthor(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.games = random_games(30, 1)
+        self.path = os.path.join(self.directory, 'games.wtb')
+        moves = [moves for moves, final in self.games]
+        # An illegal second move.
+        moves.append([(5, 4), (0, 0)])
+        write_wthor(self.path, moves)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_canonical(self):
+        position = Position.from_string('------O-----XO---X-XX----OOOXXX---OOO-O------------------------- X')
+        keys = set()
+        for symmetry in range(len(MAPPINGS)):
+            own, opp = bitboard.from_positions([Position(transform_cells(position.cells, symmetry), 1)])
+            keys.add(tuple(int(board[0]) for board in bitboard.canonical(own, opp)))
+        self.assertEqual(len(keys), 1)
+
+    def test_import(self):
+        database = wthor.GameDatabase(os.path.join(self.directory, 'db'))
+        self.assertEqual(database.import_file(self.path), (30, 1))
+        self.assertIsNone(database.import_file(self.path))
+        self.assertEqual(len(database), 30)
+
+        pruner = AlphaBetaPruner(None, 0, START, BLACK, WHITE, display=False)
+        results = [pruner.final_score(final.cells, BLACK_CELL, WHITE_CELL) for moves, final in self.games]
+        stats = database.lookup(START)
+        self.assertEqual(stats, wthor.Stats(30, sum(r > 0 for r in results), results.count(0),
+                                            sum(r < 0 for r in results), sum(results)))
+        self.assertEqual(database.games(START), list(range(30)))
+        for game, (moves, final) in enumerate(self.games):
+            self.assertEqual(database.moves(game), moves)
+            self.assertEqual(int(database.game(game)['result']), results[game])
+            self.assertEqual(database.games(final), [game])
+
+        # The first moves are symmetric, so every game reaches all of them.
+        continuations = database.continuations(START)
+        self.assertEqual(sorted(move for move, child, stats in continuations), pruner.get_moves(*START))
+        self.assertTrue(all(stats.games == 30 for move, child, stats in continuations))
+        self.assertEqual(database.continuations(continuations[0][1])[0][2].games,
+                         max(len(database.games(child)) for m, child, s in database.continuations(
+                             continuations[0][1])))
+        book = list(database.book(10, 4))
+        self.assertEqual(book[:2], [(START, stats), continuations[0][1:]])
+        self.assertTrue(all(stats.games >= 10 for position, stats in book))
+        database.close()
+
+        # An import cut short leaves games that are dropped on opening.
+        database = wthor.GameDatabase(os.path.join(self.directory, 'db'))
+        database.store.append(database.game(0).reshape(1))
+        database.close()
+        self.assertEqual(len(wthor.GameDatabase(os.path.join(self.directory, 'db'))), 30)
+
+if __name__ == '__main__':
+    unittest.main()